@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+"""
+Benchmark of aggregating reports over time windows
+
+Compares the :py:mod:`numpy` and pure python implementations of
+:py:class:`~pypelined.modifier.aggregation.Aggregate` for reports of
+several hosts, aggregated to one report per host and window.
+The time to summarize a single window is measured separately,
+since it is amortised over all reports of the window.
+
+.. code:: bash
+
+    python benchmarks/aggregation.py
+"""
+from __future__ import print_function
+import timeit
+
+import chainlet
+
+from pypelined.modifier import aggregation
+
+FIELDS = ('link.in', 'link.out', 'link.num', 'sched.threads', 'ofs.han', 'poll.ev')
+HOSTS = 16
+REPORTS_PER_WINDOW = 250
+
+
+def make_reports(windows=4):
+    return [
+        dict({field: index * 1000 + host for field in FIELDS}, tod=index * 60.0 / REPORTS_PER_WINDOW, host=host)
+        for index in range(REPORTS_PER_WINDOW * windows) for host in range(HOSTS)
+    ]
+
+
+def run(reports):
+    link = aggregation.Aggregate(
+        FIELDS, tags=('host',), window=60, statistics=('min', 'max', 'mean', 'rate'), percentiles=(50, 95),
+        time_key='tod',
+    )
+    outputs = 0
+    for report in reports:
+        try:
+            outputs += len(link.send(report))
+        except chainlet.StopTraversal:
+            pass
+    return outputs
+
+
+def summarize_time(series_type, samples, repeat):
+    series = series_type(len(FIELDS))
+    for index in range(samples):
+        series.append(float(index), [float(index)] * len(FIELDS))
+    return min(timeit.repeat(
+        lambda: series.summarize(0, samples, ('min', 'max', 'mean', 'rate'), (50, 95)), repeat=repeat, number=10
+    )) / 10
+
+
+def main(repeat=5, number=1):
+    reports = make_reports()
+    candidates = [('python', False)]
+    if aggregation.HAS_NUMPY:
+        candidates.append(('numpy', True))
+    print('%d reports of %d hosts, %d reports provided' % (len(reports), HOSTS, run(reports)))
+    baseline = None
+    try:
+        for label, use_numpy in candidates:
+            aggregation.HAS_NUMPY = use_numpy
+            best = min(timeit.repeat(lambda: run(reports), repeat=repeat, number=number)) / number / len(reports)
+            baseline = baseline or best
+            print('%-8s %8.2f us/report %6.2fx' % (label, best * 1E6, baseline / best))
+        for samples in (REPORTS_PER_WINDOW, 10 * REPORTS_PER_WINDOW):
+            print('summarize %d samples:' % samples, ', '.join(
+                '%s %.1f us' % (label, summarize_time(
+                    aggregation._ArraySeries if use_numpy else aggregation._ListSeries, samples, repeat) * 1E6)
+                for label, use_numpy in candidates
+            ))
+    finally:
+        aggregation.HAS_NUMPY = aggregation.numpy is not None
+
+
+if __name__ == '__main__':
+    main()
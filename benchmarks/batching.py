@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+"""
+Microbenchmark of processing reports in batches
+
+Compares sending each report through a ``remap >> update >> telegraf_message`` chain
+against sending batches of reports through the same chain.
+
+.. code:: bash
+
+    python benchmarks/batching.py
+"""
+from __future__ import print_function
+import timeit
+
+from pypelined.modifier.dictlets import remap, update
+from pypelined.modifier.batchlets import batch
+from pypelined.consumer.telegraf import telegraf_message
+
+KEY_MAP = {
+    'host': 'hostname', 'daemon': 'daemon', 'role': 'role', 'ver': 'version', 'tot': 'space_total',
+    'free': 'space_free', 'conn': 'connections', 'fh': 'filehandles', 'thr': 'threads', 'in': 'bytes_recv',
+    'out': 'bytes_sent', 'load': 'load',
+}
+REPORT = {
+    'host': 'xrd01.example.org', 'daemon': 'xrootd', 'role': 'server', 'ver': 'v4.6.1', 'tot': 1099511627776,
+    'free': 549755813888, 'conn': 1342, 'fh': 2011, 'thr': 87, 'in': 18446744073, 'out': 98446744073,
+    'load': 0.75, 'pid': 4711,
+}
+BATCH_SIZE = 256
+
+
+def make_chain(*links):
+    chain = remap(KEY_MAP) >> update(site='ALICE::TEST::SE') >> telegraf_message(
+        'xrootd_reports', dynamic_tags=('hostname', 'daemon', 'role', 'site'),
+    )
+    for link in links:
+        chain = link >> chain
+    return chain
+
+
+def main(repeat=5, number=20):
+    single_chain, batch_chain, batched_chain = make_chain(), make_chain(), make_chain(batch(BATCH_SIZE))
+    reports = [REPORT] * BATCH_SIZE
+
+    def single():
+        send = single_chain.send
+        for report in reports:
+            send(report)
+
+    def batched():
+        batch_chain.send(reports)
+
+    def batch_link():
+        for report in reports:
+            try:
+                batched_chain.send(report)
+            except StopIteration:
+                pass
+
+    candidates = (
+        ('per report', single),
+        ('batch link', batch_link),
+        ('list of reports', batched),
+    )
+    baseline = None
+    for label, call in candidates:
+        best = min(timeit.repeat(call, repeat=repeat, number=number)) / number / BATCH_SIZE
+        baseline = baseline or best
+        print('%-20s %8.2f us/report %6.2fx' % (label, best * 1E6, baseline / best))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,36 @@
+#!/usr/bin/env python
+"""
+Microbenchmark of the overhead of instrumenting pipelines
+
+Compares sending reports through a ``remap >> update >> telegraf_message`` chain
+with and without :py:class:`~pypelined.instrumentation.Probe` on every link.
+
+.. code:: bash
+
+    python benchmarks/instrumentation.py
+"""
+from __future__ import print_function
+import timeit
+
+from pypelined.instrumentation import Instrumentation
+
+from batching import make_chain, REPORT
+
+
+def main(repeat=1000, number=200):
+    plain_chain, instrumented_chain = make_chain(), Instrumentation().instrument(make_chain())
+    candidates = (
+        ('plain', plain_chain.send),
+        ('instrumented', instrumented_chain.send),
+    )
+    # interleave many short runs of candidates, so that both are equally affected by varying load
+    best = [float('inf')] * len(candidates)
+    for _ in range(repeat):
+        for index, (_, send) in enumerate(candidates):
+            best[index] = min(best[index], timeit.timeit(lambda: send(REPORT), number=number) / number)
+    for (label, _), duration in zip(candidates, best):
+        print('%-14s %8.2f us/report %+6.1f%%' % (label, duration * 1E6, (duration / best[0] - 1) * 100))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+"""
+Benchmark of updating reports by copying versus overlaying them
+
+Compares creating an :py:class:`~pypelined.utilities.overlay.Overlay`, as done by
+:py:func:`~pypelined.modifier.dictlets.update`, against copying each report,
+for reports of realistic size forked to two branches.
+Throughput includes encoding the updated reports, which must read all their items.
+Memory is the size of keeping a window of updated reports alive.
+
+.. code:: bash
+
+    python benchmarks/overlay.py
+"""
+from __future__ import print_function, division
+import timeit
+import tracemalloc
+
+from pypelined.utilities.overlay import Overlay
+from pypelined.consumer.telegraf import LineEncoder
+
+REPORT = {'xrd.stat.%d.%s' % (index, name): index for index in range(50) for name in ('in', 'out', 'num', 'ctime')}
+REPORT.update({'oss.paths.%d.%s' % (index, name): index for index in range(8) for name in ('tot', 'free')})
+REPORT.update({'pgm': 'xrootd', 'ins': 'anon', 'info.host': 'xrd01.example.org', 'ver': 'v4.6.1'})
+BRANCHES = 2
+WINDOW = 1000
+
+
+def copy_update(value, **kwargs):
+    value = value.copy()
+    value.update(**kwargs)
+    return value
+
+
+def overlay_update(value, **kwargs):
+    return Overlay(value, kwargs)
+
+
+def measure_memory(updater, reports):
+    tracemalloc.start()
+    try:
+        window = [updater(report) for report in reports for _ in range(BRANCHES)]
+        current, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del window
+    return current / len(reports)
+
+
+def main(repeat=5, number=2000):
+    encode = LineEncoder('xrootd', dynamic_tags=('pgm', 'info.host', 'site')).encode
+    candidates = (
+        ('dict.copy', lambda value: copy_update(value, site='ALICE::TEST::SE', backend='telegraf')),
+        ('Overlay', lambda value: overlay_update(value, site='ALICE::TEST::SE', backend='telegraf')),
+    )
+    reports = [dict(REPORT) for _ in range(WINDOW)]
+    print('report with %d keys, forked to %d branches' % (len(REPORT), BRANCHES))
+    baseline = None
+    for label, updater in candidates:
+        def fork_update():
+            for _ in range(BRANCHES):
+                updater(REPORT)
+
+        def fork_encode():
+            for _ in range(BRANCHES):
+                encode(updater(REPORT), timestamp=1500000000)
+        update_time = min(timeit.repeat(fork_update, repeat=repeat, number=number)) / number
+        encode_time = min(timeit.repeat(fork_encode, repeat=repeat, number=number)) / number
+        memory = measure_memory(updater, reports)
+        baseline = baseline or update_time
+        print('%-12s %8.2f us/report update %6.2fx %8.2f us/report with encode %10.0f bytes/report' % (
+            label, update_time * 1E6, baseline / update_time, encode_time * 1E6, memory
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+"""
+Microbenchmark of remapping report keys
+
+Compares the precompiled :py:class:`~pypelined.modifier.dictlets.RemapPlan`
+against the original per-key lookup with ``try``/``except KeyError``,
+for a report with several hundred keys of which only a few are mapped.
+
+.. code:: bash
+
+    python benchmarks/remap.py
+"""
+from __future__ import print_function
+import timeit
+
+from pypelined.modifier.dictlets import RemapPlan
+
+KEY_MAP = {
+    'pgm': 'daemon', 'info.host': 'hostname', 'ins': 'instance', 'ver': 'version', 'ofs.role': 'role',
+    'site': 'se_name', 'oss.paths.0.tot': 'space_total', 'oss.paths.0.free': 'space_free',
+    'link.num': 'connections', 'ofs.han': 'filehandles', 'sched.threads': 'threads',
+    'link.in': 'bytes_recv', 'link.out': 'bytes_sent'
+}
+GLOB_MAP = dict(KEY_MAP, **{'oss.paths.*.free': 'space_free_*', 'oss.paths.*.tot': 'space_total_*'})
+REPORT = dict(
+    {key: 1 for key in KEY_MAP},
+    **{'xrd.stat.%d.%s' % (index, name): index for index in range(50) for name in ('in', 'out', 'num', 'ctime')}
+)
+REPORT.update({'oss.paths.%d.%s' % (index, name): index for index in range(8) for name in ('tot', 'free')})
+
+
+def try_except_remap(input_dict, key_map=KEY_MAP):
+    output_dict = {}
+    for key, value in input_dict.items():
+        try:
+            output_dict[key_map[key]] = value
+        except KeyError:
+            pass
+    return output_dict
+
+
+def main(repeat=5, number=2000):
+    candidates = (
+        ('try/except', try_except_remap),
+        ('RemapPlan', RemapPlan(KEY_MAP).remap),
+        ('RemapPlan globs', RemapPlan(GLOB_MAP).remap),
+    )
+    print('report with %d keys, %d mapped' % (len(REPORT), len(KEY_MAP)))
+    baseline = None
+    for label, remap in candidates:
+        best = min(timeit.repeat(lambda: remap(REPORT), repeat=repeat, number=number)) / number
+        baseline = baseline or best
+        print('%-20s %8.2f us/report %6.2fx' % (label, best * 1E6, baseline / best))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,442 @@
+#!/usr/bin/env python
+"""
+Benchmark suite of providers, modifiers and consumers
+
+Drives xrootd reports and log lines through the individual links of typical pipelines,
+and measures for each case:
+
+* the throughput in chunks per second,
+* percentiles of the latency per chunk,
+* the peak memory allocated while processing all chunks.
+
+By default, synthetic reports and log lines are used.
+Recorded data can be used instead, namely ``mpxstats -f cgi`` output via ``--reports``
+and any log file via ``--log``.
+
+Results are stored as JSON via ``--output``, and compared to previous results via ``--compare``.
+A case is a regression if its throughput drops by more than ``--threshold``,
+in which case the suite exits with a non-zero status.
+
+.. code:: bash
+
+    python benchmarks/suite.py --output baseline.json
+    python benchmarks/suite.py --compare baseline.json
+    python benchmarks/suite.py remap update --chunks 100000
+"""
+from __future__ import print_function, division
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+from pypelined import __about__
+from pypelined.utilities import decode_scalar
+from pypelined.provider.stream import readlines, tail_path
+from pypelined.provider.xrootd import XRootDReports, parse_summary
+from pypelined.modifier.dictlets import remap, update
+from pypelined.consumer.socket import udp_send
+from pypelined.consumer.telegraf import telegraf_message, _line_format
+
+try:
+    from pypelined.consumer import alice_apmon
+except ImportError:  # requires apmon
+    alice_apmon = None
+
+from xrootd_decode import REPORT_LINE
+from xrootd_records import KEY_MAP
+
+#: version of the format of result files
+RESULT_FORMAT = 1
+PERCENTILES = (50, 90, 99)
+TAGS = ('pgm', 'info.host', 'site')
+
+
+class Inputs(object):
+    """
+    Data to drive through the benchmarked links
+
+    :param reports: path of recorded ``mpxstats -f cgi`` output, or :py:const:`None` for synthetic reports
+    :param log: path of a recorded log file, or :py:const:`None` for synthetic log lines
+    """
+    def __init__(self, reports=None, log=None):
+        self.sources = {'reports': reports or 'synthetic', 'log': log or 'synthetic'}
+        self.report_lines = _read_lines(reports) if reports else _synthetic_report_lines(64)
+        self.log_lines = _read_lines(log) if log else _synthetic_log_lines(1024)
+        self.reports = [_parse_cgi(line) for line in self.report_lines]
+        self.documents = [_summary_document(report) for report in self.reports]
+        self.messages = [
+            _line_format('xrootd', {tag: report.get(tag) for tag in TAGS}, {'link.in': report.get('link.in')})
+            for report in self.reports
+        ]
+        self.directory = tempfile.mkdtemp(prefix='pypelined-bench-')
+
+    def log_file(self, chunks):
+        """Path of a file with ``chunks`` log lines"""
+        path = os.path.join(self.directory, 'log.%d' % chunks)
+        if not os.path.exists(path):
+            with open(path, 'w') as log_file:
+                for index in range(chunks):
+                    log_file.write(self.log_lines[index % len(self.log_lines)] + '\n')
+        return path
+
+    def close(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def _read_lines(path):
+    with open(path) as recording:
+        lines = [line.rstrip('\n') for line in recording if line.strip()]
+    if not lines:
+        raise ValueError('no data in %r' % path)
+    return lines
+
+
+def _synthetic_report_lines(count):
+    """Report lines of ``count`` daemons with distinct hosts and counters"""
+    lines = []
+    for index in range(count):
+        lines.append(
+            REPORT_LINE
+            .replace('xrd01.example.org', 'xrd%02d.example.org' % index)
+            .replace('pid=4242', 'pid=%d' % (4242 + index))
+            .replace('link.in=18446744073', 'link.in=%d' % (18446744073 + index * 4096))
+        )
+    return lines
+
+
+def _synthetic_log_lines(count):
+    return [
+        '171017 12:%02d:%02d %d XrootdXeq: user.%d:%d@wn%03d.example.org pub IPv4 login as user%d' % (
+            index // 60 % 60, index % 60, 4242 + index % 8, index % 97, index, index % 500, index % 97
+        )
+        for index in range(count)
+    ]
+
+
+def _parse_cgi(line):
+    report = {}
+    for item in line.split('&'):
+        key, value = item.split('=', 1)
+        report[key] = decode_scalar(value)
+    return report
+
+
+def _summary_document(report):
+    """Create an XML summary report which :py:func:`parse_summary` flattens to ``report``"""
+    attributes, tree = [], {}
+    for key, value in report.items():
+        if '.' not in key:
+            attributes.append('%s="%s"' % (key, value))
+            continue
+        node = tree
+        for component in key.split('.'):
+            node = node.setdefault(component, {})
+        node[None] = value
+
+    def render(name, node):
+        text = '' if node.get(None) is None else str(node[None])
+        children = ''.join(render(child, node[child]) for child in node if child is not None)
+        return '<stats id="%s">%s%s</stats>' % (name, text, children)
+    body = ''.join(render(name, node) for name, node in tree.items())
+    return ('<statistics %s>%s</statistics>' % (' '.join(attributes), body)).encode()
+
+
+def _cycle(items):
+    """Callable returning ``items`` in turn"""
+    state = {'index': 0}
+    count = len(items)
+
+    def next_item():
+        index = state['index']
+        state['index'] = index + 1
+        return items[index % count]
+    return next_item
+
+
+# Each case takes the inputs and the number of chunks,
+# and returns a callable processing one chunk and a callable to clean up
+
+def bench_readlines(inputs, chunks):
+    log_file = open(inputs.log_file(chunks))
+    lines = readlines(log_file)
+    return lines.send, log_file.close
+
+
+def bench_tail_path(inputs, chunks):
+    lines = tail_path(inputs.log_file(chunks), follow=False)
+    return lines.send, lines.close
+
+
+def bench_xrootd_cgi(inputs, chunks, records=False):
+    # reports are singletons per port, which is never opened
+    parse = XRootDReports(9932 if records else 9931, records=records)._parse_cgi
+    line = _cycle(inputs.report_lines)
+    return (lambda: parse(line())), None
+
+
+def bench_xrootd_records(inputs, chunks):
+    return bench_xrootd_cgi(inputs, chunks, records=True)
+
+
+def bench_xrootd_xml(inputs, chunks):
+    document = _cycle(inputs.documents)
+    return (lambda: parse_summary(document())), None
+
+
+def _link_case(link, items):
+    send, item = link.send, _cycle(items)
+    return (lambda: send(item())), getattr(link, 'close', None)
+
+
+def bench_remap(inputs, chunks):
+    return _link_case(remap(KEY_MAP), inputs.reports)
+
+
+def bench_update(inputs, chunks):
+    return _link_case(update({'site': 'ALICE::TEST::SE'}), inputs.reports)
+
+
+def bench_telegraf_message(inputs, chunks):
+    return _link_case(telegraf_message('xrootd', dynamic_tags=TAGS), inputs.reports)
+
+
+def bench_line_format(inputs, chunks):
+    report = _cycle(inputs.reports)
+
+    def format_report():
+        fields = report()
+        return _line_format('xrootd', {tag: fields.get(tag) for tag in TAGS}, fields, 1500000000)
+    return format_report, None
+
+
+class _UDPReceiver(object):
+    """Local socket receiving and discarding datagrams"""
+    def __init__(self):
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.bind(('127.0.0.1', 0))
+        self._socket.settimeout(0.1)
+        self.address = self._socket.getsockname()
+        self._running = True
+        self._thread = threading.Thread(target=self._drain)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _drain(self):
+        while self._running:
+            try:
+                self._socket.recv(65536)
+            except socket.timeout:
+                pass
+
+    def close(self):
+        self._running = False
+        self._thread.join()
+        self._socket.close()
+
+
+def bench_udp_send(inputs, chunks, **kwargs):
+    receiver = _UDPReceiver()
+    sender = udp_send(*receiver.address, **kwargs)
+    send, message = sender.send, _cycle(inputs.messages)
+
+    def close():
+        sender.close()
+        receiver.close()
+    return (lambda: send(message())), close
+
+
+def bench_udp_send_packed(inputs, chunks):
+    return bench_udp_send(inputs, chunks, mtu=1400)
+
+
+def bench_space_reporter(inputs, chunks):
+    reporter = alice_apmon.XrootdSpaceReporter()
+    # claim every path for this host only, without synchronising via a shared file system
+    for report in inputs.reports:
+        for index in range(report.get('oss.paths', 0)):
+            reporter._space_counters[report['oss.paths.%d.rp' % index]] = 1
+    return _link_case(reporter, inputs.reports)
+
+
+#: benchmark cases by name, in the order of a pipeline
+CASES = (
+    ('readlines', bench_readlines),
+    ('tail_path', bench_tail_path),
+    ('xrootd.cgi', bench_xrootd_cgi),
+    ('xrootd.cgi_records', bench_xrootd_records),
+    ('xrootd.xml', bench_xrootd_xml),
+    ('remap', bench_remap),
+    ('update', bench_update),
+    ('telegraf_message', bench_telegraf_message),
+    ('_line_format', bench_line_format),
+    ('udp_send', bench_udp_send),
+    ('udp_send.packed', bench_udp_send_packed),
+    ('XrootdSpaceReporter', bench_space_reporter if alice_apmon is not None else None),
+)
+
+
+def _run(case, inputs, chunks, timed=False):
+    """Process ``chunks`` with a fresh ``case``, returning the total time or the time per chunk"""
+    step, close = case(inputs, chunks)
+    clock, latencies = time.perf_counter, []
+    try:
+        if timed:
+            for _ in range(chunks):
+                before = clock()
+                step()
+                latencies.append(clock() - before)
+            return latencies
+        start = clock()
+        for _ in range(chunks):
+            step()
+        return clock() - start
+    finally:
+        if close is not None:
+            close()
+
+
+def _peak_memory(case, inputs, chunks):
+    step, close = case(inputs, chunks)
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        for _ in range(chunks):
+            step()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        if close is not None:
+            close()
+    return max(peak - before, 0)
+
+
+def _percentile(ordered, percentile):
+    return ordered[min(int(len(ordered) * percentile / 100), len(ordered) - 1)]
+
+
+def measure(case, inputs, chunks, repeat):
+    """
+    Measure a benchmark ``case``
+
+    Throughput is the best of ``repeat`` runs without timing individual chunks.
+    Latencies are pooled from ``repeat`` separate runs timing every chunk.
+    """
+    best = min(_run(case, inputs, chunks) for _ in range(repeat))
+    latencies = sorted(latency for _ in range(repeat) for latency in _run(case, inputs, chunks, timed=True))
+    result = {
+        'chunks_per_s': chunks / best,
+        'latency_us': {'p%d' % percentile: _percentile(latencies, percentile) * 1E6 for percentile in PERCENTILES},
+        'peak_memory_bytes': _peak_memory(case, inputs, chunks),
+    }
+    result['latency_us']['max'] = latencies[-1] * 1E6
+    return result
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)), stderr=subprocess.STDOUT,
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def metadata(options, inputs):
+    return {
+        'format': RESULT_FORMAT,
+        'pypelined': __about__.__version__,
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'time': datetime.datetime.utcnow().isoformat() + 'Z',
+        'chunks': options.chunks,
+        'repeat': options.repeat,
+        'inputs': inputs.sources,
+    }
+
+
+def compare(results, previous, threshold):
+    """Print the change of throughput to ``previous`` results and return the regressed cases"""
+    regressions = []
+    print('\ncompared to %s (%s)' % (previous['meta'].get('commit'), previous['meta'].get('time')))
+    for name, result in results.items():
+        try:
+            before = previous['results'][name]['chunks_per_s']
+        except KeyError:
+            continue
+        ratio = result['chunks_per_s'] / before
+        regressed = ratio < 1 - threshold
+        if regressed:
+            regressions.append(name)
+        print('%-20s %12.0f -> %12.0f chunks/s %6.2fx%s' % (
+            name, before, result['chunks_per_s'], ratio, '  REGRESSION' if regressed else ''
+        ))
+    return regressions
+
+
+CLI = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+CLI.add_argument('cases', nargs='*', help='names or prefixes of the cases to run [all]')
+CLI.add_argument('--chunks', type=int, default=10000, help='chunks per run [%(default)s]')
+CLI.add_argument('--repeat', type=int, default=5, help='runs per case [%(default)s]')
+CLI.add_argument('--reports', metavar='PATH', help='recorded mpxstats -f cgi output to use as reports')
+CLI.add_argument('--log', metavar='PATH', help='recorded log file to use as log lines')
+CLI.add_argument('--output', metavar='PATH', help='file to store results in as JSON')
+CLI.add_argument('--compare', metavar='PATH', help='file of previous results to compare to')
+CLI.add_argument(
+    '--threshold', type=float, default=0.1, help='relative loss of throughput considered a regression [%(default)s]'
+)
+CLI.add_argument('--list', action='store_true', help='list all cases and exit')
+
+
+def main():
+    options = CLI.parse_args()
+    selected = [
+        (name, case) for name, case in CASES
+        if not options.cases or any(name.startswith(prefix) for prefix in options.cases)
+    ]
+    if options.list:
+        for name, case in CASES:
+            print(name if case is not None else '%s (unavailable)' % name)
+        return 0
+    inputs = Inputs(reports=options.reports, log=options.log)
+    results = {}
+    try:
+        print('%-20s %12s %9s %9s %9s %9s %12s' % (
+            'case', 'chunks/s', 'p50 us', 'p90 us', 'p99 us', 'max us', 'peak bytes'
+        ))
+        for name, case in selected:
+            if case is None:
+                print('%-20s %12s' % (name, 'unavailable'))
+                continue
+            result = results[name] = measure(case, inputs, options.chunks, options.repeat)
+            latency = result['latency_us']
+            print('%-20s %12.0f %9.2f %9.2f %9.2f %9.1f %12d' % (
+                name, result['chunks_per_s'], latency['p50'], latency['p90'], latency['p99'], latency['max'],
+                result['peak_memory_bytes'],
+            ))
+        document = {'meta': metadata(options, inputs), 'results': results}
+    finally:
+        inputs.close()
+    if options.output:
+        with open(options.output, 'w') as output:
+            json.dump(document, output, indent=2, sort_keys=True)
+    if options.compare:
+        with open(options.compare) as previous:
+            if compare(results, json.load(previous), options.threshold):
+                return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+"""
+Microbenchmark of the telegraf line format encoder
+
+Compares the precompiled :py:class:`~pypelined.consumer.telegraf.LineEncoder`
+against the original per-report :py:func:`~pypelined.consumer.telegraf._line_format`.
+
+.. code:: bash
+
+    python benchmarks/telegraf_encoder.py
+"""
+from __future__ import print_function
+import timeit
+
+from pypelined.consumer.telegraf import LineEncoder, _line_format
+
+NAME = 'xrootd_reports'
+STATIC_TAGS = {'site': 'ALICE::TEST::SE'}
+DYNAMIC_TAGS = ('hostname', 'daemon', 'instance', 'role', 'se_name')
+REPORT = {
+    'daemon': 'xrootd', 'hostname': 'xrd01.example.org', 'instance': 'anon', 'role': 'server',
+    'se_name': 'ALICE::TEST::SE', 'version': 'v4.6.1', 'space_total': 1099511627776,
+    'space_free': 549755813888, 'connections': 1342, 'filehandles': 2011, 'threads': 87,
+    'bytes_recv': 18446744073, 'bytes_sent': 98446744073, 'load': 0.75,
+}
+
+
+def line_format(report=REPORT):
+    message_tags = STATIC_TAGS.copy()
+    message_fields = {}
+    for key in report:
+        if key in DYNAMIC_TAGS:
+            message_tags[key] = report[key]
+        else:
+            message_fields[key] = report[key]
+    return _line_format(name=NAME, tags=message_tags, fields=message_fields, timestamp=1500000000)
+
+
+def main(repeat=5, number=20000):
+    encode = LineEncoder(NAME, static_tags=STATIC_TAGS, dynamic_tags=DYNAMIC_TAGS).encode
+    candidates = (
+        ('_line_format', line_format),
+        ('LineEncoder.encode', lambda: encode(REPORT, timestamp=1500000000)),
+    )
+    baseline = None
+    for label, call in candidates:
+        best = min(timeit.repeat(call, repeat=repeat, number=number)) / number
+        baseline = baseline or best
+        print('%-20s %8.2f us/report %6.2fx' % (label, best * 1E6, baseline / best))
+
+
+if __name__ == '__main__':
+    main()
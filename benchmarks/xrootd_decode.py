@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+"""
+Microbenchmark of decoding xrootd report values
+
+Compares decoding the values of an ``mpxstats -f cgi`` report line via
+:py:func:`~pypelined.utilities.safe_eval` and :py:func:`~pypelined.utilities.decode_scalar`.
+
+Use ``--reports`` to benchmark recorded ``mpxstats -f cgi`` output instead of a synthetic report.
+All decoders are checked to provide the same values as ``safe_eval`` for every report.
+
+.. code:: bash
+
+    python benchmarks/xrootd_decode.py
+    mpxstats -p 9931 -f cgi > reports.cgi
+    python benchmarks/xrootd_decode.py --reports reports.cgi
+"""
+from __future__ import print_function, division
+import argparse
+import timeit
+
+from pypelined.utilities import safe_eval, decode_scalar
+
+#: report of a data server with 24 ``oss.paths`` as provided by ``mpxstats -f cgi``
+REPORT_LINE = '&'.join(
+    [
+        'tod=1500000000', 'ver=v4.6.1', 'src=xrd01.example.org:1094', 'tos=1499990000', 'pgm=xrootd',
+        'ins=anon', 'pid=4242', 'site=ALICE::TEST::SE', 'info.host=xrd01.example.org', 'info.port=1094',
+        'info.name=anon', 'link.num=1342', 'link.maxn=2048', 'link.tot=982734', 'link.in=18446744073',
+        'link.out=98446744073', 'link.ctime=2383', 'link.tmo=12', 'link.stall=0', 'link.sfps=0',
+        'poll.att=1342', 'poll.en=8273492', 'poll.ev=8273012', 'poll.int=0', 'proc.usr.s=23421',
+        'proc.usr.u=234212', 'proc.sys.s=3421', 'proc.sys.u=982734', 'sched.jobs=827349', 'sched.inq=0',
+        'sched.maxinq=12', 'sched.threads=87', 'sched.idle=80', 'sched.tcr=120', 'sched.tde=33',
+        'sched.tlimr=0', 'sgen.as=1', 'sgen.et=3', 'sgen.toe=1500000000', 'ofs.role=server', 'ofs.opr=12',
+        'ofs.opw=3', 'ofs.opp=0', 'ofs.ups=0', 'ofs.han=2011', 'ofs.rdr=0', 'ofs.bxq=0', 'ofs.rep=0',
+        'ofs.err=0', 'ofs.dly=0', 'ofs.sok=0', 'ofs.ser=0', 'ofs.tpc.grnt=0', 'ofs.tpc.deny=0',
+        'ofs.tpc.err=0', 'ofs.tpc.exp=0', 'oss.paths=24', 'oss.space=0', 'cache.load=0.75',
+    ] + [
+        'oss.paths.%d.%s' % (index, item) for index in range(24) for item in (
+            'lp="/data/xrd%02d"' % index, 'rp="/data/xrd%02d"' % index, 'tot=11718749952',
+            'free=%d' % (5859374976 - index * 1000), 'ino=732421872', 'ifr=732001872',
+        )
+    ]
+)
+
+
+def parse(line, decode):
+    datagram = {}
+    for item in line.split('&'):
+        key, value = item.split('=', 1)
+        datagram[key] = decode(value)
+    return datagram
+
+
+def read_reports(path):
+    """Read the report lines recorded from ``mpxstats -f cgi`` at ``path``"""
+    with open(path) as recording:
+        lines = [line.strip() for line in recording if line.strip()]
+    if not lines:
+        raise ValueError('no reports in %r' % path)
+    return lines
+
+
+def parse_all(lines, decode):
+    return [parse(line, decode) for line in lines]
+
+
+def main(repeat=5, number=500, reports=None):
+    lines = [REPORT_LINE] if reports is None else read_reports(reports)
+    candidates = (
+        ('safe_eval', safe_eval),
+        ('decode_scalar', decode_scalar),
+    )
+    reference = parse_all(lines, candidates[0][1])
+    print('%d report(s) with %d keys on average' % (len(lines), sum(map(len, reference)) / len(lines)))
+    # repeat long recordings less often, keeping the number of parsed reports roughly constant
+    number = max(1, number // len(lines))
+    baseline = None
+    for label, decode in candidates:
+        assert parse_all(lines, decode) == reference, 'decoding differs from safe_eval'
+        best = min(timeit.repeat(lambda: parse_all(lines, decode), repeat=repeat, number=number))
+        best /= number * len(lines)
+        baseline = baseline or best
+        print('%-16s %8.1f us/report %6.2fx' % (label, best * 1E6, baseline / best))
+
+
+CLI = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+CLI.add_argument('--reports', metavar='PATH', help='recorded mpxstats -f cgi output to use as reports')
+CLI.add_argument('--repeat', type=int, default=5, help='runs per decoder [%(default)s]')
+CLI.add_argument('--number', type=int, default=500, help='reports parsed per run [%(default)s]')
+
+
+if __name__ == '__main__':
+    options = CLI.parse_args()
+    main(repeat=options.repeat, number=options.number, reports=options.reports)
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+"""
+Benchmark of xrootd reports as dictionaries versus schema-interned records
+
+Compares parsing, remapping and encoding an ``mpxstats -f cgi`` report line
+as a :py:class:`dict` against a :py:class:`~pypelined.utilities.record.Record`.
+Memory is the size of keeping a window of parsed reports alive.
+
+.. code:: bash
+
+    python benchmarks/xrootd_records.py
+"""
+from __future__ import print_function, division
+import timeit
+import tracemalloc
+
+from pypelined.provider.xrootd import XRootDReports
+from pypelined.modifier.dictlets import RemapPlan
+from pypelined.consumer.telegraf import LineEncoder
+
+from xrootd_decode import REPORT_LINE
+
+KEY_MAP = {
+    'pgm': 'daemon', 'info.host': 'hostname', 'ins': 'instance', 'ver': 'version', 'ofs.role': 'role',
+    'site': 'se_name', 'oss.paths.0.tot': 'space_total', 'oss.paths.0.free': 'space_free',
+    'link.num': 'connections', 'ofs.han': 'filehandles', 'sched.threads': 'threads',
+    'link.in': 'bytes_recv', 'link.out': 'bytes_sent'
+}
+WINDOW = 1000
+
+
+def measure_memory(parse):
+    tracemalloc.start()
+    try:
+        window = [parse(REPORT_LINE) for _ in range(WINDOW)]
+        current, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del window
+    return current / WINDOW
+
+
+def main(repeat=5, number=500):
+    remap = RemapPlan(KEY_MAP).remap
+    encode = LineEncoder('xrootd', dynamic_tags=('pgm', 'info.host', 'site')).encode
+    candidates = (
+        ('dict', XRootDReports(9931)._parse_cgi),
+        ('Record', XRootDReports(9932, records=True)._parse_cgi),
+    )
+    report = None
+    for label, parse in candidates:
+        report = parse(REPORT_LINE)
+        parse_time = min(timeit.repeat(lambda: parse(REPORT_LINE), repeat=repeat, number=number)) / number
+        remap_time = min(timeit.repeat(lambda: remap(report), repeat=repeat, number=number)) / number
+        encode_time = min(timeit.repeat(lambda: encode(report), repeat=repeat, number=number)) / number
+        print('%-8s parse %7.1f us  remap %6.2f us  encode %6.1f us  %8.0f bytes/report' % (
+            label, parse_time * 1E6, remap_time * 1E6, encode_time * 1E6, measure_memory(parse)
+        ))
+    print('report with %d keys' % len(report))
+
+
+if __name__ == '__main__':
+    main()
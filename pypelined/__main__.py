@@ -1,11 +1,13 @@
 from __future__ import absolute_import
 import os
 import logging
+import signal
 import argparse
+import functools
 
 from . import __about__
 from .conf import loader, logger
-from . import driver
+from . import driver, instrumentation, metrics, profiler
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -46,6 +48,63 @@ CLI_LOGGING.add_argument(
     nargs='*',
     default=[elem.strip() for elem in os.environ.get(env_key('log-dest'), 'stderr').split(',')]
 )
+CLI_DRIVER = CLI.add_argument_group('driver options')
+CLI_DRIVER.add_argument(
+    '--driver',
+    choices=('threads', 'asyncio'),
+    default=os.environ.get(env_key('driver'), 'threads'),
+    help='run pipelines in one thread each or on one asyncio event loop [%%(default)s] ($%s)' % env_key('driver'),
+)
+CLI_DRIVER.add_argument(
+    '-w', '--workers',
+    metavar='N',
+    type=int,
+    default=int(os.environ.get(env_key('workers'), 0)),
+    help='worker processes to distribute pipelines to, or 0 to run them in the main process'
+         ' [%%(default)s] ($%s)' % env_key('workers'),
+)
+CLI_DRIVER.add_argument(
+    '--instrument',
+    action='store_true',
+    default=os.environ.get(env_key('instrument'), '').lower() in ('1', 'true', 'yes', 'on'),
+    help='count chunks and measure latency of every link, see pypelined.instrumentation ($%s)' % env_key(
+        'instrument'),
+)
+CLI_DRIVER.add_argument(
+    '--metrics',
+    metavar='[HOST:]PORT',
+    default=os.environ.get(env_key('metrics')) or None,
+    help='serve Prometheus/OpenMetrics metrics via HTTP at [HOST:]PORT, implies --instrument'
+         ' [%%(default)s] ($%s)' % env_key('metrics'),
+)
+CLI_PROFILE = CLI.add_argument_group('profiling options')
+CLI_PROFILE.add_argument(
+    '--profile',
+    choices=('start', 'signal'),
+    default=os.environ.get(env_key('profile')) or None,
+    help='sample stacks after startup or on receiving SIGUSR2, see pypelined.profiler'
+         ' [%%(default)s] ($%s)' % env_key('profile'),
+)
+CLI_PROFILE.add_argument(
+    '--profile-duration',
+    metavar='SECONDS',
+    type=float,
+    default=float(os.environ.get(env_key('profile-duration'), 30)),
+    help='time to sample stacks for [%%(default)s] ($%s)' % env_key('profile-duration'),
+)
+CLI_PROFILE.add_argument(
+    '--profile-rate',
+    metavar='HZ',
+    type=float,
+    default=float(os.environ.get(env_key('profile-rate'), 100)),
+    help='samples per second [%%(default)s] ($%s)' % env_key('profile-rate'),
+)
+CLI_PROFILE.add_argument(
+    '--profile-output',
+    metavar='PATH',
+    default=os.environ.get(env_key('profile-output'), profiler.DEFAULT_OUTPUT),
+    help='collapsed stack file, formatted with pid and time [%%(default)s] ($%s)' % env_key('profile-output'),
+)
 
 options = CLI.parse_args()
 
@@ -53,10 +112,36 @@ _LOGGER.warning('## %s [v%s] %s' % (
     __about__.__title__, __about__.__version__, __about__.__url__)
 )
 logger.configure_logging(log_level=options.log_level, log_format=options.log_format, log_dest=options.log_dest)
-for opt_name in ('configuration', 'log_level', 'log_dest', 'log_format'):
+for opt_name in (
+        'configuration', 'log_level', 'log_dest', 'log_format', 'driver', 'workers', 'instrument', 'metrics', 'profile'
+):
     _LOGGER.info('%-16s => %r', opt_name, getattr(options, opt_name))
 pipelines = loader.run_configurations(options.configuration)
-pipeline_driver = driver.PipelineDriver()
+if options.driver == 'asyncio':
+    from .aio import AsyncPipelineDriver as driver_type
+else:
+    driver_type = driver.PipelineDriver
+if options.instrument or options.metrics:
+    driver_type = functools.partial(driver_type, instrumentation=instrumentation.default_instrumentation)
+if options.workers > 0:
+    pipeline_driver = driver.MultiprocessPipelineDriver(options.workers, driver_type=driver_type)
+else:
+    pipeline_driver = driver_type()
 for pipeline in pipelines:
     pipeline_driver.mount(pipeline)
+if options.metrics:
+    if options.workers > 0:
+        _LOGGER.warning('metrics of pipelines in worker processes are not served')
+    metrics.MetricsServer(
+        metrics.parse_address(options.metrics), instrumentation=instrumentation.default_instrumentation
+    ).start()
+if options.profile:
+    sampler = profiler.StackSampler(
+        rate=options.profile_rate, duration=options.profile_duration, output=options.profile_output
+    )
+    profiler.install_signal_handler(sampler)
+    if options.profile == 'start':
+        sampler.start()
+# close all pipelines when terminated, flushing buffered data
+signal.signal(signal.SIGTERM, driver.exit_on_signal)
 pipeline_driver.run()
@@ -0,0 +1,233 @@
+"""
+Driver running all pipelines on a single :py:mod:`asyncio` event loop
+
+Each pipeline is split into its provider and the remaining chain.
+Providers are adapted by :py:func:`async_source` to wait for data on the event loop,
+instead of blocking a thread each.
+The remaining chain is run directly on the event loop if all its links are
+registered as non-blocking via :py:func:`nonblocking`, and in a thread pool otherwise.
+
+:note: This module requires Python 3.5 or newer.
+"""
+import asyncio
+import collections
+import concurrent.futures
+import functools
+import logging
+
+import chainlet
+import chainlet.chainlink
+import chainlet.dataflow
+import chainlet.driver
+
+from .provider import stream, socket as socket_provider, xrootd
+from .modifier import dictlets, batchlets, aggregation, counters
+from .consumer import socket as socket_consumer, telegraf
+from .driver import _unwrap, _instrument
+from .instrumentation import Probe, split_provider
+from .utilities.chains import close_links
+
+__all__ = ['AsyncPipelineDriver', 'async_source', 'nonblocking']
+
+
+class SourceExhausted(Exception):
+    """A provider cannot provide any more values"""
+
+
+_NONBLOCKING = set()
+
+
+def nonblocking(*link_types):
+    """
+    Register types of chain links which never block
+
+    Links of these types are run directly on the event loop of an :py:class:`AsyncPipelineDriver`.
+    """
+    _NONBLOCKING.update(link_types)
+
+
+nonblocking(
+    dictlets.remap, dictlets.update, telegraf.telegraf_message, socket_consumer.UDPSocket,
+    batchlets.Batch, batchlets.Unbatch, aggregation.Aggregate, counters.Rates,
+    chainlet.dataflow.NoOp, chainlet.chainlink.NeutralLink,
+)
+
+
+def _is_nonblocking(link):
+    if isinstance(link, Probe):
+        return _is_nonblocking(link.link)
+    if isinstance(link, chainlet.chainlink.CompoundLink):
+        return all(_is_nonblocking(element) for element in link.elements)
+    return isinstance(link, tuple(_NONBLOCKING))
+
+
+async def _readable(loop, fileno, timeout=None):
+    """Wait until ``fileno`` is readable or ``timeout`` expires"""
+    readable = loop.create_future()
+    loop.add_reader(fileno, lambda: readable.done() or readable.set_result(True))
+    try:
+        await asyncio.wait([readable], timeout=timeout)
+    finally:
+        loop.remove_reader(fileno)
+        readable.cancel()
+
+
+@functools.singledispatch
+def async_source(source, loop, executor):
+    """
+    Adapt a provider to an :py:mod:`asyncio` coroutine function providing values
+
+    :param source: the provider to adapt
+    :type source: :py:class:`chainlet.ChainLink`
+    :param loop: the event loop to wait on
+    :param executor: the executor to run blocking calls in
+    :returns: coroutine function returning the next value of ``source``
+
+    The coroutine function may raise :py:exc:`chainlet.StopTraversal` to skip a value,
+    and raises :py:exc:`SourceExhausted` once ``source`` is exhausted.
+
+    This default implementation runs ``source`` in ``executor``.
+    Use :py:meth:`async_source.register` to provide implementations for new types of providers.
+    """
+    def send():
+        try:
+            return source.chainlet_send(None)
+        except StopIteration:
+            raise SourceExhausted
+
+    async def receive():
+        return await loop.run_in_executor(executor, send)
+    return receive
+
+
+@async_source.register(socket_provider.Socket)
+@async_source.register(stream.TailGlob)
+@async_source.register(stream.TailPath)
+def _async_poll(source, loop, executor):
+    """
+    Adapt a provider which can be polled without blocking
+
+    The provider must implement ``fileno()``, ``delay`` and ``poll(timeout)``
+    as :py:class:`~pypelined.provider.socket.Socket` does.
+    If it provides neither a descriptor nor a delay to wait for, it is polled in ``executor``.
+    """
+    values = collections.deque()
+
+    def poll(timeout):
+        try:
+            return source.poll(timeout)
+        except StopIteration:
+            raise SourceExhausted
+
+    async def receive():
+        while not values:
+            values.extend(poll(0))
+            if values:
+                break
+            fileno, delay = source.fileno(), source.delay
+            if fileno is not None:
+                await _readable(loop, fileno, delay)
+            elif delay is not None:
+                await asyncio.sleep(delay)
+            else:
+                values.extend(await loop.run_in_executor(executor, poll, None))
+        return values.popleft()
+    return receive
+
+
+@async_source.register(socket_provider.UDPDatagrams)
+@async_source.register(xrootd.XRootDReports)
+def _async_background_poll(source, loop, executor):
+    # the event loop receives data itself, instead of a background thread
+    source.open(background=False)
+    return _async_poll(source, loop, executor)
+
+
+class AsyncPipelineDriver(chainlet.driver.ChainDriver):
+    """
+    Driver for processing pipelines on a single :py:mod:`asyncio` event loop
+
+    :param max_workers: number of threads for running blocking chain links
+    :type max_workers: int or None
+    :param instrumentation: instrumentation to wrap all links of mounted pipelines in
+    :type instrumentation: :py:class:`~pypelined.instrumentation.Instrumentation` or None
+
+    Providers are adapted to the event loop directly, so their probes are not used.
+    Pipelines raising an exception are logged and stop,
+    while all other pipelines keep running.
+    Any failed pipelines are available as :py:attr:`failed`.
+    Once all pipelines have stopped or the driver is interrupted,
+    all links of all pipelines are closed.
+    """
+    def __init__(self, max_workers=None, instrumentation=None):
+        super(AsyncPipelineDriver, self).__init__()
+        self._logger = logging.getLogger('%s.%s' % (__name__, self.__class__.__name__))
+        self.max_workers = max_workers
+        self.instrumentation = instrumentation
+        #: pipelines which stopped due to an exception
+        self.failed = []
+
+    def mount(self, *chains):
+        """Add chains to this driver"""
+        super(AsyncPipelineDriver, self).mount(*_instrument(_unwrap(chains), self.instrumentation))
+
+    def run(self):
+        """
+        Collect and pass on reports
+        """
+        self._logger.info('driving %d pipeline(s)', len(self.mounts))
+        self._logger.info('starting %s main loop', self.__class__.__name__)
+        with self._run_lock:
+            pipelines = list(self.mounts)
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers)
+            try:
+                loop.run_until_complete(asyncio.gather(
+                    *(self._drive(mount, loop, executor) for mount in self.mounts)
+                ))
+            finally:
+                executor.shutdown(wait=False)
+                loop.close()
+                close_links(*pipelines)
+        self._logger.info('stopping %s main loop', self.__class__.__name__)
+
+    async def _drive(self, mount, loop, executor):
+        try:
+            await self._pump(mount, loop, executor)
+        except Exception as err:
+            self._logger.exception('pipeline %r failed: %s', mount, err)
+            self.failed.append(mount)
+        self.mounts.remove(mount)
+
+    async def _pump(self, mount, loop, executor):
+        source, remainder = split_provider(mount)
+        receive = async_source(source, loop, executor)
+        inline = remainder is None or _is_nonblocking(remainder)
+        self._logger.info('driving %r %s', mount, 'on event loop' if inline else 'via executor')
+        send = functools.partial(_send, remainder) if remainder is not None else None
+        while True:
+            try:
+                value = await receive()
+            except chainlet.StopTraversal:
+                continue
+            except SourceExhausted:
+                break
+            if send is None:
+                continue
+            if inline:
+                exhausted = send(value)
+            else:
+                exhausted = await loop.run_in_executor(executor, send, value)
+            if exhausted:
+                break
+
+
+def _send(chain, value):
+    """Send ``value`` to ``chain``, returning whether ``chain`` is exhausted"""
+    # StopIteration must not escape into coroutines or futures
+    try:
+        chain.send(value)
+    except StopIteration:
+        return True
+    return False
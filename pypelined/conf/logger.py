@@ -39,3 +39,46 @@ def configure_logging(log_level, log_format, log_dest):
             root_handlers.append(logging.handlers.WatchedFileHandler(filename=destination))
         root_handlers[-1].setFormatter(root_fmt)
     logging.getLogger().handlers[:] = root_handlers
+
+
+class ForwardHandler(logging.Handler):
+    """
+    Handler sending log records via a :py:mod:`multiprocessing` connection
+
+    Records are formatted before sending, so that they can be pickled.
+    """
+    def __init__(self, connection):
+        super(ForwardHandler, self).__init__()
+        self.connection = connection
+
+    def prepare(self, record):
+        self.format(record)
+        record.msg = record.getMessage()
+        record.args = None
+        record.exc_info = None
+        return record
+
+    def emit(self, record):
+        try:
+            self.connection.send(self.prepare(record))
+        except Exception:
+            self.handleError(record)
+
+
+def forward_logging(connection):
+    """
+    Send all log records of this process via ``connection``
+
+    Use this in a worker process to let its parent process handle all logging,
+    which passes each record received to :py:func:`handle_record`.
+    """
+    handler = ForwardHandler(connection)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    logging.getLogger().handlers[:] = [handler]
+
+
+def handle_record(record):
+    """Handle a log record forwarded from another process"""
+    logger = logging.getLogger(record.name)
+    if logger.isEnabledFor(record.levelno):
+        logger.handle(record)
@@ -14,6 +14,7 @@ import chainlet.dataflow
 
 from ..utilities import proctools
 from ..utilities import dfs_counter
+from ..utilities.record import Record
 
 
 class ApMonLogger(object):
@@ -126,11 +127,18 @@ class XrootdSpaceReporter(Reporter):
 
     *space_largestfreechunk*
         The largest, consecutive available space in MiB
+
+    For a :py:class:`~pypelined.utilities.record.Record`, the positions of the
+    version and path fields are resolved once per schema and values are read by position.
     """
 
+    #: maximum number of record schemas to cache
+    max_cached_schemas = 64
+
     def __init__(self, weight_reporters=True):
         super(XrootdSpaceReporter, self).__init__()
         self._space_counters = {}
+        self._schema_plans = {}
         self.weight_reporters = weight_reporters
 
     def chainlet_send(self, value=None):
@@ -149,15 +157,26 @@ class XrootdSpaceReporter(Reporter):
             path_count = report["oss.paths"]
         except KeyError:
             raise chainlet.StopTraversal
+        if type(report) is Record:
+            version, paths = self._record_paths(report, path_count)
+        else:
+            version = report["ver"]
+            paths = (
+                (
+                    report["oss.paths.%d.rp" % path_id],
+                    report["oss.paths.%d.tot" % path_id],
+                    report["oss.paths.%d.free" % path_id],
+                )
+                for path_id in range(path_count)
+            )
         path_stats = {
-            "xrootd_version": report["ver"],
+            "xrootd_version": version,
             "space_total": 0,
             "space_free": 0,
             "space_largestfreechunk": 0,
         }
-        for path_id in range(path_count):
+        for path_rp, path_total, path_free in paths:
             # get real path to volume to count how many reporters see it
-            path_rp = report["oss.paths.%d.rp" % path_id]
             path_reporters = self._get_path_share(path_rp)
             if path_reporters is None:
                 continue
@@ -165,18 +184,45 @@ class XrootdSpaceReporter(Reporter):
                 "adding report (%d reporters) for path %r", path_reporters, path_rp
             )
             # reports are in kiB, MonALISA expects MiB
-            path_stats["space_total"] += (
-                report["oss.paths.%d.tot" % path_id] / path_reporters / 1024
-            )
-            path_stats["space_free"] += (
-                report["oss.paths.%d.free" % path_id] / path_reporters / 1024
-            )
+            path_stats["space_total"] += path_total / path_reporters / 1024
+            path_stats["space_free"] += path_free / path_reporters / 1024
             path_stats["space_largestfreechunk"] = max(
-                path_stats["space_largestfreechunk"],
-                report["oss.paths.%d.free" % path_id] / 1024,
+                path_stats["space_largestfreechunk"], path_free / 1024
             )
         return path_stats
 
+    def _record_paths(self, record, path_count):
+        """Read the version and the ``rp``, ``tot`` and ``free`` of each path of ``record`` by position"""
+        try:
+            version_position, path_positions = self._schema_plans[record.schema]
+        except KeyError:
+            version_position, path_positions = self._compile_schema(record.schema)
+        if path_count > len(path_positions):
+            raise KeyError("oss.paths.%d.rp" % len(path_positions))
+        data = record.data
+        return data[version_position], (
+            (data[rp_position], data[tot_position], data[free_position])
+            for rp_position, tot_position, free_position in path_positions[:path_count]
+        )
+
+    def _compile_schema(self, schema):
+        """Resolve the positions of the version and of all path fields of ``schema``"""
+        index = schema.index
+        path_positions = []
+        while True:
+            try:
+                path_positions.append(tuple(
+                    index["oss.paths.%d.%s" % (len(path_positions), field)]
+                    for field in ("rp", "tot", "free")
+                ))
+            except KeyError:
+                break
+        plan = index["ver"], tuple(path_positions)
+        if len(self._schema_plans) >= self.max_cached_schemas:
+            self._schema_plans.clear()
+        self._schema_plans[schema] = plan
+        return plan
+
     def _get_path_share(self, path):
         """Get the number of hosts reporting the same space share"""
         if path not in self._space_counters:
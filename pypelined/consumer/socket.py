@@ -3,6 +3,8 @@ import socket
 
 import chainlet
 
+from ..utilities import batching, mmsg
+
 
 class BaseSocket(chainlet.ChainLink):
     def __init__(self, host, port, encoding='utf-8'):
@@ -29,6 +31,20 @@ class BaseSocket(chainlet.ChainLink):
         return '%s(%s, %s)' % (self.__class__.__name__, self.host, self.port)
 
 
+def _pack_datagrams(messages, mtu):
+    """Greedily join consecutive ``messages`` to datagrams of at most ``mtu`` bytes"""
+    datagrams, datagram, datagram_size = [], [], 0
+    for message in messages:
+        if datagram and datagram_size + len(message) > mtu:
+            datagrams.append(b''.join(datagram))
+            datagram, datagram_size = [], 0
+        datagram.append(message)
+        datagram_size += len(message)
+    if datagram:
+        datagrams.append(b''.join(datagram))
+    return datagrams
+
+
 class UDPSocket(BaseSocket):
     """
     Chainable socket that sends data chunks via UDP using IPv4
@@ -37,18 +53,103 @@ class UDPSocket(BaseSocket):
     :type host: str
     :param port: port to send messages to
     :type port: int
+    :param batch_size: maximum number of datagrams to send at once, or :py:const:`None` to disable batching
+    :type batch_size: int or None
+    :param batch_bytes: maximum number of bytes to send at once
+    :type batch_bytes: int or None
+    :param max_delay: maximum time in seconds a datagram is delayed by batching
+    :type max_delay: float
+    :param mtu: maximum size of datagrams to pack several chunks into, or :py:const:`None` to disable packing
+    :type mtu: int or None
+
+    By default, every chunk is sent immediately as a datagram.
+    If ``batch_size`` is set, chunks are collected and sent in batches of
+    up to ``batch_size`` datagrams or ``batch_bytes`` bytes, and at the latest
+    after ``max_delay`` seconds.
+    Each batch is sent with a single ``sendmmsg`` system call if available,
+    and individual ``sendto`` calls otherwise.
+    Batching does not delay the chunk for subsequent elements of a chain.
+
+    If ``mtu`` is set, consecutive chunks are concatenated into datagrams
+    of at most ``mtu`` bytes, and batches are limited to ``batch_size``
+    datagrams of ``mtu`` bytes each.
+    Chunks are never split, and a chunk larger than ``mtu`` is sent as a datagram
+    of its own.
+    Since chunks are joined without any separator, they must be self-delimiting,
+    such as newline terminated records.
+
+    A data chunk may also be a :py:class:`list` of messages, as provided by
+    :py:func:`~pypelined.modifier.batchlets.batch`, which are sent as
+    individual datagrams.
+    Without batching, such a list is sent at once via ``sendmmsg`` if available.
     """
-    def __init__(self, host, port):
+    _family = socket.AF_INET
+
+    def __init__(self, host, port, batch_size=None, batch_bytes=None, max_delay=0.05, mtu=None):
         super(UDPSocket, self).__init__(host, port)
-        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket = socket.socket(self._family, socket.SOCK_DGRAM)
+        self._buffer = None
+        self._resolved = None
+        self.mtu = mtu
+        if mtu is not None:
+            self._resolve_address()
+            self._buffer = batching.LingerBuffer(
+                flush=self._send_packed, max_count=None, max_size=batch_bytes or mtu * (batch_size or 1),
+                max_delay=max_delay,
+            )
+        elif batch_size is not None:
+            self._resolve_address()
+            self._buffer = batching.LingerBuffer(
+                flush=self._send_batch, max_count=batch_size, max_size=batch_bytes, max_delay=max_delay,
+            )
+
+    @property
+    def statistics(self):
+        """Statistics on sent batches or :py:const:`None` if batching is disabled"""
+        if self._buffer is None:
+            return None
+        return self._buffer.statistics
+
+    def _resolve_address(self):
+        """Resolve the target address only once for sending batches"""
+        self._resolved = socket.getaddrinfo(self._address[0], self._address[1], self._family, socket.SOCK_DGRAM)[0][4]
+        self._sockaddr = mmsg.sockaddr(self._family, self._resolved) if mmsg.HAS_SENDMMSG else None
+
+    def _send_batch(self, messages):
+        if self._sockaddr is not None:
+            mmsg.sendmmsg(self._socket, messages, self._sockaddr)
+        else:
+            sendto, address = self._socket.sendto, self._resolved
+            for message in messages:
+                sendto(message, address)
+
+    def _send_packed(self, messages):
+        self._send_batch(_pack_datagrams(messages, self.mtu))
 
     def chainlet_send(self, value=None):
         """Send pipeline value to ``host:port`` without consuming it"""
+        if type(value) is list:
+            messages = [self._encode(item) for item in value]
+            if self._buffer is not None:
+                self._buffer.extend(messages)
+            else:
+                if self._resolved is None:
+                    self._resolve_address()
+                self._send_batch(messages)
+            return value
         message = self._encode(value)
+        if self._buffer is not None:
+            self._buffer.append(message)
+            return value
         while message:
             message = message[self._socket.sendto(message, self._address):]
         return value
 
+    def close(self):
+        """Send any pending batches"""
+        if self._buffer is not None:
+            self._buffer.close()
+
 
 class UDP6Socket(UDPSocket):
     """
@@ -58,10 +159,11 @@ class UDP6Socket(UDPSocket):
     :type host: str
     :param port: port to send messages to
     :type port: int
+
+    See :py:class:`UDPSocket` for batching options.
     """
-    def __init__(self, host, port):
-        super(UDP6Socket, self).__init__(host, port)
-        self._socket = socket.socket(socket.AF_INET6, socket.SOCK_DGRAM)
+    _family = socket.AF_INET6
+
 
 udp_send = UDPSocket
 udp6_send = UDP6Socket
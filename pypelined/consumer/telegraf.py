@@ -1,8 +1,12 @@
 from __future__ import absolute_import, division
 import time
+import numbers
 
 import chainlet
 
+from .socket import udp_send, udp6_send
+from ..utilities.record import Record
+
 
 def _line_format(name, tags, fields, timestamp=None):
     """
@@ -28,6 +32,229 @@ def _line_format(name, tags, fields, timestamp=None):
     return output_str + '\n'
 
 
+def _escape_measurement(name):
+    """Escape a measurement name for line protocol"""
+    return name.replace(',', r'\,').replace(' ', r'\ ')
+
+
+def _escape_key(key):
+    """Escape a tag key, tag value or field key for line protocol"""
+    return str(key).replace(',', r'\,').replace('=', r'\=').replace(' ', r'\ ')
+
+
+def _format_string(value):
+    return '"%s"' % str(value).replace('\\', '\\\\').replace('"', '\\"')
+
+
+def _format_bool(value):
+    return 'true' if value else 'false'
+
+
+def _format_int(value):
+    return '%di' % value
+
+
+def _format_field(value):
+    """Format a field value for line protocol, including its type suffix"""
+    if isinstance(value, bool):
+        return _format_bool(value)
+    elif isinstance(value, numbers.Integral):
+        return _format_int(value)
+    elif isinstance(value, numbers.Real):
+        return repr(float(value))
+    return _format_string(value)
+
+
+class _FieldFormatters(dict):
+    """Mapping from ``type(value)`` to the formatter for ``value``"""
+    def __missing__(self, key):
+        self[key] = _format_field
+        return _format_field
+
+
+class _EscapeCache(dict):
+    """Mapping from keys to their escaped form, followed by ``suffix``"""
+    def __init__(self, suffix=''):
+        super(_EscapeCache, self).__init__()
+        self.suffix = suffix
+
+    def __missing__(self, key):
+        self[key] = escaped = _escape_key(key) + self.suffix
+        return escaped
+
+
+class _TagValueCache(dict):
+    """Mapping from the ``(type, value)`` of tag values to their escaped form"""
+    # values such as True, 1 and 1.0 are equal, but are rendered differently
+    def __missing__(self, key):
+        self[key] = escaped = _escape_key(key[1])
+        return escaped
+
+
+# builtin methods avoid the overhead of calling a python function for the most common types
+_FIELD_FORMATTERS = _FieldFormatters({
+    bool: {True: 'true', False: 'false'}.__getitem__, int: '%di'.__mod__, float: repr, str: _format_string
+})
+try:
+    _FIELD_FORMATTERS[long] = '%di'.__mod__
+    _FIELD_FORMATTERS[unicode] = _format_string
+except NameError:
+    pass
+
+
+class LineEncoder(object):
+    """
+    Encoder for reports to InfluxDB line format
+
+    :param name: name of the measurement, optionally as a format string for each report
+    :type name: str
+    :param static_tags: predefined tags to identify the measurement
+    :type static_tags: dict[str, str]
+    :param dynamic_tags: keys to read from each report and add as tags
+    :type dynamic_tags: set[str], list[str], tuple[str]
+    :param fields: keys of the report to pass on as fields; if :py:const:`None`, pass on all non-tag keys
+    :type fields: set[str], list[str], tuple[str] or None
+
+    All static information is prepared once: the measurement name and static tags
+    are rendered and escaped in advance, and the escaped form of every key is cached.
+    Encoding a report only formats its values and joins the line in one operation.
+
+    Fields are formatted according to their type: integers with an ``i`` suffix,
+    floats as decimals, booleans as ``true``/``false``, and anything else as a
+    quoted string.
+
+    For a :py:class:`~pypelined.utilities.record.Record`, the positions of all tags
+    and fields are resolved once per schema and values are read by position.
+    """
+    #: maximum number of escaped tag values to cache
+    max_cached_values = 4096
+    #: maximum number of record schemas to cache
+    max_cached_schemas = 64
+
+    def __init__(self, name, static_tags=None, dynamic_tags=(), fields=None):
+        self.name = name
+        self._dynamic_name = '%' in name
+        self._measurement = _escape_measurement(name)
+        static_tags = static_tags or {}
+        self._dynamic_tags = frozenset(dynamic_tags)
+        self._fields = tuple(sorted(set(fields) - self._dynamic_tags)) if fields is not None else None
+        self._tag_plan = self._compile_tags(static_tags, self._dynamic_tags)
+        self._field_keys = _EscapeCache('=')
+        self._tag_values = _TagValueCache()
+        self._timestamp = None, None
+        self._schema_plans = {}
+
+    @staticmethod
+    def _compile_tags(static_tags, dynamic_tags):
+        """Create the sequence of ``(static_prefix, tag_prefix, key)`` to render tags in sorted order"""
+        tag_plan, static_prefix = [], ''
+        for key in sorted(set(static_tags) | dynamic_tags):
+            if key in dynamic_tags:
+                tag_plan.append((static_prefix, ',' + _escape_key(key) + '=', key))
+                static_prefix = ''
+            else:
+                static_prefix += ',%s=%s' % (_escape_key(key), _escape_key(static_tags[key]))
+        if static_prefix:
+            tag_plan.append((static_prefix, None, None))
+        return tuple(tag_plan)
+
+    def encode(self, report, timestamp=None):
+        """
+        Encode a ``report`` to a line
+
+        :param report: the report to encode
+        :type report: dict[str]
+        :param timestamp: when the measurement was taken, in **seconds** since the epoch
+        :type timestamp: float, int or None
+        :returns: the report in line format, including a trailing newline
+        :rtype: str
+        """
+        parts = [_escape_measurement(self.name % report) if self._dynamic_name else self._measurement]
+        if type(report) is Record:
+            self._record_parts(report, parts)
+        else:
+            self._mapping_parts(report, parts)
+        if timestamp is None:
+            parts.append('\n')
+        elif timestamp == self._timestamp[0]:
+            parts.append(self._timestamp[1])
+        else:
+            # line protocol requires nanosecond precision, python uses seconds
+            self._timestamp = timestamp, ' %d\n' % (timestamp * 1E9)
+            parts.append(self._timestamp[1])
+        if len(self._tag_values) > self.max_cached_values:
+            self._tag_values.clear()
+        return ''.join(parts)
+
+    def _mapping_parts(self, report, parts):
+        """Add the tags and fields of a mapping ``report`` to ``parts``"""
+        tag_values = self._tag_values
+        for static_prefix, tag_prefix, key in self._tag_plan:
+            if static_prefix:
+                parts.append(static_prefix)
+            if key is not None and key in report:
+                parts.append(tag_prefix)
+                value = report[key]
+                parts.append(tag_values[value.__class__, value])
+        parts.append(' ')
+        field_keys, formatters = self._field_keys, _FIELD_FORMATTERS
+        if self._fields is None:
+            dynamic_tags = self._dynamic_tags
+            parts.append(','.join([
+                field_keys[key] + formatters[type(value)](value)
+                for key, value in report.items() if key not in dynamic_tags
+            ]))
+        else:
+            parts.append(','.join([
+                field_keys[key] + formatters[type(report[key])](report[key])
+                for key in self._fields if key in report
+            ]))
+
+    def _record_parts(self, record, parts):
+        """Add the tags and fields of a :py:class:`~pypelined.utilities.record.Record` to ``parts``"""
+        try:
+            tag_plan, field_keys, field_positions = self._schema_plans[record.schema]
+        except KeyError:
+            tag_plan, field_keys, field_positions = self._compile_schema(record.schema)
+        data, tag_values = record.data, self._tag_values
+        for static_prefix, tag_prefix, position in tag_plan:
+            if static_prefix:
+                parts.append(static_prefix)
+            if position is not None:
+                parts.append(tag_prefix)
+                value = data[position]
+                parts.append(tag_values[value.__class__, value])
+        parts.append(' ')
+        formatters = _FIELD_FORMATTERS
+        parts.append(','.join([
+            field_key + formatters[type(value)](value)
+            for field_key, value in zip(field_keys, [data[position] for position in field_positions])
+        ]))
+
+    def _compile_schema(self, schema):
+        """Create the plan to render the tags and fields of records of ``schema`` by position"""
+        if len(self._schema_plans) >= self.max_cached_schemas:
+            self._schema_plans.clear()
+        index = schema.index
+        tag_plan = tuple(
+            (static_prefix, tag_prefix, index.get(key) if key is not None else None)
+            for static_prefix, tag_prefix, key in self._tag_plan
+        )
+        if self._fields is None:
+            fields = [key for key in schema.keys if key not in self._dynamic_tags]
+        else:
+            fields = [key for key in self._fields if key in index]
+        field_keys = tuple(self._field_keys[key] for key in fields)
+        field_positions = tuple(index[key] for key in fields)
+        self._schema_plans[schema] = plan = tag_plan, field_keys, field_positions
+        return plan
+
+    def __repr__(self):
+        return '%s(name=%r, dynamic_tags=%r, fields=%r)' % (
+            self.__class__.__name__, self.name, tuple(self._dynamic_tags), self._fields
+        )
+
+
 @chainlet.genlet
 def telegraf_message(name, static_tags=None, dynamic_tags=(), fields=None, time_resolution=1):
     """
@@ -43,21 +270,45 @@ def telegraf_message(name, static_tags=None, dynamic_tags=(), fields=None, time_
     :type fields: set[str], list[str], tuple[str] or None
     :param time_resolution: resolution at which timestamps are reported, in seconds
     :type time_resolution: int or float
+
+    Reports are encoded by a :py:class:`LineEncoder` prepared once for the configuration.
+
+    If a data chunk is a :py:class:`list` of reports, as provided by
+    :py:func:`~pypelined.modifier.batchlets.batch`, a :py:class:`list`
+    of messages is provided.
+    All reports of such a batch share the same timestamp.
     """
-    static_tags = static_tags or {}
+    encode = LineEncoder(name=name, static_tags=static_tags, dynamic_tags=dynamic_tags, fields=fields).encode
     report = yield
     while True:
-        message_tags = static_tags.copy()
-        message_fields = {}
-        for key in report:
-            if key in dynamic_tags:
-                message_tags[key] = report[key]
-            elif fields is None or key in fields:
-                message_fields[key] = report[key]
-        message = _line_format(
-                name=name % report,
-                tags=message_tags,
-                fields=message_fields,
-                timestamp=(time.time() // time_resolution)*time_resolution
-            )
-        report = yield message
+        timestamp = (time.time() // time_resolution) * time_resolution
+        if type(report) is list:
+            report = yield [encode(item, timestamp) for item in report]
+        else:
+            report = yield encode(report, timestamp=timestamp)
+
+
+def telegraf(address, name, static_tags=None, dynamic_tags=(), fields=None, time_resolution=1, mtu=1400,
+             max_delay=1.0):
+    """
+    Factory for sending mapping data to telegraf via UDP
+
+    :param address: ``(host, port)`` of the telegraf UDP listener
+    :type address: tuple[str, int]
+    :param mtu: maximum size of datagrams to pack reports into
+    :type mtu: int
+    :param max_delay: maximum time in seconds a report waits for a datagram to fill up
+    :type max_delay: float
+
+    See :py:func:`telegraf_message` for all other parameters.
+
+    Consecutive reports are packed into datagrams of up to ``mtu`` bytes.
+    This drastically reduces the number of packets compared to sending
+    each report individually, while no report is ever split across datagrams.
+    """
+    host, port = address
+    sender = udp6_send if ':' in host else udp_send
+    return telegraf_message(
+        name=name, static_tags=static_tags, dynamic_tags=dynamic_tags, fields=fields,
+        time_resolution=time_resolution,
+    ) >> sender(host, port, mtu=mtu, max_delay=max_delay)
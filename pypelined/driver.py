@@ -1,16 +1,89 @@
 from __future__ import division, absolute_import
 import logging
+import multiprocessing
+import select
+import signal
+import sys
+import time
 
 import chainlet.driver
 
+from .conf import logger
+from .utilities.chains import close_links
+
+
+class Replicated(object):
+    """
+    A pipeline to run as several copies in different worker processes
+
+    :param pipeline: the pipeline to run
+    :param copies: number of copies, or :py:const:`None` for one per worker process
+    :type copies: int or None
+
+    Each copy is an independent duplicate of ``pipeline`` in a separate process.
+    This is only useful if the provider of ``pipeline`` can be shared,
+    for example a socket which allows several processes to receive from it.
+    At most one copy runs per worker process,
+    and drivers without worker processes run ``pipeline`` only once.
+    """
+    def __init__(self, pipeline, copies=None):
+        if copies is not None and copies < 1:
+            raise ValueError('copies must be positive')
+        self.pipeline = pipeline
+        self.copies = copies
+
+    def __repr__(self):
+        return '%s(%r, copies=%s)' % (self.__class__.__name__, self.pipeline, self.copies)
+
+
+replicated = Replicated
+
+
+def _unwrap(chains):
+    return [chain.pipeline if isinstance(chain, Replicated) else chain for chain in chains]
+
+
+def _instrument(chains, instrumentation):
+    if instrumentation is None:
+        return chains
+    return [instrumentation.instrument(chain) for chain in chains]
+
+
+def exit_on_signal(signum, frame):
+    """
+    Signal handler to exit via :py:exc:`SystemExit`, running all cleanup handlers
+
+    Install this for :py:data:`signal.SIGTERM` to close all pipelines of a driver
+    when the process is terminated, instead of dying without flushing buffered data.
+    """
+    sys.exit(128 + signum)
+
 
 class PipelineDriver(chainlet.driver.ThreadedChainDriver):
     """
     Driver for processing pipelines
+
+    :param instrumentation: instrumentation to wrap all links of mounted pipelines in
+    :type instrumentation: :py:class:`~pypelined.instrumentation.Instrumentation` or None
+
+    Pipelines raising an exception are logged and stop,
+    while all other pipelines keep running.
+    Any failed pipelines are available as :py:attr:`failed`.
+
+    Once all pipelines have stopped or the driver is interrupted,
+    all links of all pipelines are closed.
+    This flushes links which buffer data, such as batching sockets.
     """
-    def __init__(self):
+    def __init__(self, instrumentation=None):
         super(PipelineDriver, self).__init__()
         self._logger = logging.getLogger('%s.%s' % (__name__, self.__class__.__name__))
+        self.instrumentation = instrumentation
+        #: pipelines which stopped due to an exception
+        self.failed = []
+
+    def mount(self, *chains):
+        """Add chains to this driver"""
+        super(PipelineDriver, self).mount(*_instrument(_unwrap(chains), self.instrumentation))
 
     def run(self):
         """
@@ -18,5 +91,184 @@ class PipelineDriver(chainlet.driver.ThreadedChainDriver):
         """
         self._logger.info('driving %d pipeline(s)', len(self.mounts))
         self._logger.info('starting %s main loop', self.__class__.__name__)
-        super(PipelineDriver, self).run()
+        pipelines = list(self.mounts)
+        try:
+            super(PipelineDriver, self).run()
+        finally:
+            close_links(*pipelines)
         self._logger.info('stopping %s main loop', self.__class__.__name__)
+
+    def _mount_driver(self, mount):
+        try:
+            super(PipelineDriver, self)._mount_driver(mount)
+        except Exception as err:
+            self._logger.exception('pipeline %r failed: %s', mount, err)
+            self.failed.append(mount)
+
+
+def _run_worker(pipelines, driver_type, log_connection):
+    """Run ``pipelines`` in a worker process, exiting with an error if any pipeline fails"""
+    logger.forward_logging(log_connection)
+    # the supervisor terminates workers on shutdown, which must close their pipelines
+    signal.signal(signal.SIGTERM, exit_on_signal)
+    worker_logger = logging.getLogger('%s.worker' % __name__)
+    worker_driver = driver_type()
+    worker_driver.mount(*pipelines)
+    try:
+        worker_driver.run()
+    except Exception as err:
+        worker_logger.exception('worker driver failed: %s', err)
+        sys.exit(1)
+    if getattr(worker_driver, 'failed', None):
+        worker_logger.error('%d pipeline(s) failed', len(worker_driver.failed))
+        sys.exit(1)
+
+
+class _Worker(object):
+    """Supervision state of a worker process"""
+    def __init__(self, index):
+        self.index = index
+        self.pipelines = []
+        self.process = None
+        #: receiving end of log records sent by the process
+        self.log_reader = None
+        self.started = None
+        self.restart_at = None
+        self.restart_delay = None
+
+
+class MultiprocessPipelineDriver(chainlet.driver.ChainDriver):
+    """
+    Driver for processing pipelines in several worker processes
+
+    :param workers: number of worker processes
+    :type workers: int
+    :param driver_type: driver used by each worker to run its pipelines
+    :type driver_type: type
+    :param restart_delay: initial delay in seconds before restarting a failed worker
+    :type restart_delay: float
+    :param max_restart_delay: maximum delay in seconds before restarting a failed worker
+    :type max_restart_delay: float
+
+    Pipelines are distributed round-robin to ``workers`` processes,
+    while copies of :py:class:`Replicated` pipelines are spread over
+    as many processes as possible.
+    Worker processes are forked, so pipelines need not be pickled.
+
+    Worker processes failing unexpectedly are restarted with fresh copies of their pipelines.
+    Consecutive failures double the delay up to ``max_restart_delay``,
+    which resets once a worker has been running for ``max_restart_delay``.
+    Log records of workers are forwarded to and handled by the main process.
+    When the driver stops, remaining workers are terminated via :py:data:`signal.SIGTERM`
+    and close the links of their pipelines as done by their ``driver_type``.
+    """
+    def __init__(self, workers, driver_type=PipelineDriver, restart_delay=1.0, max_restart_delay=60.0):
+        super(MultiprocessPipelineDriver, self).__init__()
+        self._logger = logging.getLogger('%s.%s' % (__name__, self.__class__.__name__))
+        if workers < 1:
+            raise ValueError('workers must be positive')
+        self.workers = workers
+        self.driver_type = driver_type
+        self.restart_delay = restart_delay
+        self.max_restart_delay = max_restart_delay
+        try:
+            self._context = multiprocessing.get_context('fork')
+        except AttributeError:  # python2 always forks
+            self._context = multiprocessing
+
+    def _assign(self):
+        """Distribute all pipelines to workers"""
+        workers = [_Worker(index) for index in range(self.workers)]
+        next_worker = 0
+        for mount in self.mounts:
+            if isinstance(mount, Replicated):
+                copies = mount.copies or self.workers
+                if copies > self.workers:
+                    # copies in the same worker would share the same pipeline object
+                    self._logger.warning('running %d instead of %d copies of %r, one per worker',
+                                         self.workers, copies, mount.pipeline)
+                    copies = self.workers
+                for copy in range(copies):
+                    workers[(next_worker + copy) % self.workers].pipelines.append(mount.pipeline)
+                next_worker = (next_worker + copies) % self.workers
+            else:
+                workers[next_worker].pipelines.append(mount)
+                next_worker = (next_worker + 1) % self.workers
+        return [worker for worker in workers if worker.pipelines]
+
+    def _start(self, worker):
+        if worker.log_reader is not None:
+            worker.log_reader.close()
+        worker.log_reader, log_writer = self._context.Pipe(duplex=False)
+        worker.process = self._context.Process(
+            target=_run_worker, args=(worker.pipelines, self.driver_type, log_writer),
+            name='pypelined worker %d' % worker.index,
+        )
+        worker.process.daemon = True
+        worker.process.start()
+        log_writer.close()
+        worker.started, worker.restart_at = time.time(), None
+        self._logger.info('started worker %d [pid %d] with %d pipeline(s)', worker.index, worker.process.pid,
+                          len(worker.pipelines))
+
+    def _supervise(self, worker):
+        """Restart ``worker`` if required, returning whether it is still in use"""
+        if worker.process.is_alive():
+            return True
+        now = time.time()
+        if worker.restart_at is None:
+            exitcode = worker.process.exitcode
+            if exitcode == 0:
+                self._logger.info('worker %d [pid %d] finished', worker.index, worker.process.pid)
+                return False
+            if worker.restart_delay is None or now - worker.started > self.max_restart_delay:
+                worker.restart_delay = self.restart_delay
+            else:
+                worker.restart_delay = min(self.max_restart_delay, worker.restart_delay * 2)
+            worker.restart_at = now + worker.restart_delay
+            self._logger.error('worker %d [pid %d] failed with exit code %s, restarting in %.1fs',
+                               worker.index, worker.process.pid, exitcode, worker.restart_delay)
+        elif now >= worker.restart_at:
+            self._start(worker)
+        return True
+
+    @staticmethod
+    def _forward_logs(workers, timeout):
+        """Handle log records sent by ``workers``, waiting up to ``timeout`` for any"""
+        readers = [worker.log_reader for worker in workers if worker.log_reader is not None]
+        if not readers:
+            time.sleep(timeout)
+            return
+        readable, _, _ = select.select(readers, [], [], timeout)
+        for worker in workers:
+            if worker.log_reader not in readable:
+                continue
+            try:
+                while worker.log_reader.poll():
+                    logger.handle_record(worker.log_reader.recv())
+            except EOFError:
+                # the worker has exited and closed its end
+                worker.log_reader.close()
+                worker.log_reader = None
+
+    def run(self):
+        """
+        Collect and pass on reports
+        """
+        with self._run_lock:
+            workers = self._assign()
+            self._logger.info('driving %d pipeline(s) in %d worker(s)', len(self.mounts), len(workers))
+            self._logger.info('starting %s main loop', self.__class__.__name__)
+            try:
+                for worker in workers:
+                    self._start(worker)
+                while workers:
+                    self._forward_logs(workers, 0.5)
+                    workers = [worker for worker in workers if self._supervise(worker)]
+                self.mounts[:] = []
+            finally:
+                for worker in workers:
+                    if worker.process.is_alive():
+                        worker.process.terminate()
+                    worker.process.join()
+            self._logger.info('stopping %s main loop', self.__class__.__name__)
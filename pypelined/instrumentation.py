@@ -0,0 +1,424 @@
+"""
+Instrumentation of pipelines, counting data chunks and measuring latency per link
+
+An :py:class:`Instrumentation` wraps every link of the pipelines mounted by a driver
+with a :py:class:`Probe`.
+Each probe counts the data chunks received and provided by its link,
+the chunks skipped via :py:exc:`chainlet.StopTraversal`, the exceptions raised,
+and the latency of processing each chunk in a histogram with fixed buckets.
+To keep the overhead low, only every ``sample_interval``'th chunk is timed,
+and chains which neither fork nor join call the links of their probes directly.
+
+Chains run by a :py:class:`~pypelined.modifier.parallel.Buffer` or
+:py:class:`~pypelined.modifier.parallel.FanOut` are instrumented as well,
+with positions below the position of their link, such as ``"2.1.0"`` for the
+first link of the second branch of a :py:class:`~pypelined.modifier.parallel.FanOut` at ``"2"``.
+Branches running in separate processes are not instrumented,
+since their counters would not be visible to this process.
+
+The counters are exposed as a snapshot of reports, one per link.
+Use :py:meth:`Instrumentation.reports` to feed these reports into a pipeline:
+
+.. code:: python
+
+    from pypelined.conf import pipelines
+    from pypelined.instrumentation import default_instrumentation
+    from pypelined.consumer.telegraf import telegraf
+
+    pipelines.append(
+        default_instrumentation.reports(interval=60) >>
+        telegraf(('localhost', 8094), name='pypelined', dynamic_tags=('pipeline', 'link', 'type'))
+    )
+
+The :py:data:`default_instrumentation` is used by the ``pypelined`` command
+if it is run with the ``--instrument`` option.
+"""
+from __future__ import absolute_import, division
+import bisect
+import os
+import threading
+import time
+
+import chainlet
+import chainlet.chainlink
+
+from .modifier import parallel
+
+__all__ = ['Instrumentation', 'Probe', 'LinkStatistics', 'split_provider', 'default_instrumentation']
+
+try:
+    _clock = time.perf_counter
+except AttributeError:  # python2
+    _clock = time.time
+
+#: upper bounds of latency buckets in seconds; the last bucket holds all higher latencies
+LATENCY_BUCKETS = (
+    0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, float('inf'),
+)
+
+
+class LinkStatistics(object):
+    """
+    Counters of the data chunks processed by a single link
+
+    :param pipeline: index of the pipeline containing the link
+    :type pipeline: int
+    :param path: position of the link in its pipeline, such as ``"2"`` or ``"2.1"`` in a fork
+    :type path: str
+    :param name: name of the type of the link
+    :type name: str
+
+    Counters are plain attributes which are updated without locking.
+    If the same link is used concurrently by several threads,
+    some updates may be lost and counters are approximate.
+    """
+    __slots__ = (
+        'pipeline', 'path', 'name', '_received', '_upstream', 'forked', 'skipped', 'errors', 'latency', 'latency_sum',
+    )
+
+    def __init__(self, pipeline, path, name):
+        self.pipeline = pipeline
+        self.path = path
+        self.name = name
+        self._received = 0
+        # statistics of all preceding links of a flat chain, which only counts chunks at its first link
+        self._upstream = None
+        #: data chunks provided by a forking link in excess of the chunks it processed
+        self.forked = 0
+        #: data chunks dropped via :py:exc:`chainlet.StopTraversal`
+        self.skipped = 0
+        #: exceptions raised by the link
+        self.errors = 0
+        #: number of sampled chunks per bucket of :py:data:`LATENCY_BUCKETS`
+        self.latency = [0] * len(LATENCY_BUCKETS)
+        #: total time in seconds spent in the link for sampled chunks
+        self.latency_sum = 0.0
+
+    @property
+    def received(self):
+        """Data chunks sent to the link"""
+        upstream = self._upstream
+        if not upstream:
+            return self._received
+        return upstream[0]._received - sum(statistics.skipped + statistics.errors for statistics in upstream)
+
+    @property
+    def provided(self):
+        """Data chunks provided by the link"""
+        return self.received - self.skipped - self.errors + self.forked
+
+    def report(self):
+        """Create a report of the current counters"""
+        report = {
+            'pipeline': self.pipeline, 'link': self.path, 'type': self.name,
+            'received': self.received, 'provided': self.provided, 'skipped': self.skipped, 'errors': self.errors,
+            'latency.sum': self.latency_sum,
+        }
+        count = 0
+        for bound, bucket in zip(LATENCY_BUCKETS, self.latency):
+            count += bucket
+            report['latency.le_%g' % bound] = count
+        return report
+
+    def __repr__(self):
+        return '<%s %d:%s %s received=%d>' % (
+            self.__class__.__name__, self.pipeline, self.path, self.name, self.received
+        )
+
+
+class Probe(chainlet.ChainLink):
+    """
+    Wrapper around a ``link`` updating its :py:class:`LinkStatistics`
+
+    :param link: the link to instrument
+    :type link: :py:class:`chainlet.ChainLink`
+    :param statistics: the counters to update
+    :type statistics: :py:class:`LinkStatistics`
+    :param sample_interval: measure the latency of every ``sample_interval``'th chunk, a power of two
+    :type sample_interval: int
+
+    All chunks are counted, but only a sample of chunks is timed to keep the overhead low.
+    The latency of a provider includes the time spent waiting for new data.
+    """
+    def __init__(self, link, statistics, sample_interval=1):
+        super(Probe, self).__init__()
+        if sample_interval < 1 or sample_interval & (sample_interval - 1):
+            raise ValueError('sample_interval must be a power of two')
+        self.link = link
+        self.statistics = statistics
+        self._sample_mask = sample_interval - 1
+        self._send = link.chainlet_send
+        self.chain_fork = link.chain_fork
+        self.chain_join = link.chain_join
+
+    def chainlet_send(self, value=None):
+        statistics = self.statistics
+        statistics._received += 1
+        try:
+            if statistics._received & self._sample_mask:
+                return self._send(value)
+            return self._timed_send(value)
+        except chainlet.StopTraversal:
+            statistics.skipped += 1
+            raise
+        except StopIteration:
+            raise
+        except Exception:
+            statistics.errors += 1
+            raise
+
+    def _timed_send(self, value):
+        statistics, start = self.statistics, _clock()
+        try:
+            return self._send(value)
+        finally:
+            elapsed = _clock() - start
+            statistics.latency[bisect.bisect_left(LATENCY_BUCKETS, elapsed)] += 1
+            statistics.latency_sum += elapsed
+
+    def close(self):
+        self.link.close()
+
+    def __repr__(self):
+        return repr(self.link)
+
+
+class _ForkProbe(Probe):
+    """Wrapper around a ``link`` providing several data chunks at once"""
+    def chainlet_send(self, value=None):
+        result = super(_ForkProbe, self).chainlet_send(value)
+        if type(result) is list:
+            self.statistics.forked += len(result) - 1
+        return result
+
+
+def _link_name(link):
+    return type(link).__name__
+
+
+def _thread_branches(link):
+    """The branches of ``link`` which run chains in threads of this process"""
+    if isinstance(link, parallel.Buffer):
+        return [link._branch]
+    elif isinstance(link, parallel.FanOut) and link.worker == 'thread':
+        return link.branches
+    return []
+
+
+def _probe_flat_chain(chain):
+    """
+    Let a flat ``chain`` of probes update their statistics without calling them
+
+    This calls the links of all probes directly, instead of adding one frame per link.
+    Only the first link counts received chunks;
+    the chunks received by each following link are derived from
+    the chunks skipped and failed by the links before it.
+    """
+    if type(chain).chainlet_send is not chainlet.chainlink.FlatChain.chainlet_send or not chain.elements:
+        return chain
+    if not all(isinstance(element, Probe) for element in chain.elements):
+        return chain
+    sends = tuple(probe.link.chainlet_send for probe in chain.elements)
+    statistics = tuple(probe.statistics for probe in chain.elements)
+    for index, link_statistics in enumerate(statistics):
+        link_statistics._upstream = statistics[:index]
+    counter, sample_mask = statistics[0], chain.elements[0]._sample_mask
+
+    def probed_send(value=None):
+        counter._received += 1
+        if not counter._received & sample_mask:
+            return _timed_flat_send(sends, statistics, value)
+        send = None
+        try:
+            for send in sends:
+                value = send(value)
+        except chainlet.StopTraversal:
+            statistics[sends.index(send)].skipped += 1
+            raise
+        except StopIteration:
+            raise
+        except Exception:
+            statistics[sends.index(send)].errors += 1
+            raise
+        return value
+    chain.chainlet_send = probed_send
+    return chain
+
+
+def _timed_flat_send(sends, statistics, value):
+    """Send ``value`` through the links of a flat chain, measuring the latency of each"""
+    link_statistics = None
+    try:
+        for send, link_statistics in zip(sends, statistics):
+            start = _clock()
+            try:
+                value = send(value)
+            finally:
+                elapsed = _clock() - start
+                link_statistics.latency[bisect.bisect_left(LATENCY_BUCKETS, elapsed)] += 1
+                link_statistics.latency_sum += elapsed
+    except chainlet.StopTraversal:
+        link_statistics.skipped += 1
+        raise
+    except StopIteration:
+        raise
+    except Exception:
+        link_statistics.errors += 1
+        raise
+    return value
+
+
+def split_provider(pipeline):
+    """
+    Split a ``pipeline`` into its provider and the chain of all following links
+
+    :param pipeline: the pipeline to split, which may be instrumented
+    :type pipeline: :py:class:`chainlet.ChainLink`
+    :returns: the provider and the remaining chain, or :py:const:`None` if there are no following links
+
+    This is intended for drivers which fetch data from the provider themselves.
+    The provider is returned without its :py:class:`Probe`, since the chunks it provides are not counted.
+    """
+    if isinstance(pipeline, chainlet.chainlink.Chain) and len(pipeline.elements) > 1:
+        provider, remainder = pipeline.elements[0], chainlet.chainlink.Chain(pipeline.elements[1:])
+    else:
+        provider, remainder = pipeline, None
+    if isinstance(provider, Probe):
+        provider = provider.link
+        if remainder is not None:
+            # the provider no longer counts chunks for the links after it
+            remainder = _probe_flat_chain(remainder)
+    return provider, remainder
+
+
+class Instrumentation(object):
+    """
+    Registry of :py:class:`LinkStatistics` of all instrumented pipelines
+
+    :param sample_interval: measure the latency of every ``sample_interval``'th chunk, a power of two
+    :type sample_interval: int
+
+    Use :py:meth:`instrument` to wrap all links of a pipeline in probes,
+    and :py:meth:`snapshot` or :py:meth:`reports` to inspect them.
+    """
+    def __init__(self, sample_interval=16):
+        self.sample_interval = sample_interval
+        self._probes = []
+        self._pipelines = 0
+        self._mutex = threading.Lock()
+
+    def instrument(self, pipeline):
+        """
+        Wrap all links of a ``pipeline`` in probes
+
+        :param pipeline: the pipeline to instrument
+        :type pipeline: :py:class:`chainlet.ChainLink`
+        :returns: the instrumented pipeline
+
+        Compound links, such as chains and forks, are modified in-place
+        to contain probes of their elements.
+        Links that are already instrumented are not wrapped again.
+        """
+        with self._mutex:
+            index, self._pipelines = self._pipelines, self._pipelines + 1
+            return self._instrument(pipeline, index, '')
+
+    def _instrument(self, link, index, path):
+        if isinstance(link, Probe):
+            return link
+        if isinstance(link, chainlet.chainlink.CompoundLink):
+            link.elements = tuple(
+                self._instrument(element, index, '%s.%d' % (path, position) if path else str(position))
+                for position, element in enumerate(link.elements)
+            )
+            # probes already used by another chain must count their chunks themselves
+            if all(isinstance(element, Probe) and element.statistics._upstream is None for element in link.elements):
+                _probe_flat_chain(link)
+            return link
+        path = path or '0'
+        statistics = LinkStatistics(index, path, _link_name(link))
+        probe_type = _ForkProbe if link.chain_fork else Probe
+        probe = probe_type(link, statistics, self.sample_interval)
+        self._probes.append(probe)
+        for position, branch in enumerate(_thread_branches(link)):
+            branch.chain = self._instrument(branch.chain, index, '%s.%d' % (path, position))
+        return probe
+
+    @property
+    def probes(self):
+        """The :py:class:`Probe` of all instrumented links"""
+        return list(self._probes)
+
+    @property
+    def statistics(self):
+        """The :py:class:`LinkStatistics` of all instrumented links"""
+        return [probe.statistics for probe in self._probes]
+
+    def snapshot(self):
+        """
+        Create reports of the current counters of all links
+
+        :rtype: list[dict]
+
+        Each report contains the ``"pipeline"`` index, the ``"link"`` position and
+        ``"type"`` name of its link, as well as the process ``"pid"`` and ``"time"``
+        of the snapshot.
+        Latency buckets are cumulative, e.g. ``"latency.le_0.001"`` counts all
+        chunks processed in at most one millisecond.
+        """
+        now, pid = time.time(), os.getpid()
+        reports = []
+        for statistics in self.statistics:
+            report = statistics.report()
+            report['time'] = now
+            report['pid'] = pid
+            reports.append(report)
+        return reports
+
+    def reports(self, interval=60.0):
+        """
+        Create a provider of periodic snapshots
+
+        :param interval: time in seconds between snapshots
+        :type interval: float
+        :rtype: :py:class:`SnapshotReports`
+        """
+        return SnapshotReports(self, interval)
+
+    def __repr__(self):
+        return '<%s, %d links in %d pipelines>' % (self.__class__.__name__, len(self._probes), self._pipelines)
+
+
+class SnapshotReports(chainlet.ChainLink):
+    """
+    Provider of the :py:meth:`~Instrumentation.snapshot` of an ``instrumentation`` every ``interval`` seconds
+
+    The reports of a snapshot are provided together, like a fork.
+    """
+    chain_fork = True
+
+    def __init__(self, instrumentation, interval=60.0):
+        super(SnapshotReports, self).__init__()
+        self.instrumentation = instrumentation
+        self.interval = interval
+        self._next_snapshot = None
+
+    def chainlet_send(self, value=None):
+        now = time.time()
+        if self._next_snapshot is None:
+            self._next_snapshot = now + self.interval
+        if now < self._next_snapshot:
+            time.sleep(self._next_snapshot - now)
+        # do not try to catch up on snapshots missed by a slow pipeline
+        self._next_snapshot = max(self._next_snapshot + self.interval, now)
+        reports = self.instrumentation.snapshot()
+        if not reports:
+            raise chainlet.StopTraversal
+        return reports
+
+    def __repr__(self):
+        return '%s(%r, interval=%s)' % (self.__class__.__name__, self.instrumentation, self.interval)
+
+
+#: instrumentation used by the ``pypelined`` command if enabled
+default_instrumentation = Instrumentation()
@@ -0,0 +1,484 @@
+"""
+Synthetic load generator for capacity planning
+
+Runs a configuration under increasing synthetic load and reports the
+maximum rate it sustains.
+
+.. code:: bash
+
+    python -m pypelined.loadgen --load xrootd --cardinality 500 /etc/pypelined/xrootd.py
+
+The configuration is loaded and run the same way as by the ``pypelined`` command,
+with all pipelines instrumented by a :py:class:`~pypelined.instrumentation.Instrumentation`.
+Load is generated by a separate process, in any combination of
+
+``xrootd``
+    XML summary reports of ``--cardinality`` daemons with ``--paths`` file systems each,
+    sent via UDP as configured by the xrootd ``all.report`` directive,
+
+``log``
+    log lines of ``--cardinality`` clients appended to a file,
+    which is rotated once it exceeds ``--rotate-bytes``,
+
+``udp``
+    datagrams of ``--size`` bytes.
+
+The targets of the load are available to configurations via the environment variables
+``PYPELINED_LOAD_XROOTD_PORT``, ``PYPELINED_LOAD_LOG`` and ``PYPELINED_LOAD_UDP_PORT``:
+
+.. code:: python
+
+    import os
+    from pypelined.conf import pipelines
+    from pypelined.provider.xrootd import xrdreports
+    from pypelined.modifier.dictlets import remap
+    from pypelined.consumer.telegraf import telegraf
+
+    pipelines.append(
+        xrdreports(int(os.environ['PYPELINED_LOAD_XROOTD_PORT']), parser='xml') >>
+        remap({'pgm': 'daemon', 'info.host': 'host', 'link.in': 'bytes_in'}) >>
+        telegraf(('localhost', 8094), name='xrootd', dynamic_tags=('daemon', 'host'))
+    )
+
+Starting at ``--rate`` chunks per second per load, the rate is multiplied by ``--factor``
+every ``--step`` seconds.
+A step fails if more than ``--max-drops`` of the chunks generated during the step
+are not received by the pipelines, be it due to dropping or backlog,
+or if the 99th percentile of the sampled latency of any link exceeds ``--max-latency``.
+The highest rate of all steps before the first failure is the maximum sustainable rate.
+
+Chunks are counted when the sources of pipelines provide them,
+so the configuration should contain only pipelines fed by the generated load.
+The generator competes with the pipelines for CPU time,
+and a host with spare cores gives more accurate results.
+"""
+from __future__ import absolute_import, division, print_function
+import argparse
+import errno
+import multiprocessing
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+from .conf import loader, logger
+from .driver import PipelineDriver
+from .instrumentation import Instrumentation, LATENCY_BUCKETS
+
+__all__ = ['XRootDReportLoad', 'RotatingLogLoad', 'UDPFloodLoad', 'LoadProcess', 'main']
+
+
+class XRootDReportLoad(object):
+    """
+    Load of xrootd XML summary reports sent via UDP
+
+    :param address: ``(host, port)`` to send reports to
+    :type address: tuple[str, int]
+    :param cardinality: number of distinct daemons sending reports
+    :type cardinality: int
+    :param paths: number of ``oss.paths`` per report, each adding six keys
+    :type paths: int
+    """
+    name = 'xrootd'
+
+    def __init__(self, address, cardinality=100, paths=4):
+        self.address = address
+        self.cardinality = cardinality
+        self.paths = paths
+        self._socket = None
+        self._templates = None
+        self._count = 0
+
+    def _template(self, daemon):
+        host = 'xrd%05d.example.org' % daemon
+        paths = ''.join(
+            '<stats id="%d"><lp>"/data/xrd%02d"</lp><rp>"/data/xrd%02d"</rp><tot>11718749952</tot>'
+            '<free>%%(free)d</free><ino>732421872</ino><ifr>732001872</ifr></stats>' % (index, index, index)
+            for index in range(self.paths)
+        )
+        return (
+            '<statistics tod="%(tod)d" ver="v4.6.1" src="{host}:1094" tos="1500000000" pgm="xrootd" ins="anon"'
+            ' pid="{pid}" site="LOAD::TEST::SE">'
+            '<stats id="info"><host>{host}</host><port>1094</port><name>anon</name></stats>'
+            '<stats id="link"><num>%(num)d</num><maxn>2048</maxn><tot>%(tot)d</tot><in>%(in)d</in>'
+            '<out>%(out)d</out><ctime>2383</ctime><tmo>12</tmo><stall>0</stall><sfps>0</sfps></stats>'
+            '<stats id="sched"><jobs>%(tot)d</jobs><inq>0</inq><maxinq>12</maxinq><threads>87</threads>'
+            '<idle>80</idle></stats>'
+            '<stats id="ofs"><role>server</role><opr>12</opr><opw>3</opw><han>%(num)d</han></stats>'
+            '<stats id="oss" v="2"><paths>{count}{paths}</paths><space>0</space></stats>'
+            '</statistics>'
+        ).format(host=host, pid=4242 + daemon, count=self.paths, paths=paths)
+
+    def open(self):
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._templates = [self._template(daemon) for daemon in range(self.cardinality)]
+
+    def emit(self, count):
+        """Send ``count`` reports"""
+        sendto, address, templates = self._socket.sendto, self.address, self._templates
+        now = int(time.time())
+        for _ in range(count):
+            self._count += 1
+            total = self._count
+            report = templates[total % len(templates)] % {
+                'tod': now, 'num': total % 2048, 'tot': total, 'in': total * 4096, 'out': total * 8192,
+                'free': 5859374976 - total,
+            }
+            try:
+                sendto(report.encode(), address)
+            except socket.error as err:
+                # the receiver is not ready yet or overloaded
+                if err.errno not in (errno.ECONNREFUSED, errno.ENOBUFS, errno.EAGAIN):
+                    raise
+
+    def close(self):
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+
+class RotatingLogLoad(object):
+    """
+    Load of log lines appended to a file which is rotated regularly
+
+    :param path: the file to write to
+    :type path: str
+    :param cardinality: number of distinct clients appearing in log lines
+    :type cardinality: int
+    :param rotate_bytes: size in bytes after which the file is moved to ``path + ".1"``
+    :type rotate_bytes: int
+    """
+    name = 'log'
+
+    def __init__(self, path, cardinality=100, rotate_bytes=16 * 1024 * 1024):
+        self.path = path
+        self.cardinality = cardinality
+        self.rotate_bytes = rotate_bytes
+        self._file = None
+        self._size = 0
+        self._count = 0
+
+    def open(self):
+        self._file = open(self.path, 'a')
+        self._size = self._file.tell()
+
+    def emit(self, count):
+        """Append ``count`` lines, rotating the file if needed"""
+        if not count:
+            return
+        stamp = time.strftime('%y%m%d %H:%M:%S')
+        lines = []
+        for _ in range(count):
+            self._count += 1
+            client = self._count % self.cardinality
+            lines.append('%s %d XrootdXeq: user.%d:%d@wn%05d.example.org pub IPv4 login as user%d\n' % (
+                stamp, 4242 + client % 8, client, self._count, client, client
+            ))
+        data = ''.join(lines)
+        self._file.write(data)
+        self._file.flush()
+        self._size += len(data)
+        if self._size >= self.rotate_bytes:
+            self._file.close()
+            os.rename(self.path, self.path + '.1')
+            self.open()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class UDPFloodLoad(object):
+    """
+    Load of datagrams of a fixed size
+
+    :param address: ``(host, port)`` to send datagrams to
+    :type address: tuple[str, int]
+    :param size: size of each datagram in bytes
+    :type size: int
+    :param cardinality: number of distinct datagrams
+    :type cardinality: int
+    """
+    name = 'udp'
+
+    def __init__(self, address, size=512, cardinality=100):
+        self.address = address
+        self.size = size
+        self.cardinality = cardinality
+        self._socket = None
+        self._datagrams = None
+
+    def open(self):
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._datagrams = [
+            ('source=%d ' % index).ljust(self.size - 1, 'x').encode() + b'\n' for index in range(self.cardinality)
+        ]
+
+    def emit(self, count):
+        """Send ``count`` datagrams"""
+        sendto, address, datagrams = self._socket.sendto, self.address, self._datagrams
+        for index in range(count):
+            try:
+                sendto(datagrams[index % len(datagrams)], address)
+            except socket.error as err:
+                if err.errno not in (errno.ECONNREFUSED, errno.ENOBUFS, errno.EAGAIN):
+                    raise
+
+    def close(self):
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+
+def _generate(loads, rates, sent, shutdown, tick):
+    """Emit chunks of all ``loads`` at their ``rates`` until ``shutdown`` is set"""
+    for load in loads:
+        load.open()
+    try:
+        credit = [0.0] * len(loads)
+        last = time.time()
+        while not shutdown.is_set():
+            now = time.time()
+            elapsed, last = now - last, now
+            for index, load in enumerate(loads):
+                # do not burst to catch up if the generator falls behind
+                credit[index] = min(credit[index] + rates[index] * elapsed, rates[index] * tick * 4)
+                count = int(credit[index])
+                if count:
+                    load.emit(count)
+                    credit[index] -= count
+                    sent[index] += count
+            delay = tick - (time.time() - now)
+            if delay > 0:
+                shutdown.wait(delay)
+    finally:
+        for load in loads:
+            load.close()
+
+
+class LoadProcess(object):
+    """
+    Separate process emitting chunks of ``loads`` at adjustable rates
+
+    :param loads: the loads to generate
+    :param tick: interval in seconds at which chunks are emitted in bursts
+    :type tick: float
+
+    All loads are paused until their :py:attr:`rate` is set.
+    """
+    def __init__(self, loads, tick=0.01):
+        self.loads = loads
+        self.tick = tick
+        try:
+            context = multiprocessing.get_context('fork')
+        except AttributeError:  # python2 always forks
+            context = multiprocessing
+        self._rates = context.Array('d', len(loads))
+        self._sent = context.Array('d', len(loads))
+        self._shutdown = context.Event()
+        self._process = context.Process(
+            target=_generate, args=(loads, self._rates, self._sent, self._shutdown, tick),
+            name='pypelined load generator',
+        )
+        self._process.daemon = True
+
+    @property
+    def rate(self):
+        """Chunks per second generated by each load"""
+        return self._rates[0]
+
+    @rate.setter
+    def rate(self, value):
+        for index in range(len(self.loads)):
+            self._rates[index] = value
+
+    @property
+    def sent(self):
+        """Total number of chunks generated by all loads"""
+        return sum(self._sent[:])
+
+    def start(self):
+        self._process.start()
+
+    def close(self):
+        self._shutdown.set()
+        self._process.join()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+
+def _source_counts(instrumentation):
+    """Number of chunks provided by the sources of all pipelines"""
+    sources, total = set(), 0
+    for statistics in instrumentation.statistics:
+        # links are instrumented in order, so the first link of a pipeline is its source
+        if statistics.pipeline not in sources:
+            sources.add(statistics.pipeline)
+            total += statistics.provided
+    return total
+
+
+def _link_latencies(instrumentation):
+    """Latency histograms of all links except sources, which include waiting for data"""
+    sources, histograms = set(), {}
+    for statistics in instrumentation.statistics:
+        if statistics.pipeline not in sources:
+            sources.add(statistics.pipeline)
+            continue
+        histograms[statistics.pipeline, statistics.path] = list(statistics.latency)
+    return histograms
+
+
+def _p99(histogram):
+    """Upper bound of the 99th percentile of a latency ``histogram``"""
+    total = sum(histogram)
+    if not total:
+        return 0.0
+    count = 0
+    for bound, bucket in zip(LATENCY_BUCKETS, histogram):
+        count += bucket
+        if count >= total * 0.99:
+            return bound
+    return LATENCY_BUCKETS[-1]
+
+
+class _Step(object):
+    """Measurement of a load step"""
+    def __init__(self, target, offered, processed, duration, latency):
+        self.target = target
+        self.offered = offered
+        self.processed = processed
+        self.duration = duration
+        self.latency = latency
+
+    @property
+    def drops(self):
+        if not self.offered:
+            return 0.0
+        return max(1 - self.processed / self.offered, 0.0)
+
+
+def _measure(load_process, instrumentation, target, duration):
+    """Generate load at ``target`` rate for ``duration`` seconds"""
+    load_process.rate = target
+    offered, processed = load_process.sent, _source_counts(instrumentation)
+    latencies = _link_latencies(instrumentation)
+    start = time.time()
+    time.sleep(duration)
+    elapsed = time.time() - start
+    step_latencies = _link_latencies(instrumentation)
+    latency = max([
+        _p99([after - before for after, before in zip(histogram, latencies.get(link, [0] * len(histogram)))])
+        for link, histogram in step_latencies.items()
+    ] or [0.0])
+    return _Step(
+        target, load_process.sent - offered, _source_counts(instrumentation) - processed, elapsed, latency
+    )
+
+
+CLI = argparse.ArgumentParser(
+    'pypelined.loadgen', description='run a configuration under increasing synthetic load',
+)
+CLI.add_argument('configuration', metavar='CONFIGURATION', nargs='+', help='configuration file paths or globs')
+CLI_LOAD = CLI.add_argument_group('load options')
+CLI_LOAD.add_argument(
+    '--load', action='append', choices=('xrootd', 'log', 'udp'),
+    help='kind of load to generate, may be repeated [xrootd]',
+)
+CLI_LOAD.add_argument('--cardinality', type=int, default=100, help='number of distinct sources [%(default)s]')
+CLI_LOAD.add_argument('--paths', type=int, default=4, help='file systems per xrootd report [%(default)s]')
+CLI_LOAD.add_argument('--size', type=int, default=512, help='bytes per udp datagram [%(default)s]')
+CLI_LOAD.add_argument(
+    '--rotate-bytes', type=int, default=16 * 1024 * 1024, help='size after which the log is rotated [%(default)s]'
+)
+CLI_LOAD.add_argument('--xrootd-port', type=int, default=9931, help='port to send xrootd reports to [%(default)s]')
+CLI_LOAD.add_argument('--udp-port', type=int, default=9932, help='port to send udp datagrams to [%(default)s]')
+CLI_LOAD.add_argument('--log-path', help='log file to write to [temporary file]')
+CLI_RAMP = CLI.add_argument_group('ramp options')
+CLI_RAMP.add_argument('--rate', type=float, default=100, help='initial chunks per second per load [%(default)s]')
+CLI_RAMP.add_argument('--factor', type=float, default=2, help='rate increase per step [%(default)s]')
+CLI_RAMP.add_argument('--max-rate', type=float, default=1E6, help='rate at which to stop [%(default)s]')
+CLI_RAMP.add_argument('--step', type=float, default=10, help='duration of each step in seconds [%(default)s]')
+CLI_RAMP.add_argument('--warmup', type=float, default=2, help='duration before the first step [%(default)s]')
+CLI_RAMP.add_argument(
+    '--max-drops', type=float, default=0.01, help='tolerated fraction of chunks not processed [%(default)s]'
+)
+CLI_RAMP.add_argument(
+    '--max-latency', type=float, default=0.05, help='tolerated p99 latency of links in seconds [%(default)s]'
+)
+CLI.add_argument('-l', '--log-level', default='WARNING', help='logging verbosity [%(default)s]')
+
+
+def main(argv=None):
+    options = CLI.parse_args(argv)
+    logger.configure_logging(
+        log_level=options.log_level, log_format='%(asctime)s (%(process)d) %(levelname)8s: %(message)s',
+        log_dest=['stderr'],
+    )
+    temp_dir = None
+    if options.log_path is None:
+        temp_dir = tempfile.mkdtemp(prefix='pypelined-load-')
+        options.log_path = os.path.join(temp_dir, 'load.log')
+    os.environ['PYPELINED_LOAD_XROOTD_PORT'] = str(options.xrootd_port)
+    os.environ['PYPELINED_LOAD_UDP_PORT'] = str(options.udp_port)
+    os.environ['PYPELINED_LOAD_LOG'] = options.log_path
+    available = {
+        'xrootd': lambda: XRootDReportLoad(('127.0.0.1', options.xrootd_port), options.cardinality, options.paths),
+        'log': lambda: RotatingLogLoad(options.log_path, options.cardinality, options.rotate_bytes),
+        'udp': lambda: UDPFloodLoad(('127.0.0.1', options.udp_port), options.size, options.cardinality),
+    }
+    loads = [available[name]() for name in sorted(set(options.load or ['xrootd']))]
+    try:
+        # fork the generator before starting any threads
+        with LoadProcess(loads) as load_process:
+            instrumentation = Instrumentation()
+            pipeline_driver = PipelineDriver(instrumentation=instrumentation)
+            for pipeline in loader.run_configurations(options.configuration):
+                pipeline_driver.mount(pipeline)
+            driver_thread = threading.Thread(target=pipeline_driver.run, name='pypelined driver')
+            driver_thread.daemon = True
+            driver_thread.start()
+            return _ramp(options, load_process, instrumentation, [load.name for load in loads])
+    finally:
+        if temp_dir is not None:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def _ramp(options, load_process, instrumentation, names):
+    print('load: %s, cardinality %d' % (', '.join(names), options.cardinality))
+    _measure(load_process, instrumentation, options.rate, options.warmup)
+    print('%12s %12s %12s %8s %12s' % ('target/s', 'offered/s', 'processed/s', 'drops', 'p99 latency'))
+    sustained, target = None, options.rate
+    while target <= options.max_rate:
+        step = _measure(load_process, instrumentation, target, options.step)
+        passed = step.drops <= options.max_drops and step.latency <= options.max_latency
+        print('%12.0f %12.0f %12.0f %7.2f%% %10.4f s%s' % (
+            step.target * len(names), step.offered / step.duration, step.processed / step.duration,
+            step.drops * 100, step.latency, '' if passed else '  FAILED'
+        ))
+        if not passed:
+            break
+        if step.offered / step.duration < step.target * len(names) * 0.9:
+            print('generator cannot reach the target rate, the configuration sustains at least this rate')
+            sustained = step.offered / step.duration
+            break
+        sustained, target = step.offered / step.duration, target * options.factor
+    if sustained is None:
+        print('no sustainable rate found, the initial rate already fails')
+        return 1
+    print('maximum sustainable rate: %.0f chunks/s' % sustained)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,313 @@
+"""
+Exposition of runtime metrics for Prometheus and OpenMetrics scrapers
+
+A :py:class:`MetricsServer` serves the current state of the ``pypelined``
+process via HTTP at ``/metrics``:
+
+* per-pipeline and per-link counters and latencies of an
+  :py:class:`~pypelined.instrumentation.Instrumentation`,
+* the depth of queues of links such as :py:class:`~pypelined.modifier.parallel.Buffer`
+  and :py:class:`~pypelined.modifier.parallel.FanOut`,
+* the read offset and lag of files read by :py:class:`~pypelined.provider.stream.TailPath`,
+* the value of every :py:class:`~pypelined.utilities.dfs_counter.DFSCounter`.
+
+Requests are answered by a background thread, and metrics are only collected
+when they are requested.
+Pipelines are never blocked by the server.
+
+The ``pypelined`` command starts a server if it is run with the ``--metrics`` option.
+"""
+from __future__ import absolute_import
+import logging
+import threading
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:  # python2
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+
+from .instrumentation import LATENCY_BUCKETS
+from .provider import stream
+from .utilities.singleton import Singleton
+from .utilities.dfs_counter import DFSCounter
+
+__all__ = ['MetricsServer', 'collect', 'render', 'parse_address']
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+OPENMETRICS_CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+
+
+class MetricFamily(object):
+    """
+    Samples of a metric with the same name, type and help
+
+    :param name: name of the metric, without any ``_total`` suffix of counters
+    :type name: str
+    :param kind: type of the metric, one of ``"counter"``, ``"gauge"`` or ``"histogram"``
+    :type kind: str
+    :param documentation: help text of the metric
+    :type documentation: str
+    """
+    def __init__(self, name, kind, documentation):
+        self.name = name
+        self.kind = kind
+        self.documentation = documentation
+        #: samples as ``(suffix, labels, value)``, e.g. ``('_total', {'link': '1'}, 12)``
+        self.samples = []
+
+    def add(self, labels, value, suffix=''):
+        """Add a sample of ``value`` with ``labels``"""
+        self.samples.append((suffix, labels, value))
+
+    def __repr__(self):
+        return '<%s %s %s, %d samples>' % (self.__class__.__name__, self.kind, self.name, len(self.samples))
+
+
+def _link_labels(statistics):
+    return {'pipeline': str(statistics.pipeline), 'link': statistics.path, 'type': statistics.name}
+
+
+def _collect_links(instrumentation):
+    """Metrics of the pipelines and links of an ``instrumentation``"""
+    received = MetricFamily('pypelined_link_received', 'counter', 'Data chunks sent to a link')
+    provided = MetricFamily('pypelined_link_provided', 'counter', 'Data chunks provided by a link')
+    skipped = MetricFamily('pypelined_link_skipped', 'counter', 'Data chunks dropped by a link')
+    errors = MetricFamily('pypelined_link_errors', 'counter', 'Exceptions raised by a link')
+    latency = MetricFamily('pypelined_link_latency_seconds', 'histogram', 'Sampled time spent in a link per chunk')
+    pipeline_chunks = MetricFamily(
+        'pypelined_pipeline_chunks', 'counter', 'Data chunks provided by the source of a pipeline'
+    )
+    pipeline_errors = MetricFamily('pypelined_pipeline_errors', 'counter', 'Exceptions raised by links of a pipeline')
+    sources, pipeline_error_counts = set(), {}
+    for statistics in instrumentation.statistics:
+        labels = _link_labels(statistics)
+        received.add(labels, statistics.received, '_total')
+        provided.add(labels, statistics.provided, '_total')
+        skipped.add(labels, statistics.skipped, '_total')
+        errors.add(labels, statistics.errors, '_total')
+        count = 0
+        for bound, bucket in zip(LATENCY_BUCKETS, statistics.latency):
+            count += bucket
+            latency.add(dict(labels, le=bound), count, '_bucket')
+        latency.add(labels, count, '_count')
+        latency.add(labels, statistics.latency_sum, '_sum')
+        # links are instrumented in order, so the first link of a pipeline is its source
+        if statistics.pipeline not in sources:
+            sources.add(statistics.pipeline)
+            pipeline_chunks.add({'pipeline': str(statistics.pipeline)}, statistics.provided, '_total')
+        pipeline_error_counts.setdefault(statistics.pipeline, 0)
+        pipeline_error_counts[statistics.pipeline] += statistics.errors
+    for pipeline, count in sorted(pipeline_error_counts.items()):
+        pipeline_errors.add({'pipeline': str(pipeline)}, count, '_total')
+    return [pipeline_chunks, pipeline_errors, received, provided, skipped, errors, latency]
+
+
+def _collect_queues(instrumentation):
+    """Metrics of the queues of instrumented links, such as buffers"""
+    depth = MetricFamily('pypelined_queue_depth', 'gauge', 'Data chunks waiting in a queue')
+    capacity = MetricFamily('pypelined_queue_capacity', 'gauge', 'Maximum data chunks waiting in a queue')
+    high_water = MetricFamily('pypelined_queue_high_water', 'gauge', 'Maximum depth a queue has reached')
+    drops = MetricFamily('pypelined_queue_dropped', 'counter', 'Data chunks dropped by a full queue')
+    for probe in instrumentation.probes:
+        queues = getattr(probe.link, 'statistics', None)
+        if isinstance(queues, dict):
+            queues = [queues]
+        if not isinstance(queues, list):
+            continue
+        for branch, queue in enumerate(queues):
+            labels = dict(_link_labels(probe.statistics), branch=str(branch))
+            depth.add(labels, queue['depth'])
+            capacity.add(labels, queue['capacity'])
+            high_water.add(labels, queue['high_water'])
+            drops.add(labels, queue['drops'], '_total')
+    return [depth, capacity, high_water, drops]
+
+
+def _collect_tails():
+    """Metrics of the files currently tailed"""
+    offset = MetricFamily('pypelined_tail_offset_bytes', 'gauge', 'Offset up to which a tailed file has been read')
+    size = MetricFamily('pypelined_tail_size_bytes', 'gauge', 'Size of a tailed file')
+    lag = MetricFamily('pypelined_tail_lag_bytes', 'gauge', 'Data of a tailed file not read yet')
+    for tail in stream.tail_offsets():
+        labels = {'path': tail['path']}
+        offset.add(labels, tail['offset'])
+        size.add(labels, tail['size'])
+        lag.add(labels, max(tail['size'] - tail['offset'], 0))
+    return [offset, size, lag]
+
+
+def _collect_dfs_counters():
+    """Metrics of all :py:class:`~pypelined.utilities.dfs_counter.DFSCounter` of this process"""
+    value = MetricFamily('pypelined_dfs_counter_hosts', 'gauge', 'Hosts accessing the shared path of a DFSCounter')
+    timeout = MetricFamily('pypelined_dfs_counter_timeout_seconds', 'gauge', 'Age after which a host is assumed stale')
+    with Singleton.__singleton_mutex__:
+        singletons = list(Singleton.__singleton_store__.values())
+    for counter in singletons:
+        # DFSCounter pretends to be an int, so its __class__ cannot be used
+        if type(counter) is not DFSCounter:
+            continue
+        labels = {'shared_path': counter.shared_path}
+        timeout.add(labels, counter.timeout)
+        # the value is unknown until the counter has been acquired
+        if counter._count_value is not None:
+            value.add(labels, counter._count_value)
+    return [value, timeout]
+
+
+def collect(instrumentation=None):
+    """
+    Collect the current metrics of this process
+
+    :param instrumentation: instrumentation of the pipelines, if any
+    :type instrumentation: :py:class:`~pypelined.instrumentation.Instrumentation` or None
+    :rtype: list[:py:class:`MetricFamily`]
+    """
+    families = []
+    if instrumentation is not None:
+        families.extend(_collect_links(instrumentation))
+        families.extend(_collect_queues(instrumentation))
+    families.extend(_collect_tails())
+    families.extend(_collect_dfs_counters())
+    return families
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float):
+        return repr(value)
+    return str(int(value))
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{%s}' % ','.join(
+        '%s="%s"' % (
+            key,
+            (_format_value(value) if key == 'le' else str(value))
+            .replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+        )
+        for key, value in sorted(labels.items())
+    )
+
+
+def render(families, openmetrics=False):
+    """
+    Render metric ``families`` in the text exposition format
+
+    :param families: the metrics to render
+    :type families: list[:py:class:`MetricFamily`]
+    :param openmetrics: whether to use the OpenMetrics instead of the Prometheus format
+    :type openmetrics: bool
+    :rtype: str
+    """
+    lines = []
+    for family in families:
+        # Prometheus describes counters by the name of their samples
+        name = family.name if openmetrics or family.kind != 'counter' else family.name + '_total'
+        lines.append('# HELP %s %s' % (name, family.documentation))
+        lines.append('# TYPE %s %s' % (name, family.kind))
+        for suffix, labels, value in family.samples:
+            lines.append('%s%s%s %s' % (family.name, suffix, _format_labels(labels), _format_value(value)))
+    if openmetrics:
+        lines.append('# EOF')
+    return '\n'.join(lines) + '\n'
+
+
+def parse_address(address):
+    """
+    Parse an ``address`` of the form ``[host:]port`` to a ``(host, port)`` pair
+
+    If ``host`` is omitted, the server listens on all interfaces.
+    """
+    host, _, port = address.rpartition(':')
+    return host, int(port)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?', 1)[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        openmetrics = 'application/openmetrics-text' in self.headers.get('Accept', '')
+        try:
+            body = render(collect(self.server.instrumentation), openmetrics=openmetrics).encode('utf-8')
+        except Exception as err:
+            self.server.logger.exception('failed to collect metrics: %s', err)
+            self.send_error(500)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', OPENMETRICS_CONTENT_TYPE if openmetrics else PROMETHEUS_CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        self.server.logger.debug('%s - %s', self.address_string(), format % args)
+
+
+class _MetricsHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class MetricsServer(object):
+    """
+    HTTP server providing the metrics of this process at ``/metrics``
+
+    :param address: the ``(host, port)`` to listen on
+    :type address: tuple[str, int]
+    :param instrumentation: instrumentation of the pipelines, if any
+    :type instrumentation: :py:class:`~pypelined.instrumentation.Instrumentation` or None
+
+    The server runs in a daemon thread once :py:meth:`start` is called.
+    The Prometheus text format is used, unless a client accepts the OpenMetrics format.
+    """
+    def __init__(self, address, instrumentation=None):
+        self.address = address
+        self.instrumentation = instrumentation
+        self._server = None
+        self._thread = None
+        self._logger = logging.getLogger('%s.%s' % (__name__, self.__class__.__name__))
+
+    def start(self):
+        """Start serving metrics in a background thread"""
+        if self._server is not None:
+            return
+        self._server = _MetricsHTTPServer(self.address, _MetricsHandler)
+        self._server.instrumentation = self.instrumentation
+        self._server.logger = self._logger
+        self._thread = threading.Thread(target=self._server.serve_forever, name='pypelined metrics')
+        self._thread.daemon = True
+        self._thread.start()
+        self._logger.info('serving metrics on %s:%d', *self._server.server_address[:2])
+
+    def close(self):
+        """Stop serving metrics"""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = self._thread = None
+
+    @property
+    def server_address(self):
+        """The actual ``(host, port)`` the server listens on"""
+        return self._server.server_address[:2] if self._server is not None else None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+    def __repr__(self):
+        return '%s(%r, instrumentation=%r)' % (self.__class__.__name__, self.address, self.instrumentation)
+
+
+metrics_server = MetricsServer
@@ -0,0 +1,294 @@
+"""
+Aggregation of numeric fields of many reports to statistics over time windows
+
+Instead of forwarding every report, :py:class:`Aggregate` collects numeric
+fields and periodically provides a single report with their statistics,
+such as the minimum, maximum and mean per minute.
+
+If :py:mod:`numpy` is available, the values of each window are converted to
+columnar arrays at once, and all statistics are computed with vectorised operations.
+Otherwise, an equivalent but slower pure python implementation is used.
+Install the ``numpy`` extra of ``pypelined`` to enable the vectorised implementation.
+"""
+from __future__ import absolute_import, division
+import math
+import time
+import warnings
+
+import chainlet
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+__all__ = ['Aggregate', 'aggregate', 'HAS_NUMPY']
+
+#: whether statistics are computed with :py:mod:`numpy`
+HAS_NUMPY = numpy is not None
+
+#: statistics which can be computed per field
+STATISTICS = ('min', 'max', 'mean', 'sum', 'count', 'rate')
+
+_NAN = float('nan')
+
+if numpy is not None:
+    _FUNCTIONS = {
+        'min': numpy.min, 'max': numpy.max, 'mean': numpy.mean, 'sum': numpy.sum, 'percentile': numpy.percentile,
+    }
+    _NAN_FUNCTIONS = {
+        'min': numpy.nanmin, 'max': numpy.nanmax, 'mean': numpy.nanmean, 'sum': numpy.nansum,
+        'percentile': numpy.nanpercentile,
+    }
+
+
+def _as_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return _NAN
+
+
+class _ListSeries(object):
+    """Samples of a series, stored in python lists"""
+    def __init__(self, width):
+        self._width = width
+        self._times = []
+        self._rows = []
+
+    def __len__(self):
+        return len(self._times)
+
+    def append(self, timestamp, row):
+        self._times.append(timestamp)
+        self._rows.append(row)
+
+    def evict(self, before):
+        """Remove all samples taken before ``before``"""
+        samples = [(timestamp, row) for timestamp, row in zip(self._times, self._rows) if timestamp >= before]
+        self._times = [timestamp for timestamp, _ in samples]
+        self._rows = [row for _, row in samples]
+
+    def summarize(self, start, end, statistics, percentiles):
+        """
+        Compute the ``statistics`` and ``percentiles`` of all samples in ``[start, end)``
+
+        :returns: the number of samples and the values of each statistic per field
+        :rtype: tuple[int, dict[str, list[float]]]
+        """
+        samples = [(timestamp, row) for timestamp, row in zip(self._times, self._rows) if start <= timestamp < end]
+        if not samples:
+            return 0, {}
+        summary = {name: [] for name in statistics}
+        summary.update(('p%g' % percentile, []) for percentile in percentiles)
+        for column in range(self._width):
+            series = [(timestamp, row[column]) for timestamp, row in samples if not math.isnan(row[column])]
+            values = sorted(value for _, value in series)
+            if 'min' in statistics:
+                summary['min'].append(values[0] if values else _NAN)
+            if 'max' in statistics:
+                summary['max'].append(values[-1] if values else _NAN)
+            if 'mean' in statistics:
+                summary['mean'].append(math.fsum(values) / len(values) if values else _NAN)
+            if 'sum' in statistics:
+                summary['sum'].append(math.fsum(values))
+            if 'count' in statistics:
+                summary['count'].append(len(values))
+            if 'rate' in statistics:
+                elapsed = series[-1][0] - series[0][0] if series else 0
+                summary['rate'].append((series[-1][1] - series[0][1]) / elapsed if elapsed > 0 else _NAN)
+            for percentile in percentiles:
+                summary['p%g' % percentile].append(self._percentile(values, percentile))
+        return len(samples), summary
+
+    @staticmethod
+    def _percentile(values, percentile):
+        """Percentile of sorted ``values`` with linear interpolation, as done by :py:mod:`numpy`"""
+        if not values:
+            return _NAN
+        rank = (len(values) - 1) * percentile / 100
+        lower = int(math.floor(rank))
+        upper = min(lower + 1, len(values) - 1)
+        return values[lower] + (values[upper] - values[lower]) * (rank - lower)
+
+
+class _ArraySeries(_ListSeries):
+    """Samples of a series, summarized as columnar :py:mod:`numpy` arrays"""
+    def summarize(self, start, end, statistics, percentiles):
+        """
+        Compute the ``statistics`` and ``percentiles`` of all samples in ``[start, end)``
+
+        :returns: the number of samples and the values of each statistic per field
+        :rtype: tuple[int, dict[str, list[float]]]
+        """
+        if not self._times:
+            return 0, {}
+        # samples are collected as rows, but converted to columns at once
+        times, block = numpy.array(self._times), numpy.array(self._rows)
+        selected = (times >= start) & (times < end)
+        times, block = times[selected], block[selected]
+        if not len(times):
+            return 0, {}
+        summary = {}
+        missing = numpy.isnan(block)
+        # the NaN-aware functions are considerably slower and only needed for missing values
+        functions = _NAN_FUNCTIONS if missing.any() else _FUNCTIONS
+        with warnings.catch_warnings():
+            # all-NaN fields are expected for fields missing from reports
+            warnings.simplefilter('ignore', RuntimeWarning)
+            for name in statistics:
+                if name == 'count':
+                    summary[name] = len(block) - missing.sum(axis=0)
+                elif name == 'rate':
+                    summary[name] = self._rates(times, block, missing)
+                else:
+                    summary[name] = functions[name](block, axis=0)
+            if percentiles:
+                for percentile, values in zip(percentiles, functions['percentile'](block, percentiles, axis=0)):
+                    summary['p%g' % percentile] = values
+        return len(times), {name: values.tolist() for name, values in summary.items()}
+
+    @staticmethod
+    def _rates(times, block, missing):
+        """Change per second between the first and last valid value of each field"""
+        valid = ~missing
+        first = valid.argmax(axis=0)
+        last = len(block) - 1 - valid[::-1].argmax(axis=0)
+        columns = numpy.arange(block.shape[1])
+        elapsed = times[last] - times[first]
+        elapsed[elapsed <= 0] = numpy.nan
+        return (block[last, columns] - block[first, columns]) / elapsed
+
+
+class Aggregate(chainlet.ChainLink):
+    """
+    Aggregate numeric ``fields`` of reports to statistics over time windows
+
+    :param fields: keys of the numeric values to aggregate
+    :type fields: list[str] or tuple[str]
+    :param tags: keys identifying separate series of reports, such as ``('info.host', 'pgm')``
+    :type tags: list[str] or tuple[str]
+    :param window: duration of each window in seconds
+    :type window: float
+    :param step: interval in seconds between sliding windows, or :py:const:`None` for tumbling windows
+    :type step: float or None
+    :param statistics: names of the statistics to compute for each field
+    :type statistics: list[str] or tuple[str]
+    :param percentiles: percentiles to compute for each field, in the range ``0`` to ``100``
+    :type percentiles: list[float] or tuple[float]
+    :param time_key: key of the report time, or :py:const:`None` to use the time of arrival
+    :type time_key: str or None
+
+    Reports are grouped by the values of their ``tags``.
+    For each group, one report is provided per window,
+    containing the ``tags``, the end of the window as ``"time"``,
+    the number of aggregated reports as ``"count"``, and the statistics
+    of each field as ``"<field>.<statistic>"``, e.g. ``"link.in.mean"``.
+    Percentiles are provided as ``"<field>.p<percentile>"``, e.g. ``"link.in.p95"``.
+
+    The available ``statistics`` are ``'min'``, ``'max'``, ``'mean'``, ``'sum'``,
+    ``'count'`` of values, and ``'rate'`` of change per second.
+    The ``'rate'`` is computed from the first and last value in a window,
+    which is suitable for monotonic counters such as ``link.in``.
+    Missing and non-numeric values are ignored.
+
+    Windows are aligned to multiples of ``step`` since the epoch.
+    With tumbling windows, each report is part of exactly one window.
+    With sliding windows, a window of ``window`` seconds is provided every ``step`` seconds.
+    Since the link cannot act without receiving data, finished windows are only
+    provided when the next report arrives.
+    The reports of all groups are provided together, like a fork.
+
+    A :py:class:`list` of reports, as provided by :py:func:`~pypelined.modifier.batchlets.batch`,
+    is aggregated as if each report had been received individually.
+    """
+    chain_fork = True
+
+    def __init__(self, fields, tags=(), window=60.0, step=None, statistics=('min', 'max', 'mean'), percentiles=(),
+                 time_key=None):
+        super(Aggregate, self).__init__()
+        unknown = set(statistics) - set(STATISTICS)
+        if unknown:
+            raise ValueError('unknown statistics %s, must be any of %s' % (
+                ', '.join(sorted(unknown)), ', '.join(STATISTICS)))
+        if step is not None and not 0 < step <= window:
+            raise ValueError('step must be positive and at most window')
+        if any(not 0 <= percentile <= 100 for percentile in percentiles):
+            raise ValueError('percentiles must be in the range 0 to 100')
+        self.fields = tuple(fields)
+        self.tags = tuple(tags)
+        self.window = window
+        self.step = step if step is not None else window
+        self.statistics = tuple(statistics)
+        self.percentiles = tuple(percentiles)
+        self.time_key = time_key
+        self._series = {}
+        self._next_window = None
+
+    def _new_series(self):
+        if HAS_NUMPY:
+            return _ArraySeries(len(self.fields))
+        return _ListSeries(len(self.fields))
+
+    def chainlet_send(self, value=None):
+        reports = []
+        for report in (value if type(value) is list else (value,)):
+            reports.extend(self._add(report))
+        if not reports:
+            raise chainlet.StopTraversal
+        return reports
+
+    def _add(self, report):
+        """Add a report, returning the reports of any windows finished before it"""
+        timestamp = float(report[self.time_key]) if self.time_key is not None else time.time()
+        if self._next_window is None:
+            self._next_window = (timestamp // self.step + 1) * self.step
+        reports = []
+        while timestamp >= self._next_window:
+            reports.extend(self._flush_window(self._next_window))
+            self._next_window += self.step
+            if not self._series:
+                # skip any windows without samples
+                self._next_window = max(self._next_window, (timestamp // self.step + 1) * self.step)
+        group = tuple(report.get(tag) for tag in self.tags)
+        try:
+            series = self._series[group]
+        except KeyError:
+            series = self._series[group] = self._new_series()
+        try:
+            row = [float(report[field]) for field in self.fields]
+        except (KeyError, TypeError, ValueError):
+            row = [_as_float(report.get(field)) for field in self.fields]
+        series.append(timestamp, row)
+        return reports
+
+    def _flush_window(self, end):
+        """Get the reports of the window ending at ``end`` and discard samples no longer needed"""
+        reports = []
+        for group, series in list(self._series.items()):
+            count, summary = series.summarize(end - self.window, end, self.statistics, self.percentiles)
+            if count:
+                reports.append(self._report(group, end, count, summary))
+            series.evict(end + self.step - self.window)
+            if not len(series):
+                del self._series[group]
+        return reports
+
+    def _report(self, group, end, count, summary):
+        report = dict(zip(self.tags, group))
+        report['time'] = end
+        report['count'] = count
+        for name, values in summary.items():
+            for field, value in zip(self.fields, values):
+                # NaN marks fields without values in this window
+                if value == value:
+                    report['%s.%s' % (field, name)] = value
+        return report
+
+    def __repr__(self):
+        return '%s(fields=%r, tags=%r, window=%s, step=%s)' % (
+            self.__class__.__name__, self.fields, self.tags, self.window, self.step
+        )
+
+
+aggregate = Aggregate
@@ -0,0 +1,89 @@
+"""
+Links grouping data chunks into batches and splitting them again
+
+Batches are plain :py:class:`list` objects of data chunks.
+Batch-aware links, such as :py:func:`~pypelined.modifier.dictlets.remap`,
+:py:func:`~pypelined.modifier.dictlets.update`,
+:py:func:`~pypelined.consumer.telegraf.telegraf_message` and
+:py:class:`~pypelined.consumer.socket.UDPSocket`, process an entire batch in one call.
+This avoids traversing the chain for every single data chunk.
+
+.. code:: python
+
+    pipeline = xrootd_reports(port=9931) >> batch(size=256, flush_after=1.0) >> remap(KEYS) >> \\
+        telegraf_message('xrootd') >> udp_send('localhost', 8094)
+"""
+from __future__ import absolute_import
+import time
+
+import chainlet
+
+__all__ = ['Batch', 'batch', 'Unbatch', 'unbatch']
+
+
+class Batch(chainlet.ChainLink):
+    """
+    Collect data chunks and pass them on as a :py:class:`list`
+
+    :param size: number of data chunks per batch
+    :type size: int
+    :param flush_after: time in seconds after which a partial batch is passed on with the next data chunk
+    :type flush_after: float or None
+
+    A batch is passed on once it contains ``size`` data chunks.
+    If ``flush_after`` is not :py:const:`None`, a partial batch is also passed on
+    by the first data chunk arriving ``flush_after`` seconds after the first chunk of the batch.
+
+    Note that ``flush_after`` does *not* bound the latency of data chunks:
+    the link can only pass on a batch when receiving a data chunk,
+    so a partial batch is held until the next chunk arrives,
+    and lost if none arrives before shutdown.
+    Use :py:meth:`flush` to explicitly take a partial batch.
+    For a latency bound, batch in the consumer instead,
+    such as via the ``batch_size`` and ``max_delay`` of
+    :py:class:`~pypelined.consumer.socket.UDPSocket`.
+    """
+    def __init__(self, size=64, flush_after=None):
+        super(Batch, self).__init__()
+        if size < 1:
+            raise ValueError('size must be positive')
+        self.size = size
+        self.flush_after = flush_after
+        self._items = []
+        self._deadline = None
+
+    def chainlet_send(self, value=None):
+        items = self._items
+        if not items and self.flush_after is not None:
+            self._deadline = time.time() + self.flush_after
+        items.append(value)
+        if len(items) >= self.size or (self._deadline is not None and time.time() >= self._deadline):
+            return self.flush()
+        raise chainlet.StopTraversal
+
+    def flush(self):
+        """Get the current batch, even if it is not full yet"""
+        items, self._items, self._deadline = self._items, [], None
+        return items
+
+    def __repr__(self):
+        return '%s(size=%d, flush_after=%s)' % (self.__class__.__name__, self.size, self.flush_after)
+
+
+batch = Batch
+
+
+class Unbatch(chainlet.ChainLink):
+    """
+    Split a :py:class:`list` of data chunks to pass them on individually
+
+    This is the inverse of :py:class:`Batch`:
+    each data chunk of a batch is passed on separately to the following links.
+    """
+    chain_fork = True
+
+    def chainlet_send(self, value=None):
+        return value
+
+
+unbatch = Unbatch
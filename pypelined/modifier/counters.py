@@ -0,0 +1,125 @@
+"""
+Derivation of rates from monotonic counters, such as ``link.in`` of xrootd reports
+"""
+from __future__ import absolute_import, division
+import collections
+import time
+
+import chainlet
+
+from ..utilities.overlay import Overlay
+
+__all__ = ['Rates', 'rates']
+
+
+class Rates(chainlet.ChainLink):
+    """
+    Add the rate of change per second of monotonic counter ``fields`` to reports
+
+    :param fields: keys of the counters
+    :type fields: list[str] or tuple[str]
+    :param tags: keys identifying separate series of reports, such as ``('info.host', 'pid')``
+    :type tags: list[str] or tuple[str]
+    :param suffix: suffix appended to the key of each counter for its rate
+    :type suffix: str
+    :param time_key: key of the report time, or :py:const:`None` to use the time of arrival
+    :type time_key: str or None
+    :param max_keys: maximum number of series to track
+    :type max_keys: int
+    :param idle_timeout: time in seconds after which the state of a series without reports is discarded
+    :type idle_timeout: float
+
+    For every series, identified by the values of its ``tags``, the last time and
+    value of each counter is stored.
+    Each report is provided with the rate of every counter since the previous report
+    of its series, e.g. as ``"link.in.rate"``.
+    The first report of a series has no rates.
+
+    If a counter decreases, it is assumed to have been reset to zero,
+    for example because the daemon restarted.
+    The rate is then computed from zero to the new value.
+
+    The state is bounded to ``max_keys`` series, discarding the least recently
+    updated series first.
+    Series without reports for ``idle_timeout`` seconds are discarded as well,
+    so that series of short-lived processes do not accumulate.
+
+    Reports are not copied, but provided as an :py:class:`~pypelined.utilities.overlay.Overlay`
+    of their rates.
+    A :py:class:`list` of reports, as provided by :py:func:`~pypelined.modifier.batchlets.batch`,
+    is handled as if each report had been received individually.
+    """
+    def __init__(self, fields, tags=(), suffix='.rate', time_key=None, max_keys=65536, idle_timeout=600.0):
+        super(Rates, self).__init__()
+        if max_keys < 1:
+            raise ValueError('max_keys must be positive')
+        self.fields = tuple(fields)
+        self.tags = tuple(tags)
+        self.time_key = time_key
+        self.max_keys = max_keys
+        self.idle_timeout = idle_timeout
+        self._rate_keys = tuple(field + suffix for field in self.fields)
+        # series -> (timestamp, [value per field])
+        self._state = collections.OrderedDict()
+        self._next_expiry = None
+        #: number of series discarded since creation
+        self.evicted = 0
+
+    def __len__(self):
+        return len(self._state)
+
+    def chainlet_send(self, value=None):
+        if type(value) is list:
+            return [self._derive(report) for report in value]
+        return self._derive(value)
+
+    def _derive(self, report):
+        timestamp = float(report[self.time_key]) if self.time_key is not None else time.time()
+        group = tuple(report.get(tag) for tag in self.tags)
+        values = [report.get(field) for field in self.fields]
+        state = self._state
+        rates = {}
+        try:
+            last_time, last_values = state.pop(group)
+        except KeyError:
+            last_values = None
+        if last_values is not None:
+            elapsed = timestamp - last_time
+            if elapsed > 0:
+                for rate_key, current, previous in zip(self._rate_keys, values, last_values):
+                    if current is None or previous is None:
+                        continue
+                    try:
+                        rates[rate_key] = (current - previous if current >= previous else current) / elapsed
+                    except TypeError:
+                        pass
+            # keep the last known value of counters missing from this report
+            values = [previous if current is None else current for current, previous in zip(values, last_values)]
+        state[group] = timestamp, values
+        self._expire(timestamp)
+        return Overlay(report, rates) if rates else report
+
+    def _expire(self, now):
+        """Discard the least recently updated and any idle series"""
+        state = self._state
+        while len(state) > self.max_keys:
+            state.popitem(last=False)
+            self.evicted += 1
+        if self._next_expiry is None or now >= self._next_expiry:
+            # series are ordered by their last update, so idle series are at the start
+            deadline = now - self.idle_timeout
+            while state:
+                group, (last_time, _) = next(iter(state.items()))
+                if last_time >= deadline:
+                    break
+                del state[group]
+                self.evicted += 1
+            self._next_expiry = now + self.idle_timeout / 4
+
+    def __repr__(self):
+        return '%s(fields=%r, tags=%r, max_keys=%d, idle_timeout=%s)' % (
+            self.__class__.__name__, self.fields, self.tags, self.max_keys, self.idle_timeout
+        )
+
+
+rates = Rates
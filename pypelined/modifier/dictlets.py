@@ -1,29 +1,184 @@
+from __future__ import absolute_import
+import re
+import operator
+
 import chainlet
 
+from ..utilities.overlay import Overlay
+from ..utilities.record import Record
+
+
+#: type of compiled regular expressions
+_PATTERN_TYPE = type(re.compile(''))
+#: get a set-like view on the keys of a mapping
+_keys_view = operator.methodcaller('viewkeys' if hasattr(dict, 'viewkeys') else 'keys')
+
+
+def _compile_glob(key, new_key):
+    """Compile a dotted glob ``key`` and its ``new_key`` to a regex and template"""
+    components = key.split('.')
+    pattern = r'\.'.join('([^.]+)' if component == '*' else re.escape(component) for component in components)
+    template = new_key.replace('\\', r'\\')
+    for group in range(1, components.count('*') + 1):
+        template = template.replace('*', r'\g<%d>' % group, 1)
+    return re.compile(pattern + r'\Z'), template
+
+
+class RemapPlan(object):
+    r"""
+    Precompiled plan to map keys of mappings to new keys
+
+    :param key_map: mapping from old to new keys or key patterns
+    :type key_map: :py:class:`dict` or :py:class:`~collections.Mapping`
+    :param cull_unknown: whether to remove all unmapped keys
+    :type cull_unknown: bool
+
+    Keys of ``key_map`` are either literal keys, dotted patterns or regular expressions:
+
+    ``'link.num': 'connections'``
+        A literal key is renamed as is.
+
+    ``'oss.paths.*.free': 'space_free_*'``
+        A ``*`` matches exactly one dotted component, such as ``0`` in ``oss.paths.0.free``.
+        Each ``*`` of the new key is replaced by the respective match.
+
+    ``re.compile(r'oss\.paths\.(\d+)\.tot'): r'space_total_\1'``
+        A compiled regular expression must match the entire key.
+        The new key is expanded as a template, such as ``\1`` or ``\g<name>`` for groups.
+
+    Literal keys take precedence over patterns, which are tried in the order of ``key_map``.
+    All patterns are compiled once, and the new key of every encountered key is cached.
+
+    If ``key_map`` has no patterns and ``cull_unknown`` is set, only the mapped
+    keys are looked up instead of inspecting every key of a mapping.
+    For a :py:class:`~pypelined.utilities.record.Record`, the positions and new keys
+    are resolved once per schema and values are read by position.
+    """
+    #: maximum number of resolved keys to cache
+    max_cached_keys = 4096
+    #: maximum number of record schemas to cache
+    max_cached_schemas = 64
+
+    def __init__(self, key_map, cull_unknown=True):
+        self.cull_unknown = cull_unknown
+        self._literals, self._patterns = {}, []
+        for key, new_key in key_map.items():
+            if isinstance(key, _PATTERN_TYPE):
+                self._patterns.append((re.compile('(?:%s)\\Z' % key.pattern, key.flags), new_key))
+            elif '*' in str(key).split('.'):
+                self._patterns.append(_compile_glob(key, new_key))
+            else:
+                self._literals[key] = new_key
+        # literal keys and their new keys, in matching order for itemgetter
+        self._old_keys = tuple(self._literals)
+        self._new_keys = tuple(self._literals[key] for key in self._old_keys)
+        self._key_pairs = tuple(zip(self._old_keys, self._new_keys))
+        self._key_set = frozenset(self._old_keys)
+        self._get_all = operator.itemgetter(*self._old_keys) if len(self._old_keys) > 1 else None
+        self._resolved = {}
+        self._schema_plans = {}
+        if self._patterns:
+            self._remap_mapping = self._remap_patterns
+        else:
+            self._remap_mapping = self._remap_literals if cull_unknown else self._remap_rename
+
+    def _resolve(self, key):
+        """Get the new key for ``key``, or :py:const:`None` if it is not mapped"""
+        try:
+            return self._literals[key]
+        except KeyError:
+            pass
+        for pattern, template in self._patterns:
+            match = pattern.match(key)
+            if match is not None:
+                return match.expand(template)
+        return key if not self.cull_unknown else None
+
+    def remap(self, input_dict):
+        """
+        Create a new mapping with the keys of ``input_dict`` mapped
+
+        :param input_dict: the mapping to remap
+        :type input_dict: dict
+        :rtype: dict
+        """
+        input_type = type(input_dict)
+        if input_type is Record:
+            return self._remap_record(input_dict)
+        elif input_type is Overlay and type(input_dict.base) is Record:
+            output_dict = self._remap_record(input_dict.base)
+            output_dict.update(self._remap_mapping(input_dict.updates))
+            return output_dict
+        return self._remap_mapping(input_dict)
+
+    def _remap_record(self, record):
+        try:
+            schema_plan = self._schema_plans[record.schema]
+        except KeyError:
+            if len(self._schema_plans) >= self.max_cached_schemas:
+                self._schema_plans.clear()
+            schema_plan = self._schema_plans[record.schema] = tuple(
+                (position, new_key) for position, new_key in enumerate(map(self._resolve, record.schema.keys))
+                if new_key is not None
+            )
+        data = record.data
+        return {new_key: data[position] for position, new_key in schema_plan}
+
+    def _remap_patterns(self, input_dict):
+        resolved = self._resolved
+        if len(resolved) > self.max_cached_keys:
+            resolved.clear()
+        output_dict = {}
+        for key, value in input_dict.items():
+            try:
+                new_key = resolved[key]
+            except KeyError:
+                new_key = resolved[key] = self._resolve(key)
+            if new_key is not None:
+                output_dict[new_key] = value
+        return output_dict
+
+    def _remap_literals(self, input_dict):
+        if self._get_all is not None and _keys_view(input_dict) >= self._key_set:
+            return dict(zip(self._new_keys, self._get_all(input_dict)))
+        return {new_key: input_dict[key] for key, new_key in self._key_pairs if key in input_dict}
+
+    def _remap_rename(self, input_dict):
+        get_key = self._literals.get
+        return {get_key(key, key): value for key, value in input_dict.items()}
+
+    def __repr__(self):
+        return '%s(literals=%d, patterns=%d, cull_unknown=%s)' % (
+            self.__class__.__name__, len(self._literals), len(self._patterns), self.cull_unknown
+        )
+
 
 @chainlet.genlet
 def remap(key_map, cull_unknown=True):
     """
     Map existing keys to new keys using a mapping
 
-    :param key_map: mapping from old to new keys
+    :param key_map: mapping from old to new keys or key patterns
     :type key_map: :py:class:`dict` or :py:class:`~collections.Mapping`
     :param cull_unknown: whether to remove all unmapped keys
     :type cull_unknown: bool
     :rtype: Generator[Dict, Dict, None]
+
+    Keys are mapped by a :py:class:`RemapPlan` prepared once for ``key_map``,
+    which may also contain dotted patterns such as ``'oss.paths.*.free'``
+    and compiled regular expressions.
+
+    If a data chunk is a :py:class:`list` of mappings, as provided by
+    :py:func:`~pypelined.modifier.batchlets.batch`, each mapping is remapped
+    and a :py:class:`list` is provided.
     """
+    remap_dict = RemapPlan(key_map, cull_unknown=cull_unknown).remap
     input_dict = yield
     while True:
-        output_dict = {}
-        for key, val in input_dict.items():
-            try:
-                new_key = key_map[key]
-            except KeyError:
-                if not cull_unknown:
-                    output_dict[key] = val
-            else:
-                output_dict[new_key] = val
-        input_dict = yield output_dict
+        if type(input_dict) is list:
+            input_dict = yield [remap_dict(item) for item in input_dict]
+        else:
+            input_dict = yield remap_dict(input_dict)
 
 
 @chainlet.funclet
@@ -36,10 +191,19 @@ def update(value, iterable=None, **kwargs):
     :param iterable: iterable of ``(key, value)`` pairs
     :type iterable: iterable[(str, T)]
     :param kwargs: explicit ``key=value`` parameters
+
+    The result is an :py:class:`~pypelined.utilities.overlay.Overlay` of the
+    new items over ``value``, which is neither copied nor modified.
+    This makes updating large reports cheap, even if they are forked to several
+    links.
+    Use ``.copy()`` on the result if a modifiable :py:class:`dict` is required.
+
+    If ``value`` is a :py:class:`list` of mappings, as provided by
+    :py:func:`~pypelined.modifier.batchlets.batch`, each mapping is updated
+    and a :py:class:`list` is provided.
     """
-    value = value.copy()
     if iterable:
-        value.update(iterable, **kwargs)
-    else:
-        value.update(**kwargs)
-    return value
+        kwargs = dict(iterable, **kwargs)
+    if type(value) is list:
+        return [Overlay(item, kwargs) for item in value]
+    return Overlay(value, kwargs)
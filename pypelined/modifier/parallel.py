@@ -0,0 +1,371 @@
+"""
+Links running parts of a pipeline concurrently to the rest
+"""
+from __future__ import absolute_import
+import logging
+import threading
+import time
+import multiprocessing
+try:
+    import queue
+except ImportError:  # python2
+    import Queue as queue
+
+import chainlet
+
+from ..utilities import ringbuffer
+from ..utilities.chains import close_links
+
+__all__ = ['FanOut', 'fanout', 'Buffer', 'buffer']
+
+
+class _ThreadBranch(object):
+    """
+    A chain driven by its own thread, receiving values via a bounded buffer
+
+    :param chain: the chain to send values to
+    :param capacity: maximum number of values waiting for ``chain``
+    :param overflow: how to handle values if the buffer is full
+    :param report_interval: interval in seconds for logging new drops, or :py:const:`None`
+    """
+    def __init__(self, chain, capacity, overflow, report_interval=None):
+        self._logger = logging.getLogger('%s.%s' % (__name__, self.__class__.__name__))
+        self.chain = chain
+        self.buffer = ringbuffer.RingBuffer(capacity=capacity, overflow=overflow)
+        self.report_interval = report_interval
+        #: whether ``chain`` has stopped and no longer receives values
+        self.finished = False
+        self._shutdown = threading.Event()
+        self._thread = None
+
+    def open(self):
+        if self._thread is None:
+            self._shutdown.clear()
+            self.finished = False
+            self._thread = threading.Thread(target=self._drive, name='%r driver' % self.chain)
+            self._thread.daemon = True
+            self._thread.start()
+
+    def put(self, value):
+        # values of a finished chain would never be taken from the buffer
+        if not self.finished:
+            self.buffer.put(value)
+
+    def _drive(self):
+        try:
+            self._drive_chain()
+        finally:
+            self.finished = True
+            # release any producer waiting for space in the buffer
+            self.buffer.get_many(self.buffer.capacity, timeout=0)
+
+    def _drive_chain(self):
+        chain, buffer, shutdown = self.chain, self.buffer, self._shutdown
+        reported_drops, next_report = 0, time.time() + (self.report_interval or 0)
+        while not shutdown.is_set() or buffer:
+            if self.report_interval is not None and time.time() >= next_report:
+                if buffer.drops > reported_drops:
+                    self._logger.warning('%r dropped %d values (%s)', chain, buffer.drops - reported_drops,
+                                         ', '.join('%s=%s' % item for item in sorted(buffer.statistics().items())))
+                    reported_drops = buffer.drops
+                next_report = time.time() + self.report_interval
+            for value in buffer.get_many(64, timeout=0.5):
+                try:
+                    chain.send(value)
+                except StopIteration:
+                    self._logger.info('%r exhausted, discarding further values', chain)
+                    return
+                except Exception as err:
+                    self._logger.exception('failed to process %r: %s', value, err)
+
+    def close(self):
+        if self._thread is not None:
+            self._shutdown.set()
+            self._thread.join()
+            self._thread = None
+            close_links(self.chain)
+
+    @property
+    def statistics(self):
+        return self.buffer.statistics()
+
+
+def _drive_process(chain, values):
+    """Send all ``values`` to ``chain`` until receiving :py:const:`None`, then close ``chain``"""
+    logger = logging.getLogger('%s.%s' % (__name__, _ProcessBranch.__name__))
+    try:
+        for value in iter(values.get, None):
+            try:
+                chain.send(value)
+            except StopIteration:
+                logger.info('%r exhausted', chain)
+                return
+            except Exception as err:
+                logger.exception('failed to process %r: %s', value, err)
+    finally:
+        close_links(chain)
+
+
+class _ProcessBranch(object):
+    """
+    A chain driven by its own process, receiving values via a bounded queue
+
+    :param chain: the chain to send values to
+    :param capacity: maximum number of values waiting for ``chain``
+    :param overflow: how to handle values if the queue is full
+    """
+    #: maximum time in seconds to wait for the process to finish queued values when closing
+    close_timeout = 30.0
+
+    def __init__(self, chain, capacity, overflow):
+        if overflow not in ringbuffer.OVERFLOW_POLICIES:
+            raise ValueError('overflow must be one of %s, not %r' % (
+                ', '.join(ringbuffer.OVERFLOW_POLICIES), overflow))
+        self._logger = logging.getLogger('%s.%s' % (__name__, self.__class__.__name__))
+        self.chain = chain
+        self.capacity = capacity
+        self.overflow = overflow
+        try:
+            self._context = multiprocessing.get_context('fork')
+        except AttributeError:  # python2 always forks
+            self._context = multiprocessing
+        self._queue = None
+        self._process = None
+        #: whether ``chain`` has stopped and no longer receives values
+        self.finished = False
+        self.puts = 0
+        self.drops = 0
+        self.high_water = 0
+
+    def open(self):
+        if self._process is None:
+            self.finished = False
+            self._queue = self._context.Queue(maxsize=self.capacity)
+            self._process = self._context.Process(target=_drive_process, args=(self.chain, self._queue))
+            self._process.daemon = True
+            self._process.start()
+
+    def put(self, value):
+        if self.finished:
+            return
+        values = self._queue
+        try:
+            if self.overflow == 'block':
+                # the process exits once its chain is exhausted, and never empties the queue again
+                while True:
+                    try:
+                        values.put(value, timeout=0.5)
+                        break
+                    except queue.Full:
+                        if not self._process.is_alive():
+                            self.finished = True
+                            return
+            else:
+                values.put_nowait(value)
+        except queue.Full:
+            if self.overflow == 'drop-newest':
+                self.drops += 1
+                return
+            try:
+                values.get_nowait()
+            except queue.Empty:
+                pass
+            else:
+                self.drops += 1
+            # the queue may still be full while its feeder thread has not flushed
+            try:
+                values.put_nowait(value)
+            except queue.Full:
+                self.drops += 1
+                return
+        self.puts += 1
+        depth = self._depth()
+        if depth > self.high_water:
+            self.high_water = depth
+
+    def _depth(self):
+        try:
+            return self._queue.qsize()
+        except (NotImplementedError, AttributeError):
+            return 0
+
+    def close(self):
+        if self._process is None:
+            return
+        values, process = self._queue, self._process
+        deadline = time.time() + self.close_timeout
+        # the process may be gone or stuck, and never take the sentinel from a full queue
+        while process.is_alive() and time.time() < deadline:
+            try:
+                values.put(None, timeout=0.5)
+            except queue.Full:
+                continue
+            break
+        process.join(max(0.0, deadline - time.time()))
+        if process.is_alive():
+            self._logger.warning('terminating %r after %.1fs', self.chain, self.close_timeout)
+            process.terminate()
+            process.join()
+        # nobody reads remaining values, which must not block exiting
+        values.cancel_join_thread()
+        values.close()
+        self._process = self._queue = None
+
+    @property
+    def statistics(self):
+        return {
+            'depth': self._depth() if self._process is not None else 0, 'capacity': self.capacity,
+            'high_water': self.high_water, 'puts': self.puts, 'drops': self.drops,
+        }
+
+
+_BRANCH_TYPES = {'thread': _ThreadBranch, 'process': _ProcessBranch}
+
+
+class FanOut(chainlet.ChainLink):
+    """
+    Send each value to several ``branches``, running concurrently in separate workers
+
+    :param branches: the links or chains to send values to
+    :type branches: :py:class:`chainlet.ChainLink`
+    :param worker: how to run each branch, either ``"thread"`` or ``"process"``
+    :type worker: str
+    :param capacity: maximum number of values waiting for each branch
+    :type capacity: int
+    :param overflow: how to handle values if a branch is too slow
+    :type overflow: str
+
+    Each branch is driven by its own ``worker`` and receives values via its own
+    queue of size ``capacity``.
+    If the queue of a branch is full, new values are handled according to ``overflow``,
+    which is one of ``'block'``, ``'drop-oldest'`` or ``'drop-newest'``.
+    With dropping policies, a slow branch does not delay any other branch.
+
+    Use ``worker="process"`` for CPU-bound branches.
+    Branch processes are forked when the first value is sent, and values must be
+    pickleable.
+    Note that each process works on a copy of its branch, and cannot share
+    state with the rest of the pipeline.
+
+    Once a branch is exhausted, it no longer receives values, while all other
+    branches continue to receive values.
+
+    Values are passed on unchanged, so a :py:class:`FanOut` can be followed by further links.
+    """
+    def __init__(self, *branches, **kwargs):
+        super(FanOut, self).__init__()
+        worker = kwargs.pop('worker', 'thread')
+        capacity = kwargs.pop('capacity', 1024)
+        overflow = kwargs.pop('overflow', 'block')
+        if kwargs:
+            raise TypeError('unexpected keyword argument(s): %s' % ', '.join(kwargs))
+        try:
+            branch_type = _BRANCH_TYPES[worker]
+        except KeyError:
+            raise ValueError("worker must be 'thread' or 'process', not %r" % worker)
+        self.worker = worker
+        self.branches = [branch_type(branch, capacity, overflow) for branch in branches]
+        self._opened = False
+
+    def open(self):
+        """Start the workers of all branches"""
+        if not self._opened:
+            for branch in self.branches:
+                branch.open()
+            self._opened = True
+
+    def close(self):
+        """Process all queued values, stop the workers of all branches and close their chains"""
+        if self._opened:
+            for branch in self.branches:
+                branch.close()
+            self._opened = False
+
+    def chainlet_send(self, value=None):
+        if not self._opened:
+            self.open()
+        for branch in self.branches:
+            branch.put(value)
+        return value
+
+    @property
+    def statistics(self):
+        """Counters of the queue of each branch"""
+        return [branch.statistics for branch in self.branches]
+
+    def __repr__(self):
+        return '%s(%s, worker=%r)' % (
+            self.__class__.__name__, ', '.join(repr(branch.chain) for branch in self.branches), self.worker
+        )
+
+
+fanout = FanOut
+
+
+class Buffer(chainlet.ChainLink):
+    """
+    Decouple a ``chain`` from the rest of the pipeline with a bounded buffer
+
+    :param chain: the link or chain to send values to
+    :type chain: :py:class:`chainlet.ChainLink`
+    :param capacity: maximum number of values waiting for ``chain``
+    :type capacity: int
+    :param overflow: how to handle values if the buffer is full
+    :type overflow: str
+    :param report_interval: interval in seconds for logging new drops, or :py:const:`None`
+    :type report_interval: float or None
+
+    Values are stored in a :py:class:`~pypelined.utilities.ringbuffer.RingBuffer`
+    of size ``capacity``, and sent to ``chain`` by a separate consumer thread.
+    This lets a slow ``chain``, such as a network consumer, absorb bursts of values
+    without delaying the provider.
+    If the buffer is full, values are handled according to ``overflow``,
+    which is one of ``'block'``, ``'drop-oldest'`` or ``'drop-newest'``.
+
+    The :py:attr:`statistics` provide the current depth, high-water mark and
+    the number of values buffered and dropped.
+    Drops are logged at most every ``report_interval`` seconds.
+
+    Values are passed on unchanged, so a :py:class:`Buffer` can be followed by further links.
+    """
+    def __init__(self, chain, capacity=4096, overflow='block', report_interval=60.0):
+        super(Buffer, self).__init__()
+        self._logger = logging.getLogger('%s.%s' % (__name__, self.__class__.__name__))
+        self._branch = _ThreadBranch(chain, capacity, overflow, report_interval=report_interval)
+        self._opened = False
+
+    @property
+    def chain(self):
+        return self._branch.chain
+
+    def open(self):
+        """Start the consumer thread"""
+        if not self._opened:
+            self._branch.open()
+            self._opened = True
+
+    def close(self):
+        """Process all buffered values, stop the consumer thread and close its chain"""
+        if self._opened:
+            self._branch.close()
+            self._opened = False
+            self._logger.info('closed %r (%s)', self, self.statistics)
+
+    def chainlet_send(self, value=None):
+        if not self._opened:
+            self.open()
+        self._branch.put(value)
+        return value
+
+    @property
+    def statistics(self):
+        """Counters of the buffer"""
+        return self._branch.statistics
+
+    def __repr__(self):
+        return '%s(%r, capacity=%d, overflow=%r)' % (
+            self.__class__.__name__, self.chain, self._branch.buffer.capacity, self._branch.buffer.overflow
+        )
+
+
+buffer = Buffer
@@ -0,0 +1,204 @@
+"""
+Sampling profiler for live pipelines
+
+A :py:class:`StackSampler` periodically records the stacks of all threads of
+the process, without tracing or modifying any code.
+Once done, the stacks are written in the *collapsed* format, with one line
+of ``frame;frame;...;frame count`` per distinct stack, as used by
+``flamegraph.pl``, ``speedscope`` and similar tools.
+
+Frames of links are labelled by their link type,
+such as ``update.chainlet_send`` for :py:func:`~pypelined.modifier.dictlets.update`.
+Functions wrapped by :py:func:`chainlet.funclet` and :py:func:`chainlet.genlet`
+appear with their own name and location below their link,
+so that hot spots in configuration code are attributed to links.
+
+The ``pypelined`` command can profile its pipelines via the ``--profile`` option:
+``start`` profiles right after startup, while ``signal`` waits until
+the process receives ``SIGUSR2``.
+Each worker process of ``--workers`` can be profiled by sending it the signal as well.
+"""
+from __future__ import absolute_import, division
+import collections
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+
+from .instrumentation import Probe
+
+__all__ = ['StackSampler', 'install_signal_handler', 'write_collapsed', 'DEFAULT_OUTPUT']
+
+#: template of the output path, formatted with the ``pid`` and start ``time`` of profiling
+DEFAULT_OUTPUT = '/tmp/pypelined.%(pid)d.%(time)d.collapsed'
+
+
+def _link_label(link):
+    if isinstance(link, Probe):
+        return '%s.probe' % type(link.link).__name__
+    return '%s.chainlet_send' % type(link).__name__
+
+
+class StackSampler(object):
+    """
+    Sample the stacks of all threads at ``rate`` per second for ``duration`` seconds
+
+    :param rate: number of samples per second
+    :type rate: float
+    :param duration: time in seconds to sample for
+    :type duration: float
+    :param output: template of the path to write stacks to, see :py:data:`DEFAULT_OUTPUT`
+    :type output: str
+
+    Samples are taken by a background thread once :py:meth:`start` is called,
+    and written to ``output`` once ``duration`` has passed or :py:meth:`stop` is called.
+    Stacks are sampled regardless of whether threads are busy or waiting,
+    so providers waiting for new data appear in their waiting function.
+
+    Sampling only reads the current frames of threads.
+    The overhead for pipelines is limited to holding the interpreter lock
+    while a sample is taken.
+    """
+    def __init__(self, rate=100.0, duration=30.0, output=DEFAULT_OUTPUT):
+        if rate <= 0:
+            raise ValueError('rate must be positive')
+        self.rate = rate
+        self.duration = duration
+        self.output = output
+        self._thread = None
+        self._owner = None
+        self._stop = threading.Event()
+        # code object -> frame label, for frames which are not links
+        self._labels = {}
+        self._logger = logging.getLogger('%s.%s' % (__name__, self.__class__.__name__))
+
+    @property
+    def running(self):
+        """Whether samples are currently taken"""
+        # a forked process does not inherit the sampling thread
+        return self._thread is not None and self._owner == os.getpid() and self._thread.is_alive()
+
+    def start(self):
+        """
+        Start sampling in a background thread
+
+        :returns: whether sampling was started, i.e. was not running already
+        :rtype: bool
+        """
+        if self.running:
+            return False
+        self._stop.clear()
+        self._owner = os.getpid()
+        self._thread = threading.Thread(target=self.run, name='pypelined profiler')
+        self._thread.daemon = True
+        self._thread.start()
+        return True
+
+    def stop(self):
+        """Stop sampling and write the stacks sampled so far"""
+        self._stop.set()
+        if self.running:
+            self._thread.join()
+
+    def run(self):
+        """
+        Sample stacks for ``duration`` seconds in the current thread and write them
+
+        :returns: the path the stacks are written to
+        :rtype: str
+        """
+        started = time.time()
+        path = self.output % {'pid': os.getpid(), 'time': started}
+        self._logger.warning('profiling for %.1fs at %.1f Hz to %r', self.duration, self.rate, path)
+        stacks = self.sample()
+        write_collapsed(stacks, path)
+        self._logger.warning(
+            'profiled %d samples of %d distinct stacks in %.1fs to %r',
+            sum(stacks.values()), len(stacks), time.time() - started, path
+        )
+        return path
+
+    def sample(self):
+        """
+        Sample stacks for ``duration`` seconds in the current thread
+
+        :returns: the number of samples of each stack
+        :rtype: dict[tuple[str], int]
+        """
+        stacks = collections.Counter()
+        interval, deadline = 1.0 / self.rate, time.time() + self.duration
+        own_ident = threading.current_thread().ident
+        while not self._stop.is_set():
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            frames = sys._current_frames()
+            for ident, frame in frames.items():
+                if ident != own_ident:
+                    stacks[self._stack(names.get(ident, 'thread %d' % ident), frame)] += 1
+            # do not keep frames and their locals alive while waiting
+            del frames, frame
+            now = time.time()
+            if now >= deadline:
+                break
+            self._stop.wait(min(interval, deadline - now))
+        return stacks
+
+    def _stack(self, thread_name, frame):
+        """Get the labels of all frames of a stack, starting with the outermost"""
+        labels, cache = [], self._labels
+        while frame is not None:
+            code = frame.f_code
+            if code.co_name == 'chainlet_send':
+                labels.append(_link_label(frame.f_locals.get('self')))
+            else:
+                try:
+                    labels.append(cache[code])
+                except KeyError:
+                    label = cache[code] = '%s (%s:%d)' % (code.co_name, code.co_filename, code.co_firstlineno)
+                    labels.append(label)
+            frame = frame.f_back
+        labels.append(thread_name)
+        labels.reverse()
+        return tuple(labels)
+
+    def __repr__(self):
+        return '%s(rate=%s, duration=%s, output=%r)' % (
+            self.__class__.__name__, self.rate, self.duration, self.output
+        )
+
+
+def write_collapsed(stacks, path):
+    """
+    Write ``stacks`` to ``path`` in the collapsed stack format
+
+    :param stacks: the number of samples of each stack of frame labels
+    :type stacks: dict[tuple[str], int]
+    :param path: the file to write to
+    :type path: str
+    """
+    with open(path, 'w') as output:
+        for stack, count in sorted(stacks.items()):
+            # semicolons separate frames, and spaces separate the count
+            output.write('%s %d\n' % (';'.join(label.replace(';', ':') for label in stack), count))
+
+
+def install_signal_handler(sampler, signum=signal.SIGUSR2):
+    """
+    Start ``sampler`` whenever the process receives the signal ``signum``
+
+    :param sampler: the sampler to start
+    :type sampler: :py:class:`StackSampler`
+    :param signum: the signal to trigger profiling
+    :type signum: int
+
+    Signals received while the ``sampler`` is running are ignored.
+    Note that signal handlers can only be installed from the main thread.
+    """
+    logger = logging.getLogger(__name__)
+
+    def start_sampler(signum, frame):
+        if not sampler.start():
+            logger.warning('ignoring signal %d, profiling already in progress', signum)
+
+    signal.signal(signum, start_sampler)
@@ -0,0 +1,512 @@
+"""
+Providers receiving data from sockets
+"""
+from __future__ import absolute_import
+import errno
+import os
+import stat
+import socket
+import logging
+import collections
+import threading
+import select
+import time
+try:
+    import selectors
+except ImportError:  # python2
+    import selectors34 as selectors
+
+import chainlet
+
+from ..utilities import mmsg, ringbuffer
+
+__all__ = ['Socket', 'UDPDatagrams', 'udp_receive']
+
+#: errors of non-blocking operations which must be retried later
+_RETRY_ERRNOS = frozenset((errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR))
+#: errors of accepting a connection which only affect the connection
+_ACCEPT_ABORT_ERRNOS = frozenset((errno.ECONNABORTED, errno.EPROTO, errno.EPERM))
+#: errors of accepting a connection due to exhausted resources
+_ACCEPT_RESOURCE_ERRNOS = frozenset((errno.EMFILE, errno.ENFILE, errno.ENOBUFS, errno.ENOMEM))
+
+
+class _Connection(object):
+    """Buffer and state of a single client connection"""
+    __slots__ = ('socket', 'peer', 'buffer')
+
+    def __init__(self, client, peer):
+        self.socket = client
+        self.peer = peer
+        self.buffer = bytearray()
+
+
+class Socket(chainlet.ChainLink):
+    """
+    Provide newline delimited frames sent by clients of stream sockets
+
+    :param addresses: where to listen for connections
+    :type addresses: int, tuple[str, int] or str
+    :param encoding: encoding to decode frames with, or :py:const:`None` to provide raw :py:class:`bytes`
+    :type encoding: str or None
+    :param errors: how to handle frames which cannot be decoded, as for :py:meth:`bytes.decode`
+    :type errors: str
+    :param max_frame: maximum size of a frame in bytes
+    :type max_frame: int
+    :param max_connections: maximum number of concurrent client connections
+    :type max_connections: int
+    :param recv_size: maximum number of bytes to receive per connection at once
+    :type recv_size: int
+    :param accept_backoff: time in seconds to pause accepting connections if resources are exhausted
+    :type accept_backoff: float
+
+    Each address may be a port to listen on all interfaces,
+    a ``(host, port)`` pair, or a path for a Unix domain socket.
+    All listeners and connected clients are served by a single
+    :py:mod:`selectors` event loop.
+    Data from each client is split into frames at newlines,
+    which are provided individually and without the line break.
+
+    Clients are only read from when all frames received so far have been consumed,
+    and each client may provide at most ``recv_size`` bytes per read.
+    At most ``max_connections`` times ``recv_size`` bytes of frames are buffered;
+    any other data remains queued in the operating system, which makes
+    clients block when sending too fast.
+    Clients sending frames longer than ``max_frame`` are disconnected.
+    If no more connections can be accepted due to exhausted resources,
+    such as the number of open files, accepting pauses for ``accept_backoff`` seconds.
+
+    Instead of fetching frames individually, event loops may wait for :py:meth:`fileno`
+    to become readable, and :py:meth:`poll` all frames received without blocking.
+    """
+    def __init__(self, *addresses, **kwargs):
+        super(Socket, self).__init__()
+        self._logger = logging.getLogger('%s.%s' % (__name__, self.__class__.__name__))
+        self.addresses = addresses
+        self.encoding = kwargs.pop('encoding', 'utf-8')
+        self.errors = kwargs.pop('errors', 'replace')
+        self.max_frame = kwargs.pop('max_frame', 65536)
+        self.max_connections = kwargs.pop('max_connections', 1024)
+        recv_size = kwargs.pop('recv_size', 65536)
+        self.accept_backoff = kwargs.pop('accept_backoff', 1.0)
+        if kwargs:
+            raise TypeError('unexpected keyword argument(s): %s' % ', '.join(kwargs))
+        self._recv_buffer = bytearray(recv_size)
+        self._recv_view = memoryview(self._recv_buffer)
+        # frames received by the selector, and frames polled but not yet fetched
+        self._frames = []
+        self._pending = collections.deque()
+        self._selector = None
+        self._listeners = []
+        self._connections = 0
+        # time until which listeners are not polled due to exhausted resources
+        self._accept_paused = None
+
+    def open(self):
+        """Start listening for connections"""
+        if self._selector is None:
+            self._selector = selectors.DefaultSelector()
+            for address in self.addresses:
+                listener = self._bind(address)
+                listener.setblocking(False)
+                listener.listen(128)
+                self._selector.register(listener, selectors.EVENT_READ, None)
+                self._listeners.append(listener)
+                self._logger.info('listening on %s', listener.getsockname())
+
+    @staticmethod
+    def _bind(address):
+        if isinstance(address, int):
+            address = ('', address)
+        if isinstance(address, tuple):
+            family = socket.getaddrinfo(
+                address[0] or None, address[1], 0, socket.SOCK_STREAM, 0, socket.AI_PASSIVE
+            )[0][0]
+            listener = socket.socket(family, socket.SOCK_STREAM)
+            listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        else:
+            # remove stale sockets of previous runs, but never any other file
+            if os.path.exists(address) and stat.S_ISSOCK(os.stat(address).st_mode):
+                os.unlink(address)
+            listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        listener.bind(address)
+        return listener
+
+    def close(self):
+        """Stop listening and disconnect all clients"""
+        if self._selector is not None:
+            for key in list(self._selector.get_map().values()):
+                if key.data is not None:
+                    self._disconnect(key.data)
+            self._resume_accept()
+            for listener in self._listeners:
+                self._selector.unregister(listener)
+                address = listener.getsockname()
+                listener.close()
+                if listener.family == socket.AF_UNIX:
+                    os.unlink(address)
+            self._listeners = []
+            self._selector.close()
+            self._selector = None
+
+    def chainlet_send(self, value=None):
+        """Fetch a frame"""
+        frames = self._pending
+        while not frames:
+            frames.extend(self.poll())
+        return frames.popleft()
+
+    def fileno(self):
+        """
+        File descriptor which is readable when :py:meth:`poll` may receive frames
+
+        :returns: the descriptor, or :py:const:`None` if the selector does not provide one
+        :rtype: int or None
+        """
+        self.open()
+        try:
+            return self._selector.fileno()
+        except AttributeError:
+            return None
+
+    @property
+    def delay(self):
+        """Maximum time in seconds until :py:meth:`poll` is due, even if :py:meth:`fileno` is not readable"""
+        if self._accept_paused is None:
+            return None
+        return max(0.0, self._accept_paused - time.time())
+
+    def poll(self, timeout=None):
+        """
+        Wait for and receive frames from clients
+
+        :param timeout: maximum time in seconds to wait, or :py:const:`None` to wait until any frame is received
+        :type timeout: float or None
+        :returns: all frames received
+        :rtype: list
+
+        Use a ``timeout`` of ``0`` to receive frames without blocking.
+        """
+        self.open()
+        deadline = None if timeout is None else time.time() + timeout
+        while not self._frames:
+            self._select(None if deadline is None else max(0.0, deadline - time.time()))
+            if deadline is not None and time.time() >= deadline:
+                break
+        frames, self._frames = self._frames, []
+        if self.encoding:
+            encoding, errors = self.encoding, self.errors
+            return [frame.decode(encoding, errors) for frame in frames]
+        return frames
+
+    def _select(self, timeout=None):
+        if self._accept_paused is not None:
+            remaining = self._accept_paused - time.time()
+            if remaining <= 0:
+                self._resume_accept()
+            elif timeout is None or timeout > remaining:
+                timeout = remaining
+        for key, _ in self._selector.select(timeout):
+            if key.data is None:
+                self._accept(key.fileobj)
+            else:
+                self._receive(key.data)
+
+    def _accept(self, listener):
+        try:
+            client, peer = listener.accept()
+        except socket.error as err:
+            if err.errno in _RETRY_ERRNOS:
+                return
+            elif err.errno in _ACCEPT_ABORT_ERRNOS:
+                self._logger.debug('failed accepting connection: %s', err)
+                return
+            elif err.errno in _ACCEPT_RESOURCE_ERRNOS:
+                self._logger.warning('pausing accepting connections for %.1fs: %s', self.accept_backoff, err)
+                self._pause_accept()
+                return
+            raise
+        if self._connections >= self.max_connections:
+            self._logger.warning('rejecting %s: too many connections (%d)', peer, self._connections)
+            client.close()
+            return
+        client.setblocking(False)
+        self._selector.register(client, selectors.EVENT_READ, _Connection(client, peer))
+        self._connections += 1
+        self._logger.debug('connected %s', peer)
+
+    def _pause_accept(self):
+        """Stop polling listeners for ``accept_backoff`` seconds"""
+        if self._accept_paused is None:
+            for listener in self._listeners:
+                self._selector.unregister(listener)
+        self._accept_paused = time.time() + self.accept_backoff
+
+    def _resume_accept(self):
+        if self._accept_paused is not None:
+            for listener in self._listeners:
+                self._selector.register(listener, selectors.EVENT_READ, None)
+            self._accept_paused = None
+
+    def _receive(self, connection):
+        try:
+            size = connection.socket.recv_into(self._recv_buffer)
+        except socket.error as err:
+            if err.errno in _RETRY_ERRNOS:
+                return
+            self._logger.warning('failed receiving from %s: %s', connection.peer, err)
+            size = 0
+        if not size:
+            # connection is closed, the remainder is the last frame
+            if connection.buffer:
+                self._frames.append(bytes(connection.buffer))
+            self._disconnect(connection)
+            return
+        buffer = connection.buffer
+        buffer += self._recv_view[:size]
+        start, frames = 0, self._frames
+        while True:
+            end = buffer.find(b'\n', start)
+            if end < 0:
+                break
+            frames.append(bytes(buffer[start:end]))
+            start = end + 1
+        if start:
+            del buffer[:start]
+        if len(buffer) > self.max_frame:
+            self._logger.warning('disconnecting %s: frame exceeds %d bytes', connection.peer, self.max_frame)
+            self._disconnect(connection)
+
+    def _disconnect(self, connection):
+        self._selector.unregister(connection.socket)
+        connection.socket.close()
+        self._connections -= 1
+        self._logger.debug('disconnected %s', connection.peer)
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+    def __repr__(self):
+        return '%s(%s)' % (self.__class__.__name__, ', '.join(repr(address) for address in self.addresses))
+
+
+class UDPDatagrams(chainlet.ChainLink):
+    """
+    Provide datagrams received on a UDP socket
+
+    :param address: where to receive datagrams, as a port or ``(host, port)`` pair
+    :type address: int or tuple[str, int]
+    :param encoding: encoding to decode datagrams with, or :py:const:`None` to provide raw :py:class:`bytes`
+    :type encoding: str or None
+    :param errors: how to handle datagrams which cannot be decoded, as for :py:meth:`bytes.decode`
+    :type errors: str
+    :param capacity: maximum number of datagrams buffered for processing
+    :type capacity: int
+    :param overflow: how to handle datagrams when the buffer is full
+    :type overflow: str
+    :param batch_size: maximum number of datagrams to receive at once
+    :type batch_size: int
+    :param max_size: maximum size of datagrams
+    :type max_size: int
+    :param rcvbuf: size of the socket receive buffer in bytes, or :py:const:`None` for the system default
+    :type rcvbuf: int or None
+
+    Datagrams are received in bulk by a background thread using ``recvmmsg``
+    if available, and stored in a :py:class:`~pypelined.utilities.ringbuffer.RingBuffer`
+    of size ``capacity``.
+    If processing cannot keep up, datagrams are discarded according to ``overflow``,
+    which is one of ``'drop-newest'``, ``'drop-oldest'`` or ``'block'``.
+    Note that with ``'block'``, excess datagrams are still dropped by the operating system,
+    and datagrams are discarded if there is no space in the buffer for half a second.
+    Errors of receiving individual datagrams are logged and ignored,
+    while fetching a datagram fails if the background thread has stopped.
+
+    Event loops may instead :py:meth:`open` the provider without a background thread,
+    wait for :py:meth:`fileno` to become readable, and :py:meth:`poll` datagrams
+    without blocking.
+    """
+    def __init__(self, address, encoding='utf-8', capacity=65536, overflow='drop-newest', batch_size=64,
+                 max_size=65535, rcvbuf=None, errors='replace'):
+        super(UDPDatagrams, self).__init__()
+        self._logger = logging.getLogger('%s.%s' % (__name__, self.__class__.__name__))
+        self.address = ('', address) if isinstance(address, int) else address
+        self.encoding = encoding
+        self.errors = errors
+        self.batch_size = batch_size
+        self.max_size = max_size
+        self.rcvbuf = rcvbuf
+        self.buffer = ringbuffer.RingBuffer(capacity=capacity, overflow=overflow)
+        #: number of datagrams received from the socket
+        self.received = 0
+        self._socket = None
+        self._receiver = None
+        self._thread = None
+        self._shutdown = threading.Event()
+        # datagrams polled but not yet fetched
+        self._pending = collections.deque()
+
+    def open(self, background=True):
+        """
+        Start receiving datagrams
+
+        :param background: whether to receive datagrams in a background thread,
+                           instead of only when they are polled
+        :type background: bool
+
+        Has no effect if the provider is already open.
+        """
+        if self._socket is None:
+            self._open_socket()
+            self._receiver = mmsg.DatagramReceiver(self._socket, count=self.batch_size, size=self.max_size)
+            if background:
+                self._shutdown.clear()
+                self._thread = threading.Thread(target=self._receive_datagrams, name='%r receiver' % self)
+                self._thread.daemon = True
+                self._thread.start()
+
+    def _open_socket(self):
+        family = socket.getaddrinfo(
+            self.address[0] or None, self.address[1], 0, socket.SOCK_DGRAM, 0, socket.AI_PASSIVE
+        )[0][0]
+        self._socket = socket.socket(family, socket.SOCK_DGRAM)
+        if self.rcvbuf is not None:
+            self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.rcvbuf)
+        self._socket.bind(self.address)
+        self._socket.setblocking(False)
+        self._logger.info('receiving datagrams on %s', self._socket.getsockname())
+        return self._socket
+
+    def close(self):
+        """Stop receiving datagrams"""
+        if self._socket is not None:
+            if self._thread is not None:
+                self._shutdown.set()
+                self._thread.join()
+                self._thread = None
+            self._socket.close()
+            self._socket = self._receiver = None
+            self._logger.info('closed %r (received: %d, dropped: %d)', self, self.received, self.buffer.drops)
+
+    def _receive_datagrams(self):
+        try:
+            self._receive_loop()
+        except Exception as err:
+            self._logger.exception('stopped receiving datagrams: %s', err)
+
+    def _receive_loop(self):
+        receiver, sock, shutdown, buffer = self._receiver, self._socket, self._shutdown, self.buffer
+        while not shutdown.is_set():
+            readable, _, _ = select.select([sock], [], [], 0.5)
+            if not readable:
+                continue
+            try:
+                datagrams = receiver.receive()
+            except (socket.error, OSError) as err:
+                # errors such as ECONNREFUSED only affect individual datagrams
+                if err.errno not in _RETRY_ERRNOS:
+                    self._logger.warning('failed receiving datagrams: %s', err)
+                continue
+            self.received += len(datagrams)
+            # do not block indefinitely on a full buffer, to notice a shutdown
+            buffer.put_many(datagrams, timeout=0.5)
+
+    @property
+    def statistics(self):
+        """Counters of received, buffered and dropped datagrams"""
+        statistics = self.buffer.statistics()
+        statistics['received'] = self.received
+        return statistics
+
+    def chainlet_send(self, value=None):
+        """Fetch a datagram"""
+        datagrams = self._pending
+        while not datagrams:
+            datagrams.extend(self.poll())
+        return datagrams.popleft()
+
+    def fileno(self):
+        """
+        File descriptor which is readable when :py:meth:`poll` may receive datagrams
+
+        :returns: the descriptor, or :py:const:`None` if datagrams are received in the background
+        :rtype: int or None
+        """
+        if self._socket is None or self._thread is not None:
+            return None
+        return self._socket.fileno()
+
+    #: maximum time in seconds until :py:meth:`poll` is due, even if :py:meth:`fileno` is not readable
+    delay = None
+
+    def poll(self, timeout=None):
+        """
+        Wait for and fetch received datagrams
+
+        :param timeout: maximum time in seconds to wait, or :py:const:`None` to wait until any datagram is received
+        :type timeout: float or None
+        :returns: up to ``batch_size`` datagrams
+        :rtype: list
+
+        Use a ``timeout`` of ``0`` to fetch datagrams without blocking.
+        If not open yet, the provider is opened with a background thread.
+        """
+        self.open()
+        if self._thread is not None:
+            datagrams = self._fetch(timeout)
+        else:
+            datagrams = self._receive(timeout)
+        if self.encoding:
+            encoding, errors = self.encoding, self.errors
+            return [datagram.decode(encoding, errors) for datagram in datagrams]
+        return datagrams
+
+    def _fetch(self, timeout):
+        """Fetch datagrams received by the background thread, waiting up to ``timeout``"""
+        buffer, deadline = self.buffer, None if timeout is None else time.time() + timeout
+        while True:
+            # wake up regularly to notice if the background thread has stopped
+            remaining = 0.5 if deadline is None else max(0.0, min(0.5, deadline - time.time()))
+            datagrams = buffer.get_many(self.batch_size, remaining)
+            if datagrams:
+                return datagrams
+            if not self._thread.is_alive():
+                raise RuntimeError('%r stopped receiving datagrams' % self)
+            if deadline is not None and time.time() >= deadline:
+                return []
+
+    def _receive(self, timeout):
+        """Receive datagrams directly from the socket, waiting up to ``timeout``"""
+        sock, deadline = self._socket, None if timeout is None else time.time() + timeout
+        while True:
+            remaining = None if deadline is None else max(0.0, deadline - time.time())
+            readable, _, _ = select.select([sock], [], [], remaining)
+            if readable:
+                try:
+                    datagrams = self._receiver.receive()
+                except (socket.error, OSError) as err:
+                    if err.errno not in _RETRY_ERRNOS:
+                        self._logger.warning('failed receiving datagrams: %s', err)
+                    datagrams = None
+                if datagrams:
+                    self.received += len(datagrams)
+                    return datagrams
+            if deadline is not None and time.time() >= deadline:
+                return []
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+    def __repr__(self):
+        return '%s(%r)' % (self.__class__.__name__, self.address)
+
+
+udp_receive = UDPDatagrams
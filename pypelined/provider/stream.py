@@ -1,24 +1,89 @@
 from __future__ import absolute_import
 import os
+import stat as stat_module
 import errno
 import time
+import locale
+import glob
+import fnmatch
+import logging
+import collections
+import threading
+import weakref
 
 import chainlet
 
+from ..utilities import inotify, checkpoint as _checkpoint
+
+try:
+    # file names reported by inotify are bytes, which may not be valid in the file system encoding
+    _fsencode, _fsdecode = os.fsencode, os.fsdecode
+except AttributeError:  # python2 file names are bytes already
+    _fsencode = _fsdecode = str
+
 
 @chainlet.genlet(prime=False)
-def readlines(filelike):
+def readlines(filelike, checkpoint=None):
     """
     Read lines from a file-like object
 
+    :param filelike: the object to read lines from
+    :param checkpoint: path of or store to persist the read offset to
+    :type checkpoint: str or :py:class:`~pypelined.utilities.checkpoint.CheckpointStore` or None
+
     Stops once the underlying object no longer provides any lines.
+
+    If ``checkpoint`` is given and ``filelike`` is a regular file,
+    reading starts at the offset saved for the file, if any,
+    and the offset of read lines is saved regularly.
     """
-    for line in filelike:
-        yield line[:-1]
+    store = _get_store(checkpoint)
+    if store is None or not _is_regular(filelike):
+        for line in filelike:
+            yield line[:-1]
+        return
+    key = os.path.abspath(filelike.name)
+    stat = os.fstat(filelike.fileno())
+    identity = stat.st_dev, stat.st_ino
+    resume = store.get(key)
+    if resume is not None and resume[0] == identity and resume[1] <= stat.st_size:
+        filelike.seek(resume[1])
+    offset = filelike.tell()
+    # track the offset in bytes, which text files cannot provide while iterating
+    raw_lines = getattr(filelike, 'buffer', None)
+    encoding, errors = getattr(filelike, 'encoding', None), getattr(filelike, 'errors', None) or 'strict'
+    count, every = 0, store.every
+    try:
+        for line in (raw_lines if raw_lines is not None else filelike):
+            offset += len(line)
+            count += 1
+            if count >= every:
+                store.update(key, identity, offset, count)
+                count = 0
+            if raw_lines is not None:
+                # strip line breaks as translated by text files
+                line = line.decode(encoding, errors)
+                yield line[:-2] if line[-2:] == '\r\n' else line[:-1]
+            else:
+                yield line[:-1]
+    finally:
+        store.update(key, identity, offset, count)
 
 
-@chainlet.genlet(prime=False)
-def tail_path(path, follow=True, **open_kwargs):
+def _get_store(checkpoint):
+    if checkpoint is None or isinstance(checkpoint, _checkpoint.CheckpointStore):
+        return checkpoint
+    return _checkpoint.get_store(checkpoint)
+
+
+def _is_regular(filelike):
+    try:
+        return not isinstance(filelike.name, int) and stat_module.S_ISREG(os.fstat(filelike.fileno()).st_mode)
+    except (AttributeError, ValueError, OSError, IOError):
+        return False
+
+
+class TailPath(chainlet.ChainLink):
     """
     Stream data from a file, socket or similar object at ``path``
 
@@ -29,47 +94,759 @@ def tail_path(path, follow=True, **open_kwargs):
     :type path: str
     :param follow: whether to proceed reading from a new file if the original one is replaced
     :type follow: bool
+    :param block_size: number of bytes to read at once
+    :type block_size: int
+    :param use_inotify: whether to wait for changes via ``inotify``; if :py:const:`None`, use it if available
+    :type use_inotify: bool or None
+    :param checkpoint: path of or store to persist the read offset to
+    :type checkpoint: str or :py:class:`~pypelined.utilities.checkpoint.CheckpointStore` or None
     :param open_kwargs: keyword arguments to pass to :py:func:`open`
 
     Note that ``follow`` does not require immediate replacement with a *new* file.
     In ``follow`` mode, any errors from ``path`` not existing are ignored.
     Without ``follow`` mode, it is an error if ``path`` does not exist when the first chunk is fetched.
     Any other errors from :py:func:`open` are propagated unconditionally.
+
+    Data is read in blocks of ``block_size`` bytes, and split into lines.
+    Lines are decoded according to the ``encoding`` and ``errors`` in ``open_kwargs``,
+    unless a binary ``mode`` is requested.
+    A final line without line break is only provided once it is completed.
+
+    Once all data has been read, changes of ``path`` are waited for using ``inotify``.
+    This directly detects new data as well as rotation or deletion of ``path``.
+    If ``inotify`` is not available, ``path`` is polled at increasing intervals
+    of up to 0.5 seconds instead.
+
+    If ``checkpoint`` is given, the offset of read lines is saved regularly
+    after reading each block.
+    Reading starts at the saved offset, if any.
+    If ``path`` has been rotated in the meantime, the remainder of the rotated
+    file is read first if it can still be found next to ``path``.
+
+    Instead of fetching lines individually, event loops may wait for :py:meth:`fileno`
+    to become readable or :py:attr:`delay` to pass, and :py:meth:`poll` lines without blocking.
+    The offset of polled lines is saved once :py:meth:`poll` is called again.
     """
-    if follow:
-        eof_delay = 0.01
+    def __init__(self, path, follow=True, block_size=65536, use_inotify=None, checkpoint=None, **open_kwargs):
+        super(TailPath, self).__init__()
+        # the path is the key of checkpoints, which must not depend on the working directory
+        self.path = os.path.abspath(path)
+        self.follow = follow
+        self.block_size = block_size
+        self.use_inotify = inotify.HAS_INOTIFY if use_inotify is None else use_inotify
+        self._open_kwargs = open_kwargs
+        self._store = _get_store(checkpoint)
+        self._resume = self._store.get(self.path) if self._store is not None else None
+        self._tail = _FileTail(self.path, block_size=block_size, **dict(open_kwargs))
+        self._waiter = None
+        # tail of a rotated file read before the current one
+        self._rotated = None
+        self._opened = False
+        self._replaced = False
+        # checkpoint of the lines of the last poll, saved once they are consumed
+        self._checkpoint = None
+        # lines polled but not yet fetched
+        self._pending = collections.deque()
+
+    def open(self):
+        """Start watching ``path`` for changes"""
+        if self._waiter is None:
+            self._waiter = _InotifyWaiter(self.path) if self.use_inotify else _PollWaiter(self.path)
+
+    def close(self):
+        """Stop watching ``path`` and close all files"""
+        self._tail.close()
+        if self._rotated is not None:
+            self._rotated.close()
+            self._rotated = None
+        self._opened = self._replaced = False
+        if self._waiter is not None:
+            self._waiter.close()
+            self._waiter = None
+
+    def chainlet_send(self, value=None):
+        """Fetch a line"""
+        lines = self._pending
+        while not lines:
+            lines.extend(self.poll())
+        return lines.popleft()
+
+    def fileno(self):
+        """
+        File descriptor which is readable when :py:meth:`poll` may read new lines
+
+        :returns: the descriptor, or :py:const:`None` if ``path`` must be polled after :py:attr:`delay`
+        :rtype: int or None
+        """
+        self.open()
+        return self._waiter.fileno()
+
+    @property
+    def delay(self):
+        """Maximum time in seconds until :py:meth:`poll` is due, even if :py:meth:`fileno` is not readable"""
+        self.open()
+        return self._waiter.delay
+
+    def poll(self, timeout=None):
+        """
+        Wait for and read new lines
+
+        :param timeout: maximum time in seconds to wait, or :py:const:`None` to wait until any line is read
+        :type timeout: float or None
+        :returns: all lines read
+        :rtype: list
+        :raises StopIteration: if ``path`` has been read completely and is not followed
+
+        Use a ``timeout`` of ``0`` to read lines without blocking.
+        """
+        self.open()
+        if self._checkpoint is not None:
+            self._store.update(*self._checkpoint)
+            self._checkpoint = None
+        deadline, waited = None if timeout is None else time.time() + timeout, False
+        while True:
+            lines = self._read()
+            # always take pending events, which may signal rotation
+            if lines or (waited and time.time() >= deadline):
+                return lines
+            self._wait(None if deadline is None else max(0.0, deadline - time.time()))
+            waited = deadline is not None
+
+    def _read(self):
+        """Read lines without blocking, or return an empty list if changes must be waited for"""
+        tail, waiter = self._tail, self._waiter
         while True:
+            if self._rotated is not None:
+                lines = self._rotated.read_lines()
+                if lines:
+                    return self._queue(self._rotated, lines)
+                self._rotated.close()
+                self._rotated = None
+            if not self._opened:
+                try:
+                    tail.open()
+                except (OSError, IOError) as err:
+                    if not self.follow or err.errno != errno.ENOENT:
+                        raise
+                    return []
+                self._opened = True
+                waiter.watch()
+                if self._resume is not None:
+                    self._rotated = _open_checkpoint(tail, self._resume, self.block_size, self._open_kwargs)
+                    self._resume = None
+                continue
+            lines = tail.read_lines()
+            if lines:
+                waiter.reset()
+                return self._queue(tail, lines)
+            if not self._replaced:
+                return []
+            # the previous file is drained
+            tail.close()
+            self._opened = self._replaced = False
+            if not self.follow:
+                raise StopIteration
+
+    def _queue(self, tail, lines):
+        if self._store is not None:
+            self._checkpoint = self.path, tail.identity, tail.offset, len(lines)
+        return lines
+
+    def _wait(self, timeout):
+        """Wait up to ``timeout`` for ``path`` to change"""
+        if not self._opened:
+            self._waiter.wait_exists(timeout)
+        else:
+            # File is at EOF
+            # - the target may have been deleted or rotated
+            self._replaced = self._waiter.wait(timeout) and self._tail.replaced()
+
+    def __repr__(self):
+        return '%s(%r)' % (self.__class__.__name__, self.path)
+
+
+tail_path = TailPath
+
+
+def _open_checkpoint(tail, resume, block_size, open_kwargs):
+    """
+    Seek ``tail`` to the checkpoint ``resume``
+
+    If the checkpoint is for a rotated file that still exists, this is opened
+    at the checkpoint and returned; ``tail`` should be read once it is drained.
+    """
+    identity, offset = resume
+    if identity == tail.identity:
+        if offset <= os.fstat(tail.fileno()).st_size:
+            tail.seek(offset)
+        return None
+    rotated_path = _find_rotated(tail.path, identity)
+    if rotated_path is None:
+        return None
+    rotated = _FileTail(rotated_path, block_size=block_size, **dict(open_kwargs))
+    try:
+        rotated.open(offset)
+    except (OSError, IOError) as err:
+        if err.errno != errno.ENOENT:
+            raise
+        return None
+    if rotated.identity != identity:
+        rotated.close()
+        return None
+    return rotated
+
+
+def _find_rotated(path, identity):
+    """Find a file next to ``path`` with the given ``(device, inode)`` identity"""
+    directory, name = os.path.split(os.path.abspath(path))
+    try:
+        candidates = os.listdir(directory)
+    except (OSError, IOError):
+        return None
+    for candidate in candidates:
+        if candidate.startswith(name) and candidate != name:
+            candidate = os.path.join(directory, candidate)
+            try:
+                stat = os.stat(candidate)
+            except (OSError, IOError):
+                continue
+            if (stat.st_dev, stat.st_ino) == identity:
+                return candidate
+    return None
+
+
+#: all :py:class:`_FileTail` which are currently open
+_OPEN_TAILS = weakref.WeakSet()
+_OPEN_TAILS_MUTEX = threading.Lock()
+
+
+def tail_offsets():
+    """
+    Get the read offset and size of all files currently tailed
+
+    :returns: the ``"path"``, ``"offset"`` and ``"size"`` in bytes of each file
+    :rtype: list[dict]
+
+    This covers files read by :py:class:`TailPath` and :py:class:`TailGlob`.
+    The difference of ``"size"`` and ``"offset"`` is the data not yet read.
+    It is safe to call this function from another thread than the one reading files.
+    """
+    with _OPEN_TAILS_MUTEX:
+        tails = list(_OPEN_TAILS)
+    offsets = []
+    for tail in tails:
+        try:
+            size = os.fstat(tail.fileno()).st_size
+        except (AttributeError, ValueError, OSError, IOError):
+            # closed concurrently
+            continue
+        offsets.append({'path': tail.path, 'offset': tail.offset, 'size': size})
+    return offsets
+
+
+class _FileTail(object):
+    """
+    Reader for complete lines from a file
+
+    :param path: the file system location suitable for :py:func:`open`
+    :type path: str
+    :param block_size: number of bytes to read at once
+    :type block_size: int
+    :param open_kwargs: keyword arguments to pass to :py:func:`open`
+    """
+    def __init__(self, path, block_size=65536, **open_kwargs):
+        self.path = path
+        self.block_size = block_size
+        mode = open_kwargs.pop('mode', 'r')
+        if 'b' in mode:
+            self.encoding, self.errors = None, None
+        else:
+            self.encoding = open_kwargs.pop('encoding', None) or locale.getpreferredencoding(False)
+            self.errors = open_kwargs.pop('errors', None) or 'strict'
+        open_kwargs.pop('newline', None)
+        open_kwargs.pop('buffering', None)
+        self._open_kwargs = open_kwargs
+        self._stream = None
+        self._remainder = b''
+        self._position = 0
+        #: identity of the file as ``(device, inode)``
+        self.identity = None
+
+    @property
+    def offset(self):
+        """Position in bytes up to which lines have been read"""
+        return self._position - len(self._remainder)
+
+    def open(self, offset=0):
+        """Open the file at ``path``, starting to read at ``offset``"""
+        self.close()
+        self._stream = open(self.path, 'rb', buffering=0, **self._open_kwargs)
+        stat = os.fstat(self._stream.fileno())
+        self.identity = stat.st_dev, stat.st_ino
+        self._position = 0
+        if offset:
+            self.seek(offset)
+        with _OPEN_TAILS_MUTEX:
+            _OPEN_TAILS.add(self)
+
+    def seek(self, offset):
+        """Continue reading at ``offset``, discarding any partial line"""
+        self._stream.seek(offset)
+        self._position = offset
+        self._remainder = b''
+
+    def fileno(self):
+        return self._stream.fileno()
+
+    def close(self):
+        """Close the file"""
+        if self._stream is not None:
+            with _OPEN_TAILS_MUTEX:
+                _OPEN_TAILS.discard(self)
+            self._stream.close()
+            self._stream = None
+            self._remainder = b''
+
+    def read_lines(self):
+        """
+        Read blocks from the file, and return all lines they complete
+
+        Blocks are read until at least one line is complete,
+        so that an empty list is only returned at the end of the file.
+        In text mode, lines ending with ``\\r\\n`` are provided without the ``\\r``.
+        """
+        block = self._stream.read(self.block_size)
+        if not block:
+            return []
+        self._position += len(block)
+        last_break = block.rfind(b'\n')
+        if last_break < 0:
+            # a line longer than a block - keep reading until it is complete
+            blocks = [self._remainder, block]
+            while last_break < 0:
+                block = self._stream.read(self.block_size)
+                if not block:
+                    self._remainder = b''.join(blocks)
+                    return []
+                self._position += len(block)
+                blocks.append(block)
+                last_break = block.rfind(b'\n')
+            last_break += sum(len(part) for part in blocks) - len(block)
+            block = b''.join(blocks)
+        elif self._remainder:
+            last_break += len(self._remainder)
+            block = self._remainder + block
+        self._remainder = block[last_break + 1:]
+        if self.encoding is None:
+            return block[:last_break].split(b'\n')
+        text = block[:last_break].decode(self.encoding, self.errors)
+        if '\r' in text:
+            text = text.replace('\r\n', '\n')
+            if text[-1:] == '\r':
+                text = text[:-1]
+        return text.split('\n')
+
+    def replaced(self):
+        """Whether ``path`` no longer refers to the open file"""
+        try:
+            stat = os.stat(self.path)
+        except (OSError, IOError) as err:
+            if err.errno != errno.ENOENT:
+                raise
+            return True
+        if (stat.st_dev, stat.st_ino) != self.identity:
+            return True
+        # file has been truncated in-place
+        if stat.st_size < self._position:
+            self.seek(0)
+        return False
+
+
+class _PollWaiter(object):
+    """Wait for changes to a file by polling with increasing delays"""
+    def __init__(self, path):
+        self.path = path
+        self._delay = 0.01
+
+    def fileno(self):
+        """File descriptor signalling changes, or :py:const:`None` if changes must be polled"""
+        return None
+
+    @property
+    def delay(self):
+        """Time to wait until the next poll"""
+        return self._delay
+
+    def watch(self):
+        """Watch the current file at ``path``"""
+        self.reset()
+
+    def reset(self):
+        """Reset delays after new data has arrived"""
+        self._delay = 0.01
+
+    def wait(self, timeout=None):
+        """Wait for a change, returning whether the file may have been replaced or truncated"""
+        time.sleep(self._delay if timeout is None else min(timeout, self._delay))
+        self._delay = min(0.5, self._delay * 2)
+        return True
+
+    def wait_exists(self, timeout=None):
+        """Wait for ``path`` to be created"""
+        self.wait(timeout)
+
+    def close(self):
+        pass
+
+
+class _InotifyWaiter(object):
+    """Wait for changes to a file using inotify"""
+    #: events of the directory which may replace the file
+    dir_events = inotify.IN_CREATE | inotify.IN_MOVED_TO | inotify.IN_MOVED_FROM | inotify.IN_DELETE
+    #: events of the file which may replace the file
+    file_events = inotify.IN_MOVE_SELF | inotify.IN_DELETE_SELF | inotify.IN_ATTRIB
+    #: maximum time to wait for events before checking the file anyway
+    timeout = 5.0
+
+    #: time to wait before checking again for the directory of the file to exist
+    dir_timeout = 0.5
+
+    def __init__(self, path):
+        self.path = path
+        self._name = _fsencode(os.path.basename(path))
+        self._inotify = inotify.Inotify()
+        self._dir_wd = None
+        self._file_wd = None
+        self._watch_directory()
+
+    def _watch_directory(self):
+        """Watch the directory of ``path``, returning whether it exists"""
+        if self._dir_wd is None:
             try:
-                for chunk in _tail_path_once(path, **open_kwargs):
-                    yield chunk
+                self._dir_wd = self._inotify.add_watch(os.path.dirname(os.path.abspath(self.path)), self.dir_events)
             except OSError as err:
                 if err.errno != errno.ENOENT:
                     raise
-                time.sleep(eof_delay)
-                eof_delay = min(0.5, eof_delay * 2)
+                return False
+        return True
+
+    def watch(self):
+        """Watch the current file at ``path``"""
+        self._watch_directory()
+        if self._file_wd is not None:
+            self._inotify.rm_watch(self._file_wd)
+            self._file_wd = None
+        try:
+            self._file_wd = self._inotify.add_watch(self.path, inotify.IN_MODIFY | self.file_events)
+        except OSError as err:
+            # the file has already been removed again
+            if err.errno != errno.ENOENT:
+                raise
+
+    def fileno(self):
+        """File descriptor signalling changes, or :py:const:`None` if changes must be polled"""
+        return self._inotify.fileno()
+
+    @property
+    def delay(self):
+        """Time to wait until the file is checked even without changes"""
+        return self.timeout if self._dir_wd is not None else self.dir_timeout
+
+    def reset(self):
+        pass
+
+    def wait(self, timeout=None):
+        """Wait for a change, returning whether the file may have been replaced or truncated"""
+        events = self._inotify.read_events(self.timeout if timeout is None else timeout)
+        if not events:
+            return True
+        for wd, mask, _, name in events:
+            if wd == self._dir_wd:
+                if mask & inotify.IN_IGNORED:
+                    # the directory has been removed
+                    self._dir_wd = None
+                    return True
+                if name == self._name:
+                    return True
             else:
-                # if the file has been properly closed, reset delay
-                eof_delay = 0.01
-    else:
-        for chunk in _tail_path_once(path, **open_kwargs):
-            yield chunk
+                # modifications at the end of the file may truncate it in-place
+                return True
+        return False
 
+    def wait_exists(self, timeout=None):
+        """Wait for ``path`` to be created"""
+        if self._watch_directory():
+            self._inotify.read_events(self.timeout if timeout is None else timeout)
+        else:
+            time.sleep(self.dir_timeout if timeout is None else min(timeout, self.dir_timeout))
 
-def _tail_path_once(path, **open_kwargs):
-    eof_delay = 0.01
-    path_inode = os.stat(path).st_ino
-    with open(path, **open_kwargs) as stream:
-        while True:
-            line = stream.readline()
-            if not line:
-                # File is at EOF
-                # - the target has been deleted or rotated
-                if not os.path.exists(path) or os.stat(path).st_ino != path_inode:
-                    break
-                # - the file is still valid, smoothly delay further reads
-                else:
-                    time.sleep(eof_delay)
-                    eof_delay = min(0.5, eof_delay * 2)
+    def close(self):
+        self._inotify.close()
+
+
+class TailGlob(chainlet.ChainLink):
+    """
+    Stream lines from all files matching any of several glob ``patterns``
+
+    Provides ``(path, line)`` pairs of each line (excluding line breaks) and the path of its file.
+    This works similar to :py:class:`TailPath`, but for any number of files,
+    including files matching ``patterns`` only after the provider has started.
+
+    :param patterns: glob patterns of files to read, e.g. ``'/var/log/xrootd/*/xrootd.log'``
+    :type patterns: str
+    :param block_size: number of bytes to read from a file at once
+    :type block_size: int
+    :param max_rate: maximum number of lines per second, or :py:const:`None` for no limit
+    :type max_rate: float or None
+    :param rescan: interval in seconds for searching new files and directories
+    :type rescan: float
+    :param use_inotify: whether to wait for changes via ``inotify``; if :py:const:`None`, use it if available
+    :type use_inotify: bool or None
+    :param open_kwargs: keyword arguments to pass to :py:func:`open`
+
+    All files are served by a single watcher: with ``inotify``, only the *directories*
+    of matching files are watched, which reports new data as well as new, rotated
+    and deleted files.
+    Without ``inotify``, all files are polled at increasing intervals of up to 0.5 seconds.
+    In either case, ``patterns`` are searched again every ``rescan`` seconds
+    to pick up files in new directories.
+
+    Files with new data are read in turn, with at most one block of ``block_size``
+    bytes per file and turn.
+    This prevents a single busy file from delaying the others.
+    Files are read from the start when they are first found.
+    If a rotated file still matches ``patterns``, it is resumed where it was left.
+
+    Instead of fetching lines individually, event loops may wait for :py:meth:`fileno`
+    to become readable or :py:attr:`delay` to pass, and :py:meth:`poll` lines without blocking.
+    """
+    def __init__(self, *patterns, **kwargs):
+        super(TailGlob, self).__init__()
+        self._logger = logging.getLogger('%s.%s' % (__name__, self.__class__.__name__))
+        self.patterns = patterns
+        self._pattern_parts = [pattern.split(os.sep) for pattern in patterns]
+        self.block_size = kwargs.pop('block_size', 65536)
+        self.max_rate = kwargs.pop('max_rate', None)
+        self.rescan = kwargs.pop('rescan', 10.0)
+        use_inotify = kwargs.pop('use_inotify', None)
+        self.use_inotify = inotify.HAS_INOTIFY if use_inotify is None else use_inotify
+        self._open_kwargs = kwargs
+        # path => _FileTail of all open files
+        self._tails = {}
+        # (device, inode) => offset of rotated files that are no longer tailed
+        self._retired = {}
+        # paths of files which may have unread data, each queued at most once
+        self._ready = collections.deque()
+        self._queued = set()
+        # lines read by the current poll, and lines polled but not yet fetched
+        self._lines = []
+        self._pending = collections.deque()
+        self._inotify = None
+        # watch descriptor => directory
+        self._directories = {}
+        self._next_scan = 0
+        self._throttle = 0
+        self._poll_delay = 0.01
+
+    def open(self):
+        """Start watching for files"""
+        if self._inotify is None and self.use_inotify:
+            self._inotify = inotify.Inotify()
+        self._scan()
+
+    def close(self):
+        """Stop watching and close all files"""
+        for tail in self._tails.values():
+            tail.close()
+        self._tails.clear()
+        self._ready.clear()
+        self._queued.clear()
+        self._directories.clear()
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+        self._next_scan = 0
+
+    def chainlet_send(self, value=None):
+        """Fetch a ``(path, line)`` pair"""
+        lines = self._pending
+        while not lines:
+            lines.extend(self.poll())
+        return lines.popleft()
+
+    def fileno(self):
+        """
+        File descriptor which is readable when :py:meth:`poll` may read new lines
+
+        :returns: the descriptor, or :py:const:`None` if files must be polled after :py:attr:`delay`
+        :rtype: int or None
+        """
+        if not self._next_scan:
+            self.open()
+        return self._inotify.fileno() if self._inotify is not None else None
+
+    @property
+    def delay(self):
+        """Maximum time in seconds until :py:meth:`poll` is due, even if :py:meth:`fileno` is not readable"""
+        now = time.time()
+        if self._ready:
+            return max(0.0, self._throttle - now)
+        delay = max(0.0, self._next_scan - now)
+        return delay if self._inotify is not None else min(delay, self._poll_delay)
+
+    def poll(self, timeout=None):
+        """
+        Wait for and read new lines
+
+        :param timeout: maximum time in seconds to wait, or :py:const:`None` to wait until any line is read
+        :type timeout: float or None
+        :returns: ``(path, line)`` pairs of all lines read
+        :rtype: list
+
+        Use a ``timeout`` of ``0`` to read lines without blocking.
+        """
+        if not self._next_scan:
+            self.open()
+        lines = self._lines
+        deadline, waited = None if timeout is None else time.time() + timeout, False
+        while not lines:
+            if self._ready and self._throttle <= time.time():
+                path = self._ready.popleft()
+                self._queued.discard(path)
+                self._read(path)
+            elif waited and time.time() >= deadline:
+                break
             else:
-                eof_delay = 0.01
-                yield line[:-1]  # strip away linebreak
+                delay = self.delay
+                self._wait(delay if deadline is None else max(0.0, min(delay, deadline - time.time())))
+                waited = deadline is not None
+        self._lines = []
+        return lines
+
+    def _read(self, path):
+        """Read the next block of ``path``"""
+        try:
+            tail = self._tails[path]
+        except KeyError:
+            return
+        lines = tail.read_lines()
+        if lines:
+            self._lines.extend((path, line) for line in lines)
+            self._queue(path)
+            self._poll_delay = 0.01
+            if self.max_rate:
+                self._throttle = max(self._throttle, time.time()) + len(lines) / float(self.max_rate)
+        elif tail.replaced():
+            # rotated or deleted - drain the old file before reopening
+            lines = tail.read_lines()
+            while lines:
+                self._lines.extend((path, line) for line in lines)
+                lines = tail.read_lines()
+            self._retired[tail.identity] = tail.offset
+            self._logger.info('file %r replaced', path)
+            del self._tails[path]
+            tail.close()
+            self._add(path)
+
+    def _add(self, path):
+        """Start tailing ``path`` if it exists"""
+        tail = _FileTail(path, block_size=self.block_size, **self._open_kwargs)
+        try:
+            tail.open()
+        except (OSError, IOError) as err:
+            if err.errno not in (errno.ENOENT, errno.EISDIR):
+                raise
+            return
+        if any(other.identity == tail.identity for other in self._tails.values()):
+            # a tailed file has been renamed, it is resumed once it is replaced
+            tail.close()
+            return
+        offset = self._retired.pop(tail.identity, 0)
+        if offset:
+            tail.open(offset)
+        self._tails[path] = tail
+        self._queue(path)
+        self._logger.debug('tailing %r at offset %d', path, offset)
+
+    def _scan(self):
+        """Search for new files and directories matching ``patterns``"""
+        matches = set()
+        for pattern in self.patterns:
+            matches.update(glob.glob(pattern))
+            if self._inotify is not None:
+                for directory in glob.glob(os.path.dirname(pattern) or os.curdir):
+                    if directory not in self._directories.values():
+                        self._directories[self._inotify.add_watch(directory, self._dir_events)] = directory
+        for path in matches:
+            if path not in self._tails:
+                self._add(path)
+        # any remaining rotated files no longer match
+        self._retired.clear()
+        self._next_scan = time.time() + self.rescan
+
+    #: directory events which may signal new data or files
+    _dir_events = (
+        inotify.IN_MODIFY | inotify.IN_CREATE | inotify.IN_MOVED_TO | inotify.IN_MOVED_FROM |
+        inotify.IN_DELETE | inotify.IN_ATTRIB
+    )
+
+    def _wait(self, timeout):
+        """Wait up to ``timeout`` until any file may have new data"""
+        if self._next_scan <= time.time():
+            self._scan()
+            # retry all files in case events were missed
+            self._queue(*self._tails)
+            return
+        if self._inotify is None:
+            time.sleep(timeout)
+            self._poll_delay = min(0.5, self._poll_delay * 2)
+            self._queue(*self._tails)
+            return
+        ready, tails = [], self._tails
+        for wd, mask, _, name in self._inotify.read_events(timeout):
+            if mask & inotify.IN_Q_OVERFLOW:
+                self._next_scan = 0
+                continue
+            try:
+                directory = self._directories[wd]
+            except KeyError:
+                continue
+            if mask & inotify.IN_IGNORED:
+                del self._directories[wd]
+                continue
+            path = os.path.join(directory, _fsdecode(name))
+            if path in tails:
+                ready.append(path)
+            elif mask & (inotify.IN_CREATE | inotify.IN_MOVED_TO) and self._matches(path):
+                self._add(path)
+        self._queue(*ready)
+
+    def _queue(self, *paths):
+        """Queue ``paths`` for reading, unless they are queued already"""
+        queued = self._queued
+        for path in paths:
+            if path not in queued:
+                queued.add(path)
+                self._ready.append(path)
+
+    def _matches(self, path):
+        """Check whether ``path`` matches any pattern, with wildcards not matching across directories"""
+        parts = path.split(os.sep)
+        return any(
+            len(pattern_parts) == len(parts) and all(map(fnmatch.fnmatch, parts, pattern_parts))
+            for pattern_parts in self._pattern_parts
+        )
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+    def __repr__(self):
+        return '%s(%s)' % (self.__class__.__name__, ', '.join(repr(pattern) for pattern in self.patterns))
+
+
+tail_glob = TailGlob
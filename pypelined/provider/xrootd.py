@@ -2,50 +2,150 @@
 Tools to interact with XRootD's `report` functionality
 """
 from __future__ import division, absolute_import
+import os
 import time
+import locale
 import logging
 import subprocess
+import select
 import atexit
+import io
+import collections
+import xml.etree.ElementTree as ElementTree
 
-from ..utilities import singleton, safe_eval
+from ..utilities import singleton, decode_scalar
+from ..utilities.record import SchemaRegistry, Record
+from .socket import UDPDatagrams
 
 import chainlet
 
 
+def _build_report(keys, values, schemas=None):
+    """Create a report from ``keys`` and ``values``, as a record if ``schemas`` are used"""
+    if schemas is not None:
+        return Record(schemas.get(keys), values)
+    return dict(zip(keys, values))
+
+
+def parse_summary(document, schemas=None):
+    """
+    Parse an XML summary report to a flat dictionary
+
+    :param document: the raw XML summary report
+    :type document: bytes
+    :param schemas: registry of schemas to create a :py:class:`~pypelined.utilities.record.Record`
+    :type schemas: :py:class:`~pypelined.utilities.record.SchemaRegistry` or None
+    :rtype: dict or :py:class:`~pypelined.utilities.record.Record`
+
+    The report is flattened the same way as by ``mpxstats -f cgi``:
+    attributes of the ``<statistics>`` root are used as top-level keys,
+    while the text of nested elements is stored with the dotted path to it.
+    For ``<stats>`` elements, the ``id`` attribute is used in the path.
+    For example, ``<stats id="oss"><paths>1<stats id="0"><rp>...`` provides
+    the keys ``"oss.paths"`` and ``"oss.paths.0.rp"``.
+    """
+    keys, values, path = [], [], []
+    events = ElementTree.iterparse(io.BytesIO(document.rstrip(b'\0\r\n ')), events=('start', 'end'))
+    for event, element in events:
+        if event == 'start':
+            if not path and element.tag == 'statistics':
+                for key, value in element.attrib.items():
+                    keys.append(key)
+                    values.append(decode_scalar(value))
+                path.append(None)
+            else:
+                path.append(element.get('id') if element.tag == 'stats' else element.tag)
+        else:
+            text = element.text
+            if text is not None and len(path) > 1:
+                text = text.strip()
+                if text:
+                    key = '.'.join(path[1:])
+                    keys.append(key)
+                    values.append(decode_scalar(text))
+            path.pop()
+            element.clear()
+    return _build_report(keys, values, schemas)
+
+
 class XRootDReports(singleton.Singleton, chainlet.ChainLink):
     """
     Collects information generated by the `all.report` directive
 
     :param port: port receiving reports
     :type port: int
+    :param parser: how to receive and parse reports, either ``"mpxstats"`` or ``"xml"``
+    :type parser: str
+    :param records: whether to provide reports as compact records instead of dictionaries
+    :type records: bool
 
     Provides xrootd reports as individual dictionaries to a chain.
-    Keys are preserved, while values are evaluated as literals.
+    Keys are preserved, while values are decoded as scalar literals
+    by :py:func:`~pypelined.utilities.decode_scalar`.
+
+    By default, reports are received and converted by the ``mpxstats`` utility.
+    If ``parser`` is ``"xml"``, reports are received directly via UDP and
+    parsed in-process by :py:func:`parse_summary` to the same format.
+
+    If ``records`` is set, each report is a :py:class:`~pypelined.utilities.record.Record`.
+    Records of a daemon usually share the same :py:class:`~pypelined.utilities.record.Schema`,
+    which stores the keys only once.
+    Records are read-only mappings, which links such as
+    :py:func:`~pypelined.modifier.dictlets.remap` and
+    :py:func:`~pypelined.consumer.telegraf.telegraf_message` read by position.
+
+    Instead of fetching reports individually, event loops may :py:meth:`open`
+    the provider without a background thread, wait for :py:meth:`fileno` to
+    become readable, and :py:meth:`poll` reports without blocking.
     """
-    def __init__(self, port):
+    def __init__(self, port, parser='mpxstats', records=False):
         super(XRootDReports, self).__init__()
+        if parser not in ('mpxstats', 'xml'):
+            raise ValueError("parser must be 'mpxstats' or 'xml', not %r" % parser)
         self.port = port
+        self.parser = parser
         self._reportstreamer = None
+        # partial line of the report stream
+        self._remainder = b''
+        self._datagrams = None
+        # reports polled but not yet fetched
+        self._pending = collections.deque()
+        self._schemas = SchemaRegistry() if records else None
         self._logger = logging.getLogger('%s.%s' % (__name__, self.__class__.__name__))
 
     @classmethod
-    def __singleton_signature__(cls, port):
-        return XRootDReports, port
+    def __singleton_signature__(cls, port, parser='mpxstats', records=False):
+        return XRootDReports, port, parser, bool(records)
 
-    def open(self):
-        """Start collecting reports"""
-        if self._reportstreamer is None:
+    def open(self, background=True):
+        """
+        Start collecting reports
+
+        :param background: whether to receive reports of the ``"xml"`` parser
+                           in a background thread, instead of only when they are polled
+        :type background: bool
+        """
+        if self.parser == 'xml':
+            if self._datagrams is None:
+                self._logger.info('opening report socket on port %d', self.port)
+                self._datagrams = UDPDatagrams(self.port, encoding=None)
+                self._datagrams.open(background=background)
+        elif self._reportstreamer is None:
             self._logger.info('opening report stream on port %d', self.port)
             self._reportstreamer = subprocess.Popen(
                 ['mpxstats', '-p', str(self.port), '-f', 'cgi'],
                 stdout=subprocess.PIPE,
-                universal_newlines=True,
             )
+            self._remainder = b''
             self._logger.info('buffering report stream')
             atexit.register(self._reportstreamer.terminate)
 
     def close(self):
         """Stop collecting reports"""
+        if self._datagrams is not None:
+            self._datagrams.close()
+            self._logger.info('closed report socket on port %d', self.port)
+            self._datagrams = None
         if self._reportstreamer is not None:
             if self._reportstreamer.poll() is None:
                 self._reportstreamer.terminate()
@@ -55,13 +155,80 @@ class XRootDReports(singleton.Singleton, chainlet.ChainLink):
 
     def chainlet_send(self, value=None):
         """Fetch a report"""
+        reports = self._pending
+        while not reports:
+            reports.extend(self.poll())
+        return reports.popleft()
+
+    def fileno(self):
+        """
+        File descriptor which is readable when :py:meth:`poll` may receive reports
+
+        :returns: the descriptor, or :py:const:`None` if reports are received in the background
+        :rtype: int or None
+        """
+        if self._datagrams is not None:
+            return self._datagrams.fileno()
+        if self._reportstreamer is not None:
+            return self._reportstreamer.stdout.fileno()
+        return None
+
+    #: maximum time in seconds until :py:meth:`poll` is due, even if :py:meth:`fileno` is not readable
+    delay = None
+
+    def poll(self, timeout=None):
+        """
+        Wait for and parse new reports
+
+        :param timeout: maximum time in seconds to wait, or :py:const:`None` to wait until any report is received
+        :type timeout: float or None
+        :returns: all reports received
+        :rtype: list
+        :raises StopIteration: if ``mpxstats`` has stopped
+
+        Use a ``timeout`` of ``0`` to receive reports without blocking.
+        If not open yet, the provider is opened with a background thread.
+        """
         self.open()
-        line = self._reportstreamer.stdout.readline()
+        if self._datagrams is not None:
+            return [
+                report for report in (self._parse_summary(datagram) for datagram in self._datagrams.poll(timeout))
+                if report is not None
+            ]
+        stdout, deadline = self._reportstreamer.stdout, None if timeout is None else time.time() + timeout
+        while True:
+            remaining = None if deadline is None else max(0.0, deadline - time.time())
+            readable, _, _ = select.select([stdout], [], [], remaining)
+            if readable:
+                data = os.read(stdout.fileno(), 65536)
+                if not data:
+                    raise StopIteration
+                lines = (self._remainder + data).split(b'\n')
+                self._remainder = lines.pop()
+                if lines:
+                    encoding = locale.getpreferredencoding(False)
+                    return [self._parse_cgi(line.decode(encoding)) for line in lines]
+            if deadline is not None and time.time() >= deadline:
+                return []
+
+    def _parse_summary(self, datagram):
+        """Parse an XML summary report, or return :py:const:`None` if it is malformed"""
+        self._logger.debug('received datagram: %r', datagram)
+        try:
+            return parse_summary(datagram, self._schemas)
+        except ElementTree.ParseError as err:
+            self._logger.warning('malformed report: %s', err)
+            return None
+
+    def _parse_cgi(self, line):
+        """Parse a report line produced by ``mpxstats``"""
         self._logger.debug('received datagram: %r', line)
-        datagram = dict(item.split('=') for item in line.split('&'))
-        for key in datagram:
-            datagram[key] = safe_eval(datagram[key])
-        return datagram
+        keys, values = [], []
+        for item in line.rstrip('\n').split('&'):
+            key, value = item.split('=', 1)
+            keys.append(key)
+            values.append(decode_scalar(value))
+        return _build_report(keys, values, self._schemas)
 
     def __enter__(self):
         # start collection on entering the context, do not delay until consumption
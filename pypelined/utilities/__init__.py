@@ -1,6 +1,7 @@
 import ast
+import re
 
-__all__ = ['safe_eval']
+__all__ = ['safe_eval', 'decode_scalar']
 
 
 def safe_eval(literal):
@@ -18,3 +19,52 @@ def safe_eval(literal):
         return ast.literal_eval(literal)
     except (ValueError, SyntaxError):
         return literal
+
+
+_NUMBER_START = frozenset('0123456789+-.')
+_QUOTES = frozenset('"\'')
+#: first characters of literals which are always passed on to :py:func:`safe_eval`
+_EVAL_START = frozenset('[({\\ \t\n\r\x0c')
+#: last characters of literals which are always passed on to :py:func:`safe_eval`, e.g. of ``b"..."``
+_EVAL_END = frozenset('"\' \t\n\r\x0c')
+_CONSTANTS = {'True': True, 'False': False, 'None': None}
+_CONSTANT_NAMES = tuple(_CONSTANTS)
+# literals which mean the same in all Python versions, without leading zeros, underscores or special names
+_INTEGER = re.compile(r'[+-]?(?:[1-9][0-9]*|0+)\Z')
+_FLOAT = re.compile(r'[+-]?(?:[0-9]+\.[0-9]*|\.[0-9]+|[0-9]+(?=[eE]))(?:[eE][+-]?[0-9]+)?\Z')
+_SIMPLE_QUOTED = re.compile(r'"[^"\\\r\n\x00]*"\Z|\'[^\'\\\r\n\x00]*\'\Z')
+
+
+def decode_scalar(literal):
+    """
+    Decode a scalar literal value or fall back to string
+
+    :param literal: literal to decode, e.g. `"1.0"` or `"/data"`
+    :type literal: str
+    :return: decoded or original literal
+
+    This is a fast replacement for :py:func:`safe_eval` for the common case
+    of integers, floats and plain strings, which are decoded without parsing
+    an AST. Quoted strings are unquoted if they contain no escape sequences.
+    Any other literal, such as containers, escaped strings, or numbers
+    with leading zeros, underscores or a base prefix, is passed on to
+    :py:func:`safe_eval`. Results are always the same as for :py:func:`safe_eval`.
+    """
+    first = literal[:1]
+    if first in _NUMBER_START and first:
+        if _INTEGER.match(literal):
+            return int(literal)
+        elif _FLOAT.match(literal):
+            return float(literal)
+        return safe_eval(literal)
+    elif first in _QUOTES:
+        if _SIMPLE_QUOTED.match(literal):
+            return literal[1:-1]
+        return safe_eval(literal)
+    elif first in _EVAL_START:
+        return safe_eval(literal)
+    elif literal in _CONSTANTS:
+        return _CONSTANTS[literal]
+    elif literal[-1:] in _EVAL_END or literal.startswith(_CONSTANT_NAMES):
+        return safe_eval(literal)
+    return literal
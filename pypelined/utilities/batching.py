@@ -0,0 +1,186 @@
+"""
+Tools for collecting items and processing them in bulk
+"""
+from __future__ import division, absolute_import
+import threading
+import time
+import logging
+
+
+class BatchStatistics(object):
+    """
+    Counters describing the batches flushed by a :py:class:`LingerBuffer`
+
+    :note: Counters are updated without synchronisation and may be
+           slightly inconsistent when read concurrently.
+    """
+    __slots__ = ('batches', 'items', 'size', 'max_batch', 'latency', 'max_latency')
+
+    def __init__(self):
+        #: number of batches flushed
+        self.batches = 0
+        #: number of items flushed
+        self.items = 0
+        #: accumulated size of items flushed
+        self.size = 0
+        #: largest number of items in a single batch
+        self.max_batch = 0
+        #: accumulated seconds between the first item of a batch and its flush
+        self.latency = 0.0
+        #: largest seconds between the first item of a batch and its flush
+        self.max_latency = 0.0
+
+    @property
+    def mean_batch(self):
+        """Average number of items per batch"""
+        return self.items / self.batches if self.batches else 0.0
+
+    @property
+    def mean_latency(self):
+        """Average seconds between the first item of a batch and its flush"""
+        return self.latency / self.batches if self.batches else 0.0
+
+    def record(self, count, size, latency):
+        """Add a single batch to the statistics"""
+        self.batches += 1
+        self.items += count
+        self.size += size
+        self.latency += latency
+        if count > self.max_batch:
+            self.max_batch = count
+        if latency > self.max_latency:
+            self.max_latency = latency
+
+    def snapshot(self):
+        """Get the current counters as a :py:class:`dict`"""
+        return {
+            'batches': self.batches, 'items': self.items, 'size': self.size,
+            'max_batch': self.max_batch, 'mean_batch': self.mean_batch,
+            'max_latency': self.max_latency, 'mean_latency': self.mean_latency,
+        }
+
+    def __repr__(self):
+        return '<%s batches=%d, items=%d, mean_batch=%.1f, mean_latency=%.6f>' % (
+            self.__class__.__name__, self.batches, self.items, self.mean_batch, self.mean_latency
+        )
+
+
+class LingerBuffer(object):
+    """
+    Buffer that collects items and flushes them in batches
+
+    :param flush: callable receiving a :py:class:`list` of buffered items
+    :type flush: callable
+    :param max_count: maximum number of items per batch
+    :type max_count: int or None
+    :param max_size: maximum accumulated size of items per batch
+    :type max_size: int or None
+    :param max_delay: maximum time in seconds an item lingers before being flushed
+    :type max_delay: float or None
+    :param size: callable computing the size of an item
+    :type size: callable
+
+    Items are flushed as soon as either ``max_count`` or ``max_size`` is reached;
+    either limit may be :py:const:`None` to disable it.
+    If ``max_delay`` is set, a background thread flushes any items lingering
+    for longer than ``max_delay``; otherwise, items are only flushed when
+    limits are reached or when :py:meth:`flush` is called explicitly.
+
+    A single item larger than ``max_size`` is flushed as a batch of its own.
+    """
+    def __init__(self, flush, max_count=64, max_size=None, max_delay=0.1, size=len):
+        self._logger = logging.getLogger('%s.%s' % (__name__, self.__class__.__name__))
+        self._flush = flush
+        self.max_count = max_count
+        self.max_size = max_size
+        self.max_delay = max_delay
+        self._size = size
+        self._items = []
+        self._items_size = 0
+        self._first_item = None
+        self._mutex = threading.Condition(threading.Lock())
+        self._closed = False
+        self._thread = None
+        #: statistics on flushed batches
+        self.statistics = BatchStatistics()
+
+    def append(self, item):
+        """Add an ``item`` to the buffer, flushing as required"""
+        with self._mutex:
+            self._append(item)
+
+    def extend(self, items):
+        """Add several ``items`` to the buffer, flushing as required"""
+        with self._mutex:
+            for item in items:
+                self._append(item)
+
+    def _append(self, item):
+        # must be called while holding self._mutex
+        item_size = self._size(item) if self.max_size is not None else 0
+        if self.max_size is not None and self._items and self._items_size + item_size > self.max_size:
+            self._flush_items()
+        if not self._items:
+            self._first_item = time.time()
+            if self.max_delay is not None:
+                self._ensure_lingerer()
+                self._mutex.notify()
+        self._items.append(item)
+        self._items_size += item_size
+        if (self.max_count is not None and len(self._items) >= self.max_count) or (
+                self.max_size is not None and self._items_size >= self.max_size):
+            self._flush_items()
+
+    def flush(self):
+        """Flush all items currently in the buffer"""
+        with self._mutex:
+            if self._items:
+                self._flush_items()
+
+    def close(self):
+        """Flush all items and stop the background thread"""
+        with self._mutex:
+            self._closed = True
+            if self._items:
+                self._flush_items()
+            self._mutex.notify()
+
+    def _flush_items(self):
+        # must be called while holding self._mutex
+        items, items_size, first_item = self._items, self._items_size, self._first_item
+        self._items, self._items_size, self._first_item = [], 0, None
+        try:
+            self._flush(items)
+        finally:
+            self.statistics.record(len(items), items_size, time.time() - first_item)
+
+    def _ensure_lingerer(self):
+        # must be called while holding self._mutex
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._linger_flush, name='%r flusher' % self)
+            self._thread.daemon = True
+            self._thread.start()
+
+    def _linger_flush(self):
+        """Flush items that linger for longer than ``max_delay``"""
+        with self._mutex:
+            while not self._closed:
+                if self._first_item is None:
+                    self._mutex.wait()
+                    continue
+                remaining = self._first_item + self.max_delay - time.time()
+                if remaining > 0:
+                    self._mutex.wait(remaining)
+                    continue
+                try:
+                    self._flush_items()
+                except Exception as err:
+                    self._logger.exception('failed to flush %r: %s', self, err)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __repr__(self):
+        return '<%s(max_count=%s, max_size=%s, max_delay=%s) at %x>' % (
+            self.__class__.__name__, self.max_count, self.max_size, self.max_delay, id(self)
+        )
@@ -0,0 +1,50 @@
+"""
+Helpers for handling the links of chains as a whole
+"""
+from __future__ import absolute_import
+import logging
+
+import chainlet.chainlink
+
+__all__ = ['iter_links', 'close_links']
+
+
+def iter_links(*chains):
+    """
+    Iterate over the individual links of ``chains`` in order, each link only once
+
+    :param chains: the chains or links to inspect
+    :type chains: :py:class:`chainlet.ChainLink`
+
+    Compound links, such as chains and forks, are replaced by their elements.
+    Links used by several chains are provided only for their first occurrence.
+    """
+    seen = set()
+    stack = list(reversed(chains))
+    while stack:
+        link = stack.pop()
+        if isinstance(link, chainlet.chainlink.CompoundLink):
+            stack.extend(reversed(link.elements))
+        elif id(link) not in seen:
+            seen.add(id(link))
+            yield link
+
+
+def close_links(*chains):
+    """
+    Close all links of ``chains``, flushing and releasing any resources held by them
+
+    :param chains: the chains or links to close
+    :type chains: :py:class:`chainlet.ChainLink`
+
+    Links are closed in the order of their chain, so that values flushed by
+    a link on closing still reach the following links.
+    Links used by several chains are closed only once.
+    Failing to close a link is logged and does not prevent closing the remaining links.
+    """
+    logger = logging.getLogger(__name__)
+    for link in iter_links(*chains):
+        try:
+            link.close()
+        except Exception as err:
+            logger.exception('failed to close %r: %s', link, err)
@@ -0,0 +1,132 @@
+"""
+Persistent read offsets of files, to resume reading after a restart
+"""
+from __future__ import absolute_import
+import os
+import json
+import time
+import errno
+import atexit
+import logging
+import tempfile
+import threading
+
+__all__ = ['CheckpointStore', 'get_store']
+
+_STORES = {}
+_STORES_MUTEX = threading.Lock()
+
+
+def get_store(path, every=1000, interval=5.0):
+    """
+    Get the store persisted at ``path``, creating it if needed
+
+    All callers using the same ``path`` share the same store;
+    ``every`` and ``interval`` only apply when the store is created.
+    """
+    path = os.path.abspath(path)
+    with _STORES_MUTEX:
+        try:
+            return _STORES[path]
+        except KeyError:
+            store = _STORES[path] = CheckpointStore(path, every=every, interval=interval)
+            return store
+
+
+class CheckpointStore(object):
+    """
+    Store of the read offsets of files, persisted at ``path``
+
+    :param path: file system location to persist offsets to
+    :type path: str
+    :param every: number of lines after which offsets are persisted
+    :type every: int
+    :param interval: time in seconds after which offsets are persisted
+    :type interval: float
+
+    Each file is identified by a ``key``, usually the absolute path it is read from.
+    For every ``key``, the store records the ``(device, inode)`` identity and
+    offset of the file read from it.
+    This allows to find the file even if it has been rotated since.
+
+    Offsets are updated in memory, and persisted whenever either ``every`` lines
+    have been read or ``interval`` seconds have passed since the last update.
+    Persisting replaces the file at ``path`` atomically, so that it is always
+    either completely in the old or new state.
+    Offsets are also persisted when the interpreter exits.
+
+    Use :py:func:`get_store` to share a store between several readers.
+    """
+    def __init__(self, path, every=1000, interval=5.0):
+        self._logger = logging.getLogger('%s.%s' % (__name__, self.__class__.__name__))
+        self.path = os.path.abspath(path)
+        self.every = every
+        self.interval = interval
+        self._mutex = threading.Lock()
+        self._offsets = self._load()
+        self._pending = 0
+        self._next_save = time.time() + interval
+        atexit.register(self.save)
+
+    def _load(self):
+        try:
+            with open(self.path) as checkpoint_file:
+                data = json.load(checkpoint_file)
+        except (OSError, IOError) as err:
+            if err.errno != errno.ENOENT:
+                raise
+            return {}
+        except ValueError as err:
+            self._logger.warning('ignoring corrupted checkpoints %r: %s', self.path, err)
+            return {}
+        return {key: ((device, inode), offset) for key, (device, inode, offset) in data.items()}
+
+    def get(self, key):
+        """
+        Get the checkpoint of ``key``
+
+        :returns: the ``(device, inode)`` identity and offset of the file, or :py:const:`None`
+        :rtype: tuple[tuple[int, int], int] or None
+        """
+        return self._offsets.get(key)
+
+    def update(self, key, identity, offset, lines=1):
+        """
+        Record that the file ``identity`` was read up to ``offset``
+
+        :param key: identifier of the file, usually its path
+        :type key: str
+        :param identity: the ``(device, inode)`` of the file
+        :type identity: tuple[int, int]
+        :param offset: position in bytes up to which the file was read
+        :type offset: int
+        :param lines: number of lines read since the last update
+        :type lines: int
+        """
+        with self._mutex:
+            self._offsets[key] = (identity, offset)
+            self._pending += lines
+            due = self._pending >= self.every or time.time() >= self._next_save
+        if due:
+            self.save()
+
+    def save(self):
+        """Persist all offsets"""
+        with self._mutex:
+            self._pending = 0
+            self._next_save = time.time() + self.interval
+            data = {key: [identity[0], identity[1], offset] for key, (identity, offset) in self._offsets.items()}
+            directory = os.path.dirname(self.path)
+            descriptor, temp_path = tempfile.mkstemp(prefix='.checkpoint', dir=directory)
+            try:
+                with os.fdopen(descriptor, 'w') as temp_file:
+                    json.dump(data, temp_file)
+                    temp_file.flush()
+                    os.fsync(temp_file.fileno())
+                os.rename(temp_path, self.path)
+            except BaseException:
+                os.unlink(temp_path)
+                raise
+
+    def __repr__(self):
+        return '%s(%r, every=%d, interval=%s)' % (self.__class__.__name__, self.path, self.every, self.interval)
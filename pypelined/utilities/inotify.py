@@ -0,0 +1,133 @@
+"""
+Minimal interface to the Linux ``inotify`` file system event API
+
+The interface is provided via :py:mod:`ctypes` and only available on Linux.
+Check :py:data:`HAS_INOTIFY` before use -- on other systems, callers
+must fall back to polling the file system.
+"""
+from __future__ import absolute_import
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+
+__all__ = [
+    'HAS_INOTIFY', 'Inotify',
+    'IN_MODIFY', 'IN_ATTRIB', 'IN_CLOSE_WRITE', 'IN_MOVED_FROM', 'IN_MOVED_TO', 'IN_CREATE', 'IN_DELETE',
+    'IN_DELETE_SELF', 'IN_MOVE_SELF', 'IN_Q_OVERFLOW', 'IN_IGNORED', 'IN_ISDIR',
+]
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+#: header of each event as ``wd, mask, cookie, len``
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+def _load_libc():
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+    except (OSError, AttributeError, TypeError):
+        return None
+    return libc
+
+
+_LIBC = _load_libc()
+#: whether ``inotify`` is available on this system
+HAS_INOTIFY = _LIBC is not None
+
+
+def _check(result):
+    if result < 0:
+        err = ctypes.get_errno()
+        raise OSError(err, os.strerror(err))
+    return result
+
+
+class Inotify(object):
+    """
+    An ``inotify`` instance to watch for file system events
+
+    Events are read as tuples of ``(wd, mask, cookie, name)``, where
+    ``wd`` is the watch descriptor returned by :py:meth:`add_watch`
+    and ``name`` is the :py:class:`bytes` name of the file inside a
+    watched directory, or empty.
+    """
+    def __init__(self):
+        self._fd = _check(_LIBC.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC))
+
+    def fileno(self):
+        """File descriptor of the instance, for use with :py:mod:`select`"""
+        return self._fd
+
+    def add_watch(self, path, mask):
+        """Watch ``path`` for all events in ``mask``, returning the watch descriptor"""
+        if not isinstance(path, bytes):
+            path = path.encode()
+        return _check(_LIBC.inotify_add_watch(self._fd, path, mask))
+
+    def rm_watch(self, wd):
+        """Stop watching the watch descriptor ``wd``"""
+        try:
+            _check(_LIBC.inotify_rm_watch(self._fd, wd))
+        except OSError as err:
+            # watches are implicitly removed when their target is deleted
+            if err.errno != errno.EINVAL:
+                raise
+
+    def read_events(self, timeout=None):
+        """
+        Read all pending events, waiting up to ``timeout`` seconds for the first one
+
+        :param timeout: maximum time to wait for an event, or :py:const:`None` to wait indefinitely
+        :type timeout: float or None
+        :returns: all pending events, which may be empty if ``timeout`` expires
+        :rtype: list[tuple[int, int, int, bytes]]
+        """
+        try:
+            readable, _, _ = select.select([self._fd], [], [], timeout)
+        except select.error as err:
+            if err.args[0] != errno.EINTR:
+                raise
+            return []
+        if not readable:
+            return []
+        try:
+            data = os.read(self._fd, 65536)
+        except OSError as err:
+            if err.errno in (errno.EAGAIN, errno.EINTR):
+                return []
+            raise
+        events, offset, header_size = [], 0, _EVENT_HEADER.size
+        while offset < len(data):
+            wd, mask, cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += header_size
+            events.append((wd, mask, cookie, data[offset:offset + length].rstrip(b'\0')))
+            offset += length
+        return events
+
+    def close(self):
+        """Close the instance and remove all watches"""
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def __del__(self):
+        self.close()
@@ -0,0 +1,211 @@
+"""
+Bulk datagram operations via the ``sendmmsg`` and ``recvmmsg`` system calls
+
+The standard :py:mod:`socket` module only supports sending or receiving
+a single datagram per system call. On Linux, ``sendmmsg`` and ``recvmmsg``
+handle many datagrams at once; this module exposes them via :py:mod:`ctypes`.
+
+Check :py:data:`HAS_SENDMMSG` before using :py:func:`sendmmsg` -- on other
+systems, callers must fall back to regular :py:meth:`socket.socket.sendto` calls.
+The :py:class:`DatagramReceiver` transparently falls back to
+:py:meth:`socket.socket.recv_into` if ``recvmmsg`` is not available.
+"""
+from __future__ import absolute_import
+import ctypes
+import ctypes.util
+import errno
+import os
+import socket
+import struct
+
+__all__ = ['HAS_SENDMMSG', 'HAS_RECVMMSG', 'sendmmsg', 'sockaddr', 'DatagramReceiver']
+
+
+class _IOVec(ctypes.Structure):
+    _fields_ = [
+        ('iov_base', ctypes.c_void_p),
+        ('iov_len', ctypes.c_size_t),
+    ]
+
+
+class _MsgHdr(ctypes.Structure):
+    _fields_ = [
+        ('msg_name', ctypes.c_void_p),
+        ('msg_namelen', ctypes.c_uint32),
+        ('msg_iov', ctypes.POINTER(_IOVec)),
+        ('msg_iovlen', ctypes.c_size_t),
+        ('msg_control', ctypes.c_void_p),
+        ('msg_controllen', ctypes.c_size_t),
+        ('msg_flags', ctypes.c_int),
+    ]
+
+
+class _MMsgHdr(ctypes.Structure):
+    _fields_ = [
+        ('msg_hdr', _MsgHdr),
+        ('msg_len', ctypes.c_uint),
+    ]
+
+
+def _load_libc():
+    try:
+        return ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+    except (OSError, TypeError):
+        return None
+
+
+def _load_call(libc, name, *argtypes):
+    try:
+        call = getattr(libc, name)
+    except AttributeError:
+        return None
+    call.argtypes = list(argtypes)
+    call.restype = ctypes.c_int
+    return call
+
+
+_LIBC = _load_libc()
+_SENDMMSG = _load_call(_LIBC, 'sendmmsg', ctypes.c_int, ctypes.POINTER(_MMsgHdr), ctypes.c_uint, ctypes.c_int)
+_RECVMMSG = _load_call(
+    _LIBC, 'recvmmsg', ctypes.c_int, ctypes.POINTER(_MMsgHdr), ctypes.c_uint, ctypes.c_int, ctypes.c_void_p
+)
+#: whether ``sendmmsg`` is available on this system
+HAS_SENDMMSG = _SENDMMSG is not None
+#: whether ``recvmmsg`` is available on this system
+HAS_RECVMMSG = _RECVMMSG is not None
+#: flag for non-blocking socket operations
+_MSG_DONTWAIT = getattr(socket, 'MSG_DONTWAIT', 0x40)
+
+
+def sockaddr(family, address):
+    """
+    Pack a socket ``address`` to a binary ``struct sockaddr``
+
+    :param family: address family, either :py:data:`socket.AF_INET` or :py:data:`socket.AF_INET6`
+    :param address: resolved address as returned by :py:func:`socket.getaddrinfo`
+    :type address: tuple
+    :rtype: bytes
+    """
+    if family == socket.AF_INET:
+        return struct.pack('=H', family) + struct.pack('!H', address[1]) +\
+            socket.inet_pton(family, address[0]) + b'\0' * 8
+    elif family == socket.AF_INET6:
+        flowinfo, scope_id = (address[2], address[3]) if len(address) == 4 else (0, 0)
+        return struct.pack('=H', family) + struct.pack('!HI', address[1], flowinfo) +\
+            socket.inet_pton(family, address[0]) + struct.pack('=I', scope_id)
+    raise ValueError('unsupported address family: %s' % family)
+
+
+def sendmmsg(sock, datagrams, address):
+    """
+    Send several ``datagrams`` to ``address`` with as few system calls as possible
+
+    :param sock: datagram socket to send through
+    :type sock: socket.socket
+    :param datagrams: payload of each datagram
+    :type datagrams: list[bytes]
+    :param address: destination as returned by :py:func:`sockaddr`
+    :type address: bytes
+    :returns: number of system calls required
+    :rtype: int
+    :raises OSError: if the underlying system call fails
+
+    Individual datagrams are never split - a partially sent datagram is
+    an error of the underlying system call.
+    """
+    count = len(datagrams)
+    name = ctypes.create_string_buffer(address, len(address))
+    iovecs = (_IOVec * count)()
+    messages = (_MMsgHdr * count)()
+    # keep references to the payload alive until the call is done
+    buffers = [ctypes.c_char_p(datagram) for datagram in datagrams]
+    for index, datagram in enumerate(datagrams):
+        iovecs[index].iov_base = ctypes.cast(buffers[index], ctypes.c_void_p)
+        iovecs[index].iov_len = len(datagram)
+        header = messages[index].msg_hdr
+        header.msg_name = ctypes.cast(name, ctypes.c_void_p)
+        header.msg_namelen = len(address)
+        header.msg_iov = ctypes.pointer(iovecs[index])
+        header.msg_iovlen = 1
+    fileno, sent, calls = sock.fileno(), 0, 0
+    while sent < count:
+        result = _SENDMMSG(fileno, ctypes.byref(messages[sent]), count - sent, 0)
+        calls += 1
+        if result < 0:
+            err = ctypes.get_errno()
+            if err == errno.EINTR:
+                continue
+            raise OSError(err, os.strerror(err))
+        sent += result
+    return calls
+
+
+class DatagramReceiver(object):
+    """
+    Receiver for many datagrams from a socket using preallocated buffers
+
+    :param sock: datagram socket to receive from
+    :type sock: socket.socket
+    :param count: maximum number of datagrams to receive at once
+    :type count: int
+    :param size: maximum size of each datagram
+    :type size: int
+
+    Uses a single ``recvmmsg`` system call to receive all pending datagrams,
+    and repeated calls to :py:meth:`socket.socket.recv_into` otherwise.
+    In either case, datagrams are received into buffers allocated once.
+    """
+    def __init__(self, sock, count=64, size=65535):
+        self.socket = sock
+        self.count = count
+        self.size = size
+        if HAS_RECVMMSG:
+            self._buffers = [ctypes.create_string_buffer(size) for _ in range(count)]
+            self._iovecs = (_IOVec * count)()
+            self._messages = (_MMsgHdr * count)()
+            for index, buffer in enumerate(self._buffers):
+                self._iovecs[index].iov_base = ctypes.addressof(buffer)
+                self._iovecs[index].iov_len = size
+                self._messages[index].msg_hdr.msg_iov = ctypes.pointer(self._iovecs[index])
+                self._messages[index].msg_hdr.msg_iovlen = 1
+            self._receive = self._receive_mmsg
+        else:
+            self._buffer = bytearray(size)
+            self._view = memoryview(self._buffer)
+            self._receive = self._receive_into
+
+    def receive(self):
+        """
+        Receive all pending datagrams without blocking
+
+        :returns: the payload of all datagrams received, up to :py:attr:`count`
+        :rtype: list[bytes]
+        """
+        return self._receive()
+
+    def _receive_mmsg(self):
+        while True:
+            result = _RECVMMSG(self.socket.fileno(), self._messages, self.count, _MSG_DONTWAIT, None)
+            if result >= 0:
+                break
+            err = ctypes.get_errno()
+            if err in (errno.EAGAIN, errno.EWOULDBLOCK):
+                return []
+            elif err != errno.EINTR:
+                raise OSError(err, os.strerror(err))
+        messages, buffers, string_at = self._messages, self._buffers, ctypes.string_at
+        return [string_at(buffers[index], messages[index].msg_len) for index in range(result)]
+
+    def _receive_into(self):
+        datagrams, recv_into, view = [], self.socket.recv_into, self._view
+        for _ in range(self.count):
+            try:
+                size = recv_into(self._buffer, self.size, _MSG_DONTWAIT)
+            except socket.error as err:
+                if err.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    break
+                elif err.errno != errno.EINTR:
+                    raise
+            else:
+                datagrams.append(view[:size].tobytes())
+        return datagrams
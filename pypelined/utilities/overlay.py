@@ -0,0 +1,96 @@
+"""
+Read-only mapping layering some items over another mapping without copying it
+"""
+from __future__ import absolute_import
+import itertools
+try:
+    from collections.abc import Mapping, ItemsView
+except ImportError:  # python2
+    from collections import Mapping, ItemsView
+
+__all__ = ['Overlay']
+
+
+class _OverlayItems(ItemsView):
+    """Items of an :py:class:`Overlay`, iterating without a lookup per key"""
+    __slots__ = ()
+
+    def __iter__(self):
+        overlay = self._mapping
+        updates, base = overlay.updates, overlay.base
+        if not overlay._shadows:
+            return itertools.chain(updates.items(), base.items())
+        return itertools.chain(
+            updates.items(), ((key, value) for key, value in base.items() if key not in updates)
+        )
+
+
+class Overlay(Mapping):
+    """
+    Read-only view of the mapping ``base`` with the items of ``updates`` layered over it
+
+    :param base: the mapping to use for all keys not in ``updates``
+    :type base: :py:class:`dict` or :py:class:`~collections.Mapping`
+    :param updates: the items replacing or adding to ``base``
+    :type updates: dict
+
+    This is the equivalent of ``dict(base, **updates)``, without copying ``base``.
+    Neither ``base`` nor ``updates`` may be modified while the overlay is in use.
+    Creating an :py:class:`Overlay` of another :py:class:`Overlay` merges their
+    ``updates``, so that lookups always inspect at most two mappings.
+
+    Use :py:meth:`copy` to get a regular, modifiable :py:class:`dict`.
+    """
+    __slots__ = ('base', 'updates', '_shadows')
+
+    def __init__(self, base, updates):
+        if type(base) is Overlay:
+            if updates:
+                merged = dict(base.updates)
+                merged.update(updates)
+                updates = merged
+            else:
+                updates = base.updates
+            base = base.base
+        self.base = base
+        self.updates = updates
+        # whether any keys of base are replaced, otherwise both can be used as-is
+        self._shadows = any(key in base for key in updates)
+
+    def __getitem__(self, key):
+        try:
+            return self.updates[key]
+        except KeyError:
+            return self.base[key]
+
+    def __contains__(self, key):
+        return key in self.updates or key in self.base
+
+    def __iter__(self):
+        updates = self.updates
+        if not self._shadows:
+            return itertools.chain(updates, self.base)
+        return itertools.chain(updates, (key for key in self.base if key not in updates))
+
+    def __len__(self):
+        if not self._shadows:
+            return len(self.base) + len(self.updates)
+        return len(self.base) + sum(1 for key in self.updates if key not in self.base)
+
+    def items(self):
+        return _OverlayItems(self)
+
+    def copy(self):
+        """Create a :py:class:`dict` of all items"""
+        items = dict(self.base)
+        items.update(self.updates)
+        return items
+
+    def __getstate__(self):
+        return self.base, self.updates
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+    def __repr__(self):
+        return '%s(%r, %r)' % (self.__class__.__name__, self.base, self.updates)
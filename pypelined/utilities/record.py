@@ -0,0 +1,146 @@
+"""
+Compact records sharing the same set of keys
+
+Reports of the same source usually have the same keys in the same order.
+A :py:class:`Record` stores only the values of a report, while its keys
+are stored once in a :py:class:`Schema` shared by all records with the same keys.
+Consumers may prepare how to handle each schema once,
+and then read the values of all records of this schema by position.
+"""
+from __future__ import absolute_import
+try:
+    from collections.abc import Mapping, ItemsView
+except ImportError:  # python2
+    from collections import Mapping, ItemsView
+
+__all__ = ['Schema', 'SchemaRegistry', 'Record']
+
+
+class Schema(object):
+    """
+    Sequence of keys shared by several :py:class:`Record` objects
+
+    :param keys: the keys of all records, in order
+    :type keys: tuple[str]
+
+    The position of each key is the index of its value in :py:attr:`Record.data`.
+    """
+    __slots__ = ('keys', 'index', '_hash')
+
+    def __init__(self, keys):
+        self.keys = tuple(keys)
+        #: mapping from each key to its position
+        self.index = {key: position for position, key in enumerate(self.keys)}
+        self._hash = hash(self.keys)
+
+    def __hash__(self):
+        return self._hash
+
+    def __eq__(self, other):
+        return self is other or (isinstance(other, Schema) and self.keys == other.keys)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __getstate__(self):
+        return self.keys
+
+    def __setstate__(self, state):
+        self.__init__(state)
+
+    def __repr__(self):
+        return '%s(<%d keys>)' % (self.__class__.__name__, len(self.keys))
+
+
+class SchemaRegistry(object):
+    """
+    Registry to share the same :py:class:`Schema` for the same keys
+
+    :param max_schemas: maximum number of schemas to keep
+    :type max_schemas: int
+
+    If more than ``max_schemas`` different key sequences are encountered,
+    the registry is cleared to bound its memory.
+    """
+    def __init__(self, max_schemas=256):
+        self.max_schemas = max_schemas
+        self._schemas = {}
+
+    def get(self, keys):
+        """Get the :py:class:`Schema` for a sequence of ``keys``"""
+        keys = tuple(keys)
+        try:
+            return self._schemas[keys]
+        except KeyError:
+            if len(self._schemas) >= self.max_schemas:
+                self._schemas.clear()
+            schema = self._schemas[keys] = Schema(keys)
+            return schema
+
+    def __len__(self):
+        return len(self._schemas)
+
+    def __repr__(self):
+        return '%s(max_schemas=%d)' % (self.__class__.__name__, self.max_schemas)
+
+
+class _RecordItems(ItemsView):
+    """Items of a :py:class:`Record`, iterating without a lookup per key"""
+    __slots__ = ()
+
+    def __iter__(self):
+        record = self._mapping
+        return iter(zip(record.schema.keys, record.data))
+
+
+class Record(Mapping):
+    """
+    Read-only mapping of the keys of a :py:class:`Schema` to values
+
+    :param schema: the keys of the record
+    :type schema: :py:class:`Schema`
+    :param data: the values of the record, in the order of ``schema``
+    :type data: list
+
+    Lookups by key are equivalent to ``record.data[record.schema.index[key]]``.
+    Consumers which handle many records may instead prepare the positions of
+    relevant keys once per :py:attr:`schema`, and read :py:attr:`data` directly.
+
+    Use :py:meth:`copy` to get a regular, modifiable :py:class:`dict`.
+    """
+    __slots__ = ('schema', 'data')
+
+    def __init__(self, schema, data):
+        self.schema = schema
+        self.data = data
+
+    def __getitem__(self, key):
+        return self.data[self.schema.index[key]]
+
+    def __contains__(self, key):
+        return key in self.schema.index
+
+    def __iter__(self):
+        return iter(self.schema.keys)
+
+    def __len__(self):
+        return len(self.data)
+
+    def items(self):
+        return _RecordItems(self)
+
+    def copy(self):
+        """Create a :py:class:`dict` of all items"""
+        return dict(zip(self.schema.keys, self.data))
+
+    def __getstate__(self):
+        return self.schema, self.data
+
+    def __setstate__(self, state):
+        self.schema, self.data = state
+
+    def __repr__(self):
+        return '%s(%r)' % (self.__class__.__name__, self.copy())
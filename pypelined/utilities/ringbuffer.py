@@ -0,0 +1,172 @@
+"""
+Bounded buffer for passing items between threads
+"""
+from __future__ import division, absolute_import
+import threading
+import collections
+import time
+
+__all__ = ['RingBuffer', 'OVERFLOW_POLICIES']
+
+#: policies to handle items added to a full :py:class:`RingBuffer`
+OVERFLOW_POLICIES = ('block', 'drop-oldest', 'drop-newest')
+
+
+class RingBuffer(object):
+    """
+    Bounded, thread-safe FIFO buffer with a configurable overflow policy
+
+    :param capacity: maximum number of items in the buffer
+    :type capacity: int
+    :param overflow: how to handle new items if the buffer is full
+    :type overflow: str
+
+    If the buffer is full, new items are handled according to ``overflow``:
+
+    ``'block'``
+        Wait until there is space for the new item.
+
+    ``'drop-oldest'``
+        Discard the oldest item in the buffer to make room for the new item.
+
+    ``'drop-newest'``
+        Discard the new item.
+
+    Any discarded items are counted in :py:attr:`drops`.
+    """
+    def __init__(self, capacity, overflow='drop-newest'):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError('overflow must be one of %s, not %r' % (', '.join(OVERFLOW_POLICIES), overflow))
+        if capacity < 1:
+            raise ValueError('capacity must be positive')
+        self.capacity = capacity
+        self.overflow = overflow
+        self._items = collections.deque()
+        self._mutex = threading.Lock()
+        self._not_empty = threading.Condition(self._mutex)
+        self._not_full = threading.Condition(self._mutex)
+        #: number of items added to the buffer
+        self.puts = 0
+        #: number of items discarded due to overflow
+        self.drops = 0
+        #: largest number of items held at once
+        self.high_water = 0
+
+    def put(self, item, timeout=None):
+        """
+        Add an ``item`` to the buffer
+
+        :param timeout: maximum time to wait for space with the ``'block'`` policy
+        :type timeout: float or None
+        :returns: whether ``item`` was added to the buffer
+        :rtype: bool
+        """
+        return self.put_many((item,), timeout=timeout) == 1
+
+    def put_many(self, items, timeout=None):
+        """
+        Add several ``items`` to the buffer at once
+
+        :param timeout: maximum time to wait for space with the ``'block'`` policy
+        :type timeout: float or None
+        :returns: number of items added to the buffer
+        :rtype: int
+
+        The ``timeout`` applies to adding all ``items``;
+        items for which there is no space once it has expired are discarded.
+        Items are available to consumers while waiting for space,
+        so a batch may be larger than the :py:attr:`capacity`.
+        """
+        added = pending = 0
+        deadline = None if timeout is None else time.time() + timeout
+        with self._mutex:
+            buffer, capacity = self._items, self.capacity
+            for item in items:
+                if len(buffer) >= capacity:
+                    if self.overflow == 'drop-newest':
+                        self.drops += 1
+                        continue
+                    elif self.overflow == 'drop-oldest':
+                        buffer.popleft()
+                        self.drops += 1
+                    else:
+                        # consumers must see the items added so far, or a full buffer is never drained
+                        if pending:
+                            self.high_water = max(self.high_water, len(buffer))
+                            self._not_empty.notify(pending)
+                            pending = 0
+                        remaining = None if deadline is None else deadline - time.time()
+                        if not self._wait(self._not_full, lambda: len(buffer) < capacity, remaining):
+                            self.drops += 1
+                            continue
+                buffer.append(item)
+                added += 1
+                pending += 1
+            self.puts += added
+            if len(buffer) > self.high_water:
+                self.high_water = len(buffer)
+            if pending:
+                self._not_empty.notify(pending)
+        return added
+
+    def get(self, timeout=None):
+        """
+        Remove and return the oldest item from the buffer
+
+        :param timeout: maximum time to wait for an item
+        :type timeout: float or None
+        :raises IndexError: if no item is available after ``timeout``
+        """
+        with self._mutex:
+            buffer = self._items
+            if not buffer and not self._wait(self._not_empty, lambda: buffer, timeout):
+                raise IndexError('get from empty %s' % self.__class__.__name__)
+            item = buffer.popleft()
+            self._not_full.notify()
+            return item
+
+    def get_many(self, max_items, timeout=None):
+        """
+        Remove and return up to ``max_items`` oldest items from the buffer
+
+        Waits up to ``timeout`` for the first item, but returns any number
+        of available items as soon as there is one.
+        An empty list is returned if no item becomes available.
+        """
+        with self._mutex:
+            buffer = self._items
+            if not buffer and not self._wait(self._not_empty, lambda: buffer, timeout):
+                return []
+            items = [buffer.popleft() for _ in range(min(max_items, len(buffer)))]
+            self._not_full.notify(len(items))
+            return items
+
+    @staticmethod
+    def _wait(condition, predicate, timeout):
+        """Wait on ``condition`` until ``predicate`` is met or ``timeout`` expires"""
+        if timeout is None:
+            while not predicate():
+                condition.wait()
+            return True
+        deadline = time.time() + timeout
+        while not predicate():
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return False
+            condition.wait(remaining)
+        return True
+
+    def statistics(self):
+        """Get the current counters as a :py:class:`dict`"""
+        return {
+            'depth': len(self._items), 'capacity': self.capacity, 'high_water': self.high_water,
+            'puts': self.puts, 'drops': self.drops,
+        }
+
+    def __len__(self):
+        return len(self._items)
+
+    def __repr__(self):
+        return '<%s(capacity=%d, overflow=%r), depth=%d, drops=%d>' % (
+            self.__class__.__name__, self.capacity, self.overflow, len(self._items), self.drops
+        )
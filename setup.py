@@ -27,8 +27,13 @@ if __name__ == '__main__':
             'apmon',
             'filelock',
             'chainlet>=1.2.0',
-            'include'
+            'include',
+            'selectors34; python_version<"3.4"',
         ],
+        extras_require={
+            # vectorised aggregation in pypelined.modifier.aggregation
+            'numpy': ['numpy'],
+        },
         # metadata for package search
         license='MIT',
         # https://pypi.python.org/pypi?%3Aaction=list_classifiers
@@ -48,7 +53,7 @@ if __name__ == '__main__':
         ],
         keywords='pipeline service stream pypeline',
         # unit tests
-        # test_suite='test_pypelined',
+        test_suite='test_pypelined',
         # use unittest backport to have subTest etc.
         # tests_require=['unittest2'] if sys.version_info < (3, 4) else [],
     )
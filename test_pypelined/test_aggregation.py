@@ -0,0 +1,88 @@
+from __future__ import absolute_import
+import unittest
+try:
+    from unittest import mock
+except ImportError:  # python2
+    import mock
+
+import chainlet
+
+from pypelined.modifier import aggregation
+from pypelined.modifier.aggregation import Aggregate
+
+
+def send_all(link, reports):
+    """Send ``reports`` to ``link``, collecting all reports it provides"""
+    provided = []
+    for report in reports:
+        try:
+            provided.extend(link.chainlet_send(report))
+        except chainlet.StopTraversal:
+            pass
+    return provided
+
+
+class TestAggregate(unittest.TestCase):
+    use_numpy = True
+
+    def setUp(self):
+        if self.use_numpy and not aggregation.HAS_NUMPY:
+            self.skipTest('requires numpy')
+        patch = mock.patch.object(aggregation, 'HAS_NUMPY', self.use_numpy)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def test_tumbling(self):
+        link = Aggregate(['load'], tags=['host'], window=10, time_key='time')
+        reports = [
+            {'time': 1, 'host': 'a', 'load': 1}, {'time': 2, 'host': 'b', 'load': 10},
+            {'time': 5, 'host': 'a', 'load': 3}, {'time': 12, 'host': 'a', 'load': 7},
+        ]
+        self.assertEqual(sorted(send_all(link, reports), key=lambda report: report['host']), [
+            {'host': 'a', 'time': 10, 'count': 2, 'load.min': 1.0, 'load.max': 3.0, 'load.mean': 2.0},
+            {'host': 'b', 'time': 10, 'count': 1, 'load.min': 10.0, 'load.max': 10.0, 'load.mean': 10.0},
+        ])
+        # windows without any reports are skipped
+        self.assertEqual(send_all(link, [{'time': 45, 'host': 'a', 'load': 1}]), [
+            {'host': 'a', 'time': 20, 'count': 1, 'load.min': 7.0, 'load.max': 7.0, 'load.mean': 7.0},
+        ])
+
+    def test_statistics(self):
+        link = Aggregate(
+            ['in', 'out'], window=10, statistics=('sum', 'count', 'rate'), percentiles=(50,), time_key='time'
+        )
+        reports = [
+            {'time': 0, 'in': 100, 'out': 'n/a'}, {'time': 2, 'in': 110},
+            {'time': 4, 'in': 130, 'out': 4}, {'time': 10, 'in': 0, 'out': 0},
+        ]
+        self.assertEqual(send_all(link, reports), [{
+            'time': 10, 'count': 3,
+            'in.sum': 340.0, 'in.count': 3, 'in.rate': 7.5, 'in.p50': 110.0,
+            'out.sum': 4.0, 'out.count': 1, 'out.p50': 4.0,
+        }])
+
+    def test_sliding(self):
+        link = Aggregate(['value'], window=10, step=5, statistics=('max',), time_key='time')
+        reports = [{'time': timestamp, 'value': timestamp} for timestamp in (1, 6, 11, 16)]
+        self.assertEqual(
+            [(report['time'], report['count'], report['value.max']) for report in send_all(link, reports)],
+            [(5, 1, 1.0), (10, 2, 6.0), (15, 2, 11.0)],
+        )
+
+    def test_batch(self):
+        link = Aggregate(['value'], window=10, statistics=('count',), time_key='time')
+        provided = link.chainlet_send([{'time': 1, 'value': 1}, {'time': 2, 'value': 2}, {'time': 10, 'value': 3}])
+        self.assertEqual(provided, [{'time': 10, 'count': 2, 'value.count': 2}])
+
+    def test_invalid_arguments(self):
+        self.assertRaises(ValueError, Aggregate, ['value'], statistics=('median',))
+        self.assertRaises(ValueError, Aggregate, ['value'], window=10, step=20)
+        self.assertRaises(ValueError, Aggregate, ['value'], percentiles=(101,))
+
+
+class TestAggregatePython(TestAggregate):
+    use_numpy = False
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+from __future__ import absolute_import
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+import chainlet
+
+from pypelined.provider.stream import tail_path
+
+try:
+    from pypelined.aio import AsyncPipelineDriver, nonblocking
+except SyntaxError:  # python2
+    AsyncPipelineDriver = None
+
+
+class Produce(chainlet.ChainLink):
+    def __init__(self, values):
+        super(Produce, self).__init__()
+        self.values = iter(values)
+
+    def chainlet_send(self, value=None):
+        return next(self.values)
+
+
+class Take(chainlet.ChainLink):
+    def __init__(self, count, target):
+        super(Take, self).__init__()
+        self.count = count
+        self.target = target
+
+    def chainlet_send(self, value=None):
+        if len(self.target) >= self.count:
+            raise StopIteration
+        self.target.append(value)
+        return value
+
+
+class InlineTake(Take):
+    pass
+
+
+class Closing(chainlet.ChainLink):
+    def __init__(self, closed):
+        super(Closing, self).__init__()
+        self.closed = closed
+
+    def chainlet_send(self, value=None):
+        return value
+
+    def close(self):
+        self.closed.append(self)
+
+
+@unittest.skipIf(AsyncPipelineDriver is None, 'asyncio driver requires python 3.5')
+class TestAsyncPipelineDriver(unittest.TestCase):
+    def setUp(self):
+        nonblocking(InlineTake)
+
+    def run_driver(self, *chains):
+        driver = AsyncPipelineDriver(max_workers=2)
+        driver.mount(*chains)
+        driver.run()
+        return driver
+
+    def test_exhausted_source(self):
+        received = []
+        driver = self.run_driver(Produce(range(5)) >> Take(10, received))
+        self.assertEqual(received, list(range(5)))
+        self.assertEqual(driver.failed, [])
+        self.assertEqual(driver.mounts, [])
+
+    def test_exhausted_chain(self):
+        executor, inline = [], []
+        driver = self.run_driver(Produce(range(10)) >> Take(3, executor), Produce(range(10)) >> InlineTake(3, inline))
+        self.assertEqual(executor, [0, 1, 2])
+        self.assertEqual(inline, [0, 1, 2])
+        self.assertEqual(driver.failed, [])
+
+    def test_failed_chain(self):
+        received = []
+        failing = Produce([1, 0]) >> chainlet.funclet(lambda value: 1 // value)()
+        with self.assertLogs('pypelined.aio', 'ERROR'):
+            driver = self.run_driver(failing, Produce(range(5)) >> InlineTake(10, received))
+        self.assertEqual(driver.failed, [failing])
+        self.assertEqual(received, list(range(5)))
+
+    def test_close_links(self):
+        closed = []
+        shared, first = Closing(closed), Closing(closed)
+        self.run_driver(Produce(range(5)) >> first >> shared, Produce(range(3)) >> shared)
+        self.assertEqual(closed, [first, shared])
+
+    def test_polled_provider(self):
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, 'test.log')
+        self.addCleanup(shutil.rmtree, directory)
+
+        def write():
+            for line in (b'first\n', b'second\nthird\nfourth\n'):
+                time.sleep(0.1)
+                with open(path, 'ab') as log_file:
+                    log_file.write(line)
+        writer = threading.Thread(target=write)
+        writer.start()
+        received = []
+        driver = self.run_driver(tail_path(path) >> InlineTake(3, received))
+        writer.join()
+        self.assertEqual(received, ['first', 'second', 'third'])
+        self.assertEqual(driver.failed, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+from __future__ import absolute_import
+import unittest
+
+import chainlet
+
+from pypelined.utilities.record import Schema, Record
+
+try:
+    from pypelined.consumer.alice_apmon import XrootdSpaceReporter
+except ImportError:  # apmon is not installed
+    XrootdSpaceReporter = None
+
+
+REPORT = {
+    'site': 'ALICE::Test::SE', 'ins': 'anon', 'pgm': 'xrootd', 'ver': 'v4.8.0', 'oss.paths': 2,
+    'oss.paths.0.rp': '/data/0', 'oss.paths.0.tot': 4096, 'oss.paths.0.free': 2048,
+    'oss.paths.1.rp': '/data/1', 'oss.paths.1.tot': 8192, 'oss.paths.1.free': 1024,
+}
+
+
+def as_record(report):
+    keys = sorted(report)
+    return Record(Schema(keys), [report[key] for key in keys])
+
+
+@unittest.skipIf(XrootdSpaceReporter is None, 'reporting to ApMon requires apmon')
+class TestXrootdSpaceReporter(unittest.TestCase):
+    def reporter(self):
+        reporter = XrootdSpaceReporter()
+        # each path is reported by two hosts
+        reporter._get_path_share = lambda path: 2
+        return reporter
+
+    def test_space(self):
+        for report in (REPORT, as_record(REPORT)):
+            apmon_report = self.reporter().chainlet_send(report)
+            self.assertEqual(apmon_report.cluster_name, 'ALICE::Test::SE_anon_xrootd_Services')
+            self.assertEqual(apmon_report, {
+                'xrootd_version': 'v4.8.0', 'space_total': 6.0, 'space_free': 1.5, 'space_largestfreechunk': 2.0,
+            })
+
+    def test_schema_plan(self):
+        reporter = self.reporter()
+        record = as_record(REPORT)
+        reporter.chainlet_send(record)
+        reporter.chainlet_send(Record(record.schema, list(record.data)))
+        self.assertEqual(list(reporter._schema_plans), [record.schema])
+        # reports with fewer paths than listed in the schema only use the listed paths
+        partial = Record(record.schema, [1 if key == 'oss.paths' else value for key, value in record.items()])
+        self.assertEqual(reporter.chainlet_send(partial)['space_total'], 2.0)
+
+    def test_no_paths(self):
+        reporter = self.reporter()
+        report = {key: value for key, value in REPORT.items() if not key.startswith('oss.')}
+        self.assertRaises(chainlet.StopTraversal, reporter.chainlet_send, report)
+        self.assertRaises(chainlet.StopTraversal, reporter.chainlet_send, as_record(report))
+        incomplete = dict(REPORT, **{'oss.paths': 3})
+        self.assertRaises(KeyError, reporter.chainlet_send, incomplete)
+        self.assertRaises(KeyError, reporter.chainlet_send, as_record(incomplete))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+from __future__ import absolute_import
+import time
+import unittest
+
+import chainlet
+
+from pypelined.modifier.batchlets import Batch, Unbatch
+
+
+class TestBatch(unittest.TestCase):
+    def send_all(self, link, values):
+        results = []
+        for value in values:
+            try:
+                results.append(link.chainlet_send(value))
+            except chainlet.StopTraversal:
+                pass
+        return results
+
+    def test_size(self):
+        link = Batch(size=3)
+        self.assertEqual(self.send_all(link, range(8)), [[0, 1, 2], [3, 4, 5]])
+        self.assertEqual(link.flush(), [6, 7])
+        self.assertEqual(link.flush(), [])
+        self.assertRaises(ValueError, Batch, size=0)
+
+    def test_flush_after(self):
+        link = Batch(size=100, flush_after=0.05)
+        self.assertEqual(self.send_all(link, range(3)), [])
+        time.sleep(0.1)
+        self.assertEqual(self.send_all(link, [3, 4]), [[0, 1, 2, 3]])
+        self.assertEqual(link.flush(), [4])
+
+    def test_unbatch(self):
+        received = []
+        chain = Batch(size=2) >> Unbatch() >> chainlet.funclet(lambda value: received.append(value) or value)()
+        for value in range(5):
+            chain.send(value)
+        self.assertEqual(received, [0, 1, 2, 3])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+from __future__ import absolute_import
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+BENCHMARKS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks')
+
+if sys.version_info < (3, 4):  # the suite uses tracemalloc
+    suite = None
+else:
+    sys.path.insert(0, BENCHMARKS)
+    try:
+        import suite
+    finally:
+        sys.path.remove(BENCHMARKS)
+
+
+@unittest.skipIf(suite is None, 'benchmarks require python3')
+class TestSuite(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def run_suite(self, *args):
+        environment = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+        return subprocess.call(
+            [sys.executable, os.path.join(BENCHMARKS, 'suite.py')] + list(args),
+            env=environment, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+
+    def test_cases(self):
+        inputs = suite.Inputs()
+        self.addCleanup(inputs.close)
+        for name, case in suite.CASES:
+            if case is None:
+                continue
+            result = suite.measure(case, inputs, chunks=20, repeat=1)
+            self.assertGreater(result['chunks_per_s'], 0, name)
+            self.assertEqual(sorted(result['latency_us']), ['max', 'p50', 'p90', 'p99'])
+
+    def test_compare(self):
+        output = os.path.join(self.directory, 'results.json')
+        self.assertEqual(self.run_suite('remap', '--chunks', '100', '--repeat', '1', '--output', output), 0)
+        with open(output) as results:
+            document = json.load(results)
+        self.assertEqual(list(document['results']), ['remap'])
+        self.assertEqual(document['meta']['chunks'], 100)
+        document['results']['remap']['chunks_per_s'] *= 1000
+        with open(output, 'w') as results:
+            json.dump(document, results)
+        self.assertEqual(self.run_suite('remap', '--chunks', '100', '--repeat', '1', '--compare', output), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+from __future__ import absolute_import
+import unittest
+
+from pypelined.modifier.counters import Rates
+
+
+class TestRates(unittest.TestCase):
+    def test_rates(self):
+        link = Rates(['in', 'out'], tags=['host'], time_key='time')
+        first = {'time': 0, 'host': 'a', 'in': 100, 'out': 10}
+        self.assertIs(link.chainlet_send(first), first)
+        self.assertEqual(link.chainlet_send({'time': 0, 'host': 'b', 'in': 0}), {'time': 0, 'host': 'b', 'in': 0})
+        self.assertEqual(
+            link.chainlet_send({'time': 10, 'host': 'a', 'in': 300, 'out': 10}),
+            {'time': 10, 'host': 'a', 'in': 300, 'out': 10, 'in.rate': 20.0, 'out.rate': 0.0},
+        )
+        self.assertEqual(link.chainlet_send({'time': 4, 'host': 'b', 'in': 8})['in.rate'], 2.0)
+        self.assertEqual(len(link), 2)
+
+    def test_reset(self):
+        link = Rates(['in'], time_key='time')
+        link.chainlet_send({'time': 0, 'in': 100})
+        self.assertEqual(link.chainlet_send({'time': 5, 'in': 50})['in.rate'], 10.0)
+
+    def test_missing(self):
+        link = Rates(['in', 'out'], suffix='_per_s', time_key='time')
+        link.chainlet_send({'time': 0, 'in': 0, 'out': 0})
+        self.assertEqual(
+            link.chainlet_send({'time': 1, 'in': 5, 'out': 'n/a'}),
+            {'time': 1, 'in': 5, 'out': 'n/a', 'in_per_s': 5.0},
+        )
+        # the last value of a missing counter is kept
+        self.assertEqual(link.chainlet_send({'time': 2, 'in': 5})['in_per_s'], 0.0)
+        self.assertNotIn('out_per_s', link.chainlet_send({'time': 3, 'out': 6}))
+
+    def test_batch(self):
+        link = Rates(['in'], time_key='time')
+        reports = link.chainlet_send([{'time': 0, 'in': 0}, {'time': 2, 'in': 4}])
+        self.assertEqual([report.get('in.rate') for report in reports], [None, 2.0])
+
+    def test_bounded(self):
+        link = Rates(['in'], tags=['pid'], time_key='time', max_keys=2, idle_timeout=100)
+        for pid in range(3):
+            link.chainlet_send({'time': pid, 'pid': pid, 'in': 0})
+        self.assertEqual((len(link), link.evicted), (2, 1))
+        self.assertNotIn('in.rate', link.chainlet_send({'time': 10, 'pid': 0, 'in': 1}))
+        link.chainlet_send({'time': 200, 'pid': 0, 'in': 2})
+        self.assertEqual((len(link), link.evicted), (1, 3))
+        self.assertRaises(ValueError, Rates, ['in'], max_keys=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+from __future__ import absolute_import
+import re
+import unittest
+
+from pypelined.modifier.dictlets import RemapPlan, remap, update
+from pypelined.utilities.overlay import Overlay
+from pypelined.utilities.record import Schema, Record
+
+
+REPORT = {
+    'link.num': 3, 'ver': 'v4', 'oss.paths.0.free': 16, 'oss.paths.1.free': 32, 'oss.paths.0.tot': 64,
+}
+
+
+def as_record(report):
+    keys = sorted(report)
+    return Record(Schema(keys), [report[key] for key in keys])
+
+
+class TestRemapPlan(unittest.TestCase):
+    def test_literals(self):
+        plan = RemapPlan({'link.num': 'connections', 'ver': 'version'})
+        self.assertEqual(plan.remap(REPORT), {'connections': 3, 'version': 'v4'})
+        self.assertEqual(plan.remap({'ver': 'v5', 'other': 1}), {'version': 'v5'})
+        self.assertEqual(
+            RemapPlan({'ver': 'version'}, cull_unknown=False).remap({'ver': 'v5', 'other': 1}),
+            {'version': 'v5', 'other': 1},
+        )
+
+    def test_patterns(self):
+        plan = RemapPlan({
+            'oss.paths.*.free': 'space_free_*',
+            re.compile(r'oss\.paths\.(\d+)\.tot'): r'space_total_\1',
+            'ver': 'version',
+        })
+        expected = {'space_free_0': 16, 'space_free_1': 32, 'space_total_0': 64, 'version': 'v4'}
+        self.assertEqual(plan.remap(REPORT), expected)
+        # cached keys must give the same result
+        self.assertEqual(plan.remap(REPORT), expected)
+        self.assertEqual(plan.remap({'oss.paths.0.free.extra': 1, 'oss.paths.tot': 2}), {})
+        self.assertEqual(
+            RemapPlan({'oss.paths.*.free': 'free_*'}, cull_unknown=False).remap({'oss.paths.2.free': 1, 'ver': 'v4'}),
+            {'free_2': 1, 'ver': 'v4'},
+        )
+
+    def test_literals_precede_patterns(self):
+        plan = RemapPlan({'oss.paths.0.free': 'first_free', 'oss.paths.*.free': 'free_*'})
+        self.assertEqual(plan.remap(REPORT), {'first_free': 16, 'free_1': 32})
+
+    def test_record(self):
+        for key_map in ({'link.num': 'connections', 'ver': 'version'}, {'oss.paths.*.free': 'free_*'}):
+            for cull_unknown in (True, False):
+                plan = RemapPlan(key_map, cull_unknown=cull_unknown)
+                record = as_record(REPORT)
+                self.assertEqual(plan.remap(record), plan.remap(dict(REPORT)))
+                self.assertEqual(plan.remap(Record(record.schema, list(record.data))), plan.remap(dict(REPORT)))
+                self.assertEqual(list(plan._schema_plans), [record.schema])
+
+    def test_overlay_record(self):
+        plan = RemapPlan({'ver': 'version', 'site': 'site_name'})
+        overlay = Overlay(as_record(REPORT), {'site': 'test', 'ver': 'v5'})
+        self.assertEqual(plan.remap(overlay), {'version': 'v5', 'site_name': 'test'})
+        self.assertEqual(plan.remap(Overlay(dict(REPORT), {'site': 'test'})), {'version': 'v4', 'site_name': 'test'})
+
+
+class TestRemap(unittest.TestCase):
+    def test_batch(self):
+        link = remap({'ver': 'version'})
+        self.assertEqual(link.send(REPORT), {'version': 'v4'})
+        self.assertEqual(link.send([REPORT, {'ver': 'v5'}]), [{'version': 'v4'}, {'version': 'v5'}])
+
+
+class TestUpdate(unittest.TestCase):
+    def test_update(self):
+        report = {'a': 1, 'b': 2}
+        updated = update(iterable=[('b', 3)], c=4).send(report)
+        self.assertIsInstance(updated, Overlay)
+        self.assertEqual(updated, {'a': 1, 'b': 3, 'c': 4})
+        self.assertEqual(report, {'a': 1, 'b': 2})
+
+    def test_batch(self):
+        updated = update(c=4).send([{'a': 1}, {'b': 2}])
+        self.assertEqual(updated, [{'a': 1, 'c': 4}, {'b': 2, 'c': 4}])
+
+    def test_chained(self):
+        report = {'a': 1}
+        updated = (update(b=2) >> update(b=3, c=4)).send(report)
+        self.assertIs(updated.base, report)
+        self.assertEqual(updated, {'a': 1, 'b': 3, 'c': 4})
+
+
+if __name__ == '__main__':
+    unittest.main()
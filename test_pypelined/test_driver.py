@@ -0,0 +1,164 @@
+from __future__ import absolute_import
+import multiprocessing
+import os
+import shutil
+import socket
+import tempfile
+import time
+import unittest
+
+import chainlet
+
+from pypelined.driver import PipelineDriver, MultiprocessPipelineDriver, Replicated, _run_worker
+from pypelined.consumer.socket import UDPSocket
+
+
+class Produce(chainlet.ChainLink):
+    def __init__(self, values):
+        super(Produce, self).__init__()
+        self.values = iter(values)
+
+    def chainlet_send(self, value=None):
+        return next(self.values)
+
+
+class FailOnce(chainlet.ChainLink):
+    """Fail unless ``marker`` exists, which is created when failing"""
+    def __init__(self, marker):
+        super(FailOnce, self).__init__()
+        self.marker = marker
+
+    def chainlet_send(self, value=None):
+        if not os.path.exists(self.marker):
+            open(self.marker, 'w').close()
+            raise RuntimeError('first attempt fails')
+        return value
+
+
+class Write(chainlet.ChainLink):
+    def __init__(self, path):
+        super(Write, self).__init__()
+        self.path = path
+
+    def chainlet_send(self, value=None):
+        with open(self.path, 'a') as output:
+            output.write('%s\n' % value)
+        return value
+
+
+class Closing(chainlet.ChainLink):
+    """Link recording each call to :py:meth:`close` in ``closed``"""
+    def __init__(self, closed, path=None):
+        super(Closing, self).__init__()
+        self.closed = closed
+        self.path = path
+
+    def chainlet_send(self, value=None):
+        return value
+
+    def close(self):
+        self.closed.append(self)
+        if self.path is not None:
+            open(self.path, 'w').close()
+
+
+class Block(chainlet.ChainLink):
+    """Provider blocking forever"""
+    def chainlet_send(self, value=None):
+        while True:
+            time.sleep(1)
+
+
+class TestPipelineDriver(unittest.TestCase):
+    def test_failed_pipeline(self):
+        received = []
+        failing = Produce([1, 0]) >> chainlet.funclet(lambda value: 1 // value)()
+        driver = PipelineDriver()
+        driver.mount(failing, Produce(range(5)) >> chainlet.funclet(lambda value: received.append(value))())
+        with self.assertLogs('pypelined.driver', 'ERROR'):
+            driver.run()
+        self.assertEqual(driver.failed, [failing])
+        self.assertEqual(received, list(range(5)))
+
+    def test_close_links(self):
+        closed = []
+        shared, first, second = Closing(closed), Closing(closed), Closing(closed)
+        failing = Produce([0]) >> chainlet.funclet(lambda value: 1 // value)() >> first
+        driver = PipelineDriver()
+        driver.mount(failing, Produce(range(5)) >> (shared, second), Produce(range(3)) >> shared)
+        with self.assertLogs('pypelined.driver', 'ERROR'):
+            driver.run()
+        self.assertEqual(closed, [first, shared, second])
+
+    def test_flush_batches(self):
+        receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.addCleanup(receiver.close)
+        receiver.bind(('127.0.0.1', 0))
+        receiver.settimeout(5)
+        driver = PipelineDriver()
+        consumer = UDPSocket('127.0.0.1', receiver.getsockname()[1], batch_size=8, max_delay=60)
+        driver.mount(Produce(['first', 'second']) >> consumer)
+        driver.run()
+        self.assertEqual([receiver.recv(64) for _ in range(2)], [b'first', b'second'])
+
+
+class TestAssign(unittest.TestCase):
+    def assign(self, workers, *mounts):
+        driver = MultiprocessPipelineDriver(workers)
+        driver.mount(*mounts)
+        return [worker.pipelines for worker in driver._assign()]
+
+    def test_round_robin(self):
+        first, second, third = Produce([]), Produce([]), Produce([])
+        self.assertEqual(self.assign(2, first, second, third), [[first, third], [second]])
+
+    def test_replicated(self):
+        shared, first, second = Produce([]), Produce([]), Produce([])
+        self.assertEqual(
+            self.assign(3, first, Replicated(shared, copies=2), second),
+            [[first, second], [shared], [shared]]
+        )
+        self.assertEqual(self.assign(2, Replicated(shared), first), [[shared, first], [shared]])
+
+    def test_replicated_exceeding_workers(self):
+        shared = Produce([])
+        with self.assertLogs('pypelined.driver', 'WARNING'):
+            self.assertEqual(self.assign(2, Replicated(shared, copies=5)), [[shared], [shared]])
+        self.assertRaises(ValueError, Replicated, shared, copies=0)
+
+
+class TestMultiprocessPipelineDriver(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_restart(self):
+        output = os.path.join(self.directory, 'output')
+        driver = MultiprocessPipelineDriver(2, restart_delay=0.1)
+        driver.mount(
+            Produce(range(3)) >> FailOnce(os.path.join(self.directory, 'marker')) >> Write(output),
+            Replicated(Produce('ab') >> Write(output), copies=1),
+        )
+        driver.run()
+        with open(output) as lines:
+            self.assertEqual(sorted(lines.read().split()), ['0', '1', '2', 'a', 'b'])
+        self.assertEqual(driver.mounts, [])
+
+    def test_terminate_worker(self):
+        marker = os.path.join(self.directory, 'closed')
+        log_reader, log_writer = multiprocessing.Pipe(duplex=False)
+        worker = multiprocessing.Process(
+            target=_run_worker, args=([Block() >> Closing([], marker)], PipelineDriver, log_writer)
+        )
+        worker.start()
+        time.sleep(0.5)
+        worker.terminate()
+        worker.join()
+        log_reader.close()
+        self.assertTrue(os.path.exists(marker))
+
+
+if __name__ == '__main__':
+    unittest.main()
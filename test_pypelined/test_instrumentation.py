@@ -0,0 +1,57 @@
+from __future__ import absolute_import
+import unittest
+
+import chainlet
+
+from pypelined.instrumentation import Instrumentation
+
+
+@chainlet.funclet
+def evens(value):
+    if value % 2:
+        raise chainlet.StopTraversal
+    return value
+
+
+@chainlet.funclet
+def reject(value, rejected):
+    if value == rejected:
+        raise ValueError('rejected %r' % value)
+    return value
+
+
+@chainlet.funclet
+def identity(value):
+    return value
+
+
+class TestInstrumentation(unittest.TestCase):
+    def send_all(self, chain, values):
+        for value in values:
+            try:
+                chain.send(value)
+            except (chainlet.StopTraversal, ValueError):
+                pass
+
+    def assertCounts(self, statistics, received, skipped, errors):
+        self.assertEqual(
+            (statistics.received, statistics.skipped, statistics.errors), (received, skipped, errors)
+        )
+
+    def test_flat_chain(self):
+        instrumentation = Instrumentation(sample_interval=4)
+        chain = instrumentation.instrument(evens() >> reject(6) >> identity())
+        self.send_all(chain, range(20))
+        first, second, third = instrumentation.statistics
+        self.assertCounts(first, 20, 10, 0)
+        self.assertCounts(second, 10, 0, 1)
+        self.assertCounts(third, 9, 0, 0)
+        self.assertEqual(third.provided, 9)
+        self.assertEqual(sum(first.latency), 5)
+
+    def test_sample_interval(self):
+        self.assertRaises(ValueError, Instrumentation(sample_interval=3).instrument, identity())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+from __future__ import absolute_import
+import os
+import shutil
+import socket
+import tempfile
+import time
+import unittest
+
+from pypelined import loadgen
+from pypelined.instrumentation import LATENCY_BUCKETS
+
+
+def receiver():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(('127.0.0.1', 0))
+    sock.settimeout(5)
+    return sock
+
+
+class TestLoads(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_xrootd(self):
+        sock = receiver()
+        load = loadgen.XRootDReportLoad(sock.getsockname(), cardinality=2, paths=3)
+        load.open()
+        try:
+            load.emit(3)
+            reports = [sock.recv(65536).decode() for _ in range(3)]
+        finally:
+            load.close()
+            sock.close()
+        self.assertIsNone(load._socket)
+        self.assertEqual(len(set(report.split(' pid=')[1][:6] for report in reports)), 2)
+        for report in reports:
+            self.assertTrue(report.startswith('<statistics ') and report.endswith('</statistics>'))
+            self.assertIn('<paths>3<stats id="0">', report)
+            self.assertEqual(report.count('<free>'), 3)
+
+    def test_rotating_log(self):
+        path = os.path.join(self.temp_dir, 'load.log')
+        load = loadgen.RotatingLogLoad(path, cardinality=4, rotate_bytes=200)
+        load.open()
+        try:
+            load.emit(0)
+            self.assertFalse(os.path.getsize(path))
+            load.emit(1)
+            self.assertFalse(os.path.exists(path + '.1'))
+            load.emit(2)
+            load.emit(1)
+        finally:
+            load.close()
+        with open(path + '.1') as rotated:
+            self.assertEqual(len(rotated.readlines()), 3)
+        with open(path) as current:
+            lines = current.readlines()
+        self.assertEqual(len(lines), 1)
+        self.assertIn(' login as user0\n', lines[0])
+
+    def test_udp_flood(self):
+        sock = receiver()
+        load = loadgen.UDPFloodLoad(sock.getsockname(), size=64, cardinality=2)
+        load.open()
+        try:
+            load.emit(3)
+            datagrams = [sock.recv(1024) for _ in range(3)]
+        finally:
+            load.close()
+            sock.close()
+        self.assertEqual([len(datagram) for datagram in datagrams], [64] * 3)
+        self.assertEqual(datagrams[0], datagrams[2])
+        self.assertTrue(datagrams[1].startswith(b'source=1 ') and datagrams[1].endswith(b'x\n'))
+
+    def test_unreachable(self):
+        sock = receiver()
+        address = sock.getsockname()
+        sock.close()
+        for load in (loadgen.XRootDReportLoad(address, cardinality=1), loadgen.UDPFloodLoad(address)):
+            load.open()
+            try:
+                for _ in range(3):
+                    load.emit(2)
+            finally:
+                load.close()
+
+
+class TestLoadProcess(unittest.TestCase):
+    def test_rate(self):
+        sock = receiver()
+        with loadgen.LoadProcess([loadgen.UDPFloodLoad(sock.getsockname(), size=16)]) as load_process:
+            time.sleep(0.1)
+            self.assertEqual(load_process.sent, 0)
+            load_process.rate = 500
+            self.assertEqual(load_process.rate, 500)
+            sock.recv(1024)
+            time.sleep(0.2)
+            load_process.rate = 0
+            time.sleep(0.1)
+            sent = load_process.sent
+        self.assertFalse(load_process._process.is_alive())
+        sock.close()
+        self.assertGreater(sent, 10)
+        self.assertLess(sent, 500)
+
+
+class TestMeasurement(unittest.TestCase):
+    def test_p99(self):
+        self.assertEqual(loadgen._p99([0] * len(LATENCY_BUCKETS)), 0.0)
+        histogram = [0] * len(LATENCY_BUCKETS)
+        histogram[2] = 99
+        histogram[5] = 1
+        self.assertEqual(loadgen._p99(histogram), LATENCY_BUCKETS[2])
+        histogram[5] = 2
+        self.assertEqual(loadgen._p99(histogram), LATENCY_BUCKETS[5])
+
+    def test_drops(self):
+        self.assertEqual(loadgen._Step(10, 0, 0, 1, 0).drops, 0.0)
+        self.assertEqual(loadgen._Step(10, 100, 75, 1, 0).drops, 0.25)
+        self.assertEqual(loadgen._Step(10, 100, 120, 1, 0).drops, 0.0)
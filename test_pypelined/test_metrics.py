@@ -0,0 +1,111 @@
+from __future__ import absolute_import
+import unittest
+try:
+    from urllib.request import Request, urlopen
+    from urllib.error import HTTPError
+except ImportError:  # python2
+    from urllib2 import Request, urlopen, HTTPError
+
+import chainlet
+
+from pypelined.instrumentation import Instrumentation
+from pypelined.metrics import MetricFamily, MetricsServer, collect, render, parse_address
+from pypelined.modifier.parallel import Buffer
+
+
+@chainlet.funclet
+def identity(value):
+    return value
+
+
+def samples(families, name):
+    """Get the samples of the metric ``name`` as ``{labels: value}``"""
+    family, = [family for family in families if family.name == name]
+    return {tuple(sorted(labels.items())): value for _, labels, value in family.samples}
+
+
+class TestRender(unittest.TestCase):
+    def test_counter(self):
+        family = MetricFamily('pypelined_test', 'counter', 'Test counter')
+        family.add({'path': 'a"b\\c\nd'}, 3, '_total')
+        self.assertEqual(render([family]), '\n'.join([
+            '# HELP pypelined_test_total Test counter',
+            '# TYPE pypelined_test_total counter',
+            'pypelined_test_total{path="a\\"b\\\\c\\nd"} 3',
+        ]) + '\n')
+        self.assertEqual(render([family], openmetrics=True).splitlines()[:2], [
+            '# HELP pypelined_test Test counter', '# TYPE pypelined_test counter',
+        ])
+        self.assertTrue(render([family], openmetrics=True).endswith('\n# EOF\n'))
+
+    def test_histogram(self):
+        family = MetricFamily('pypelined_latency', 'histogram', 'Test histogram')
+        family.add({'le': 0.5}, 1, '_bucket')
+        family.add({'le': float('inf')}, 2, '_bucket')
+        family.add({}, 0.75, '_sum')
+        self.assertEqual(render([family]).splitlines()[2:], [
+            'pypelined_latency_bucket{le="0.5"} 1', 'pypelined_latency_bucket{le="+Inf"} 2',
+            'pypelined_latency_sum 0.75',
+        ])
+
+    def test_parse_address(self):
+        self.assertEqual(parse_address('9090'), ('', 9090))
+        self.assertEqual(parse_address('localhost:9090'), ('localhost', 9090))
+        self.assertEqual(parse_address('[::1]:9090'), ('[::1]', 9090))
+
+
+class TestCollect(unittest.TestCase):
+    def test_links(self):
+        instrumentation = Instrumentation(sample_interval=1)
+        chain = instrumentation.instrument(identity() >> identity())
+        for value in range(3):
+            chain.send(value)
+        families = collect(instrumentation)
+        self.assertEqual(samples(families, 'pypelined_link_received'), {
+            (('link', '0'), ('pipeline', '0'), ('type', 'identity')): 3,
+            (('link', '1'), ('pipeline', '0'), ('type', 'identity')): 3,
+        })
+        self.assertEqual(samples(families, 'pypelined_pipeline_chunks'), {(('pipeline', '0'),): 3})
+
+    def test_queues(self):
+        instrumentation = Instrumentation()
+        buffer = Buffer(identity(), capacity=8)
+        instrumentation.instrument(identity() >> buffer)
+        self.addCleanup(buffer.close)
+        self.assertEqual(
+            samples(collect(instrumentation), 'pypelined_queue_capacity'),
+            {(('branch', '0'), ('link', '1'), ('pipeline', '0'), ('type', 'Buffer')): 8},
+        )
+
+
+class TestMetricsServer(unittest.TestCase):
+    def setUp(self):
+        self.instrumentation = Instrumentation()
+        self.instrumentation.instrument(identity()).send(1)
+        self.server = MetricsServer(('127.0.0.1', 0), instrumentation=self.instrumentation)
+        self.server.start()
+        self.addCleanup(self.server.close)
+
+    def get(self, path, **headers):
+        return urlopen(Request('http://%s:%d%s' % (self.server.server_address + (path,)), headers=headers), timeout=5)
+
+    def test_prometheus(self):
+        response = self.get('/metrics')
+        self.assertTrue(response.headers['Content-Type'].startswith('text/plain'))
+        body = response.read().decode('utf-8')
+        self.assertIn('pypelined_link_received_total{link="0",pipeline="0",type="identity"} 1\n', body)
+
+    def test_openmetrics(self):
+        response = self.get('/metrics', Accept='application/openmetrics-text; version=1.0.0')
+        self.assertTrue(response.headers['Content-Type'].startswith('application/openmetrics-text'))
+        self.assertTrue(response.read().decode('utf-8').endswith('# EOF\n'))
+
+    def test_not_found(self):
+        with self.assertRaises(HTTPError) as context:
+            self.get('/other')
+        self.assertEqual(context.exception.code, 404)
+        context.exception.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
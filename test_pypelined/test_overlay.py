@@ -0,0 +1,44 @@
+from __future__ import absolute_import
+import pickle
+import unittest
+
+from pypelined.utilities.overlay import Overlay
+
+
+class TestOverlay(unittest.TestCase):
+    def test_mapping(self):
+        base = {'a': 1, 'b': 2}
+        overlay = Overlay(base, {'b': 3, 'c': 4})
+        self.assertEqual(overlay, {'a': 1, 'b': 3, 'c': 4})
+        self.assertEqual(len(overlay), 3)
+        self.assertEqual(sorted(overlay), ['a', 'b', 'c'])
+        self.assertEqual(sorted(overlay.items()), [('a', 1), ('b', 3), ('c', 4)])
+        self.assertIn('a', overlay)
+        self.assertNotIn('d', overlay)
+        self.assertRaises(KeyError, lambda: overlay['d'])
+        self.assertEqual(base, {'a': 1, 'b': 2})
+
+    def test_disjoint(self):
+        overlay = Overlay({'a': 1}, {'b': 2})
+        self.assertEqual(len(overlay), 2)
+        self.assertEqual(sorted(overlay.items()), [('a', 1), ('b', 2)])
+
+    def test_nested(self):
+        base = {'a': 1, 'b': 2}
+        inner = Overlay(base, {'b': 3})
+        outer = Overlay(inner, {'c': 4})
+        self.assertIs(outer.base, base)
+        self.assertEqual(outer, {'a': 1, 'b': 3, 'c': 4})
+        self.assertEqual(inner, {'a': 1, 'b': 3})
+        self.assertIs(Overlay(inner, {}).updates, inner.updates)
+
+    def test_copy(self):
+        overlay = Overlay({'a': 1}, {'a': 2, 'b': 3})
+        copy = overlay.copy()
+        self.assertIs(type(copy), dict)
+        self.assertEqual(copy, {'a': 2, 'b': 3})
+        self.assertEqual(pickle.loads(pickle.dumps(overlay)), overlay)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+from __future__ import absolute_import
+import threading
+import unittest
+try:
+    import queue
+except ImportError:  # python2
+    import Queue as queue
+
+import chainlet
+
+from pypelined.modifier.parallel import Buffer, FanOut, _ProcessBranch
+
+
+@chainlet.funclet
+def collect(value, target):
+    target.append(value)
+    return value
+
+
+@chainlet.funclet
+def wait(value, event):
+    event.wait(5)
+    return value
+
+
+@chainlet.genlet
+def take(count, target):
+    for _ in range(count):
+        target.append((yield))
+
+
+class Closing(chainlet.ChainLink):
+    def __init__(self, closed):
+        super(Closing, self).__init__()
+        self.closed = closed
+
+    def chainlet_send(self, value=None):
+        return value
+
+    def close(self):
+        self.closed.append(self)
+
+
+class FullQueue(object):
+    """Queue which is always full but has nothing to get, as before its feeder flushes"""
+    def put_nowait(self, value):
+        raise queue.Full
+
+    def get_nowait(self):
+        raise queue.Empty
+
+    def qsize(self):
+        return 1
+
+
+class TestFanOut(unittest.TestCase):
+    def test_threads(self):
+        first, second = [], []
+        fanout = FanOut(collect(first), collect(second), capacity=4)
+        self.assertEqual([fanout.send(value) for value in range(32)], list(range(32)))
+        fanout.close()
+        self.assertEqual(first, list(range(32)))
+        self.assertEqual(second, list(range(32)))
+
+    def test_exhausted_branch(self):
+        exhausted, remaining = [], []
+        fanout = FanOut(take(3, exhausted), collect(remaining), capacity=2)
+        for value in range(32):
+            fanout.send(value)
+        fanout.close()
+        self.assertEqual(exhausted, [0, 1, 2])
+        self.assertEqual(remaining, list(range(32)))
+        self.assertTrue(fanout.branches[0].finished)
+
+    def test_close_branches(self):
+        closed = []
+        first, second = Closing(closed), Closing(closed)
+        fanout = FanOut(first, collect([]) >> second)
+        fanout.send(1)
+        fanout.close()
+        self.assertEqual(closed, [first, second])
+
+    def test_invalid_arguments(self):
+        self.assertRaises(ValueError, FanOut, collect([]), worker='fiber')
+        self.assertRaises(TypeError, FanOut, collect([]), workers=2)
+        self.assertRaises(ValueError, FanOut, collect([]), worker='process', overflow='drop')
+
+
+class TestProcessBranch(unittest.TestCase):
+    def branch(self, overflow):
+        branch = _ProcessBranch(collect([]), capacity=1, overflow=overflow)
+        branch._queue = FullQueue()
+        return branch
+
+    def test_drop_newest(self):
+        branch = self.branch('drop-newest')
+        branch.put(1)
+        self.assertEqual((branch.puts, branch.drops), (0, 1))
+
+    def test_drop_oldest_unflushed(self):
+        branch = self.branch('drop-oldest')
+        branch.put(1)
+        self.assertEqual((branch.puts, branch.drops), (0, 1))
+
+
+class TestBuffer(unittest.TestCase):
+    def test_forward(self):
+        received = []
+        link = Buffer(collect(received), capacity=4)
+        self.assertEqual([link.send(value) for value in range(32)], list(range(32)))
+        link.close()
+        self.assertEqual(received, list(range(32)))
+        self.assertEqual(link.statistics['drops'], 0)
+
+    def test_drop_newest(self):
+        received, release = [], threading.Event()
+        link = Buffer(wait(release) >> collect(received), capacity=2, overflow='drop-newest')
+        for value in range(8):
+            link.send(value)
+        release.set()
+        link.close()
+        # the consumer thread may hold one value while the buffer fills up
+        self.assertIn(len(received), (2, 3))
+        self.assertEqual(len(received) + link.statistics['drops'], 8)
+        self.assertEqual(received[:2], [0, 1])
+
+    def test_close(self):
+        closed = []
+        link = Buffer(Closing(closed))
+        link.send(1)
+        link.close()
+        self.assertEqual(len(closed), 1)
+        self.assertEqual(link.statistics['depth'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+from __future__ import absolute_import
+import os
+import shutil
+import signal
+import tempfile
+import threading
+import unittest
+
+import chainlet
+
+from pypelined.instrumentation import Instrumentation
+from pypelined.profiler import StackSampler, install_signal_handler, write_collapsed
+
+
+class Spin(chainlet.ChainLink):
+    """Link busy until ``release`` is set"""
+    def __init__(self, release):
+        super(Spin, self).__init__()
+        self.release = release
+
+    def chainlet_send(self, value=None):
+        while not self.release.is_set():
+            pass
+        return value
+
+
+class TestStackSampler(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.output = os.path.join(self.directory, 'profile.%(pid)d.collapsed')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def run_spinning(self, link, release):
+        thread = threading.Thread(target=link.send, args=(1,), name='spinning')
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(release.set)
+
+    def test_sample(self):
+        release = threading.Event()
+        instrumentation = Instrumentation()
+        self.run_spinning(instrumentation.instrument(Spin(release)), release)
+        stacks = StackSampler(rate=200, duration=0.2).sample()
+        self.assertIn(('Spin.probe', 'Spin.chainlet_send'), {stack[-2:] for stack in stacks if stack[0] == 'spinning'})
+
+    def test_start_stop(self):
+        sampler = StackSampler(rate=100, duration=60, output=self.output)
+        with self.assertLogs('pypelined.profiler', 'WARNING'):
+            self.assertTrue(sampler.start())
+            self.assertFalse(sampler.start())
+            self.assertTrue(sampler.running)
+            sampler.stop()
+        self.assertFalse(sampler.running)
+        with open(self.output % {'pid': os.getpid()}) as collapsed:
+            self.assertTrue(collapsed.read())
+        self.assertRaises(ValueError, StackSampler, rate=0)
+
+    def test_write_collapsed(self):
+        path = os.path.join(self.directory, 'stacks')
+        write_collapsed({('main', 'b;c'): 2, ('main', 'a'): 1}, path)
+        with open(path) as collapsed:
+            self.assertEqual(collapsed.read(), 'main;a 1\nmain;b:c 2\n')
+
+    @unittest.skipUnless(hasattr(signal, 'SIGUSR2'), 'requires SIGUSR2')
+    def test_signal(self):
+        sampler = StackSampler(rate=100, duration=60, output=self.output)
+        previous = signal.getsignal(signal.SIGUSR2)
+        self.addCleanup(signal.signal, signal.SIGUSR2, previous)
+        install_signal_handler(sampler)
+        with self.assertLogs('pypelined.profiler', 'WARNING'):
+            os.kill(os.getpid(), signal.SIGUSR2)
+            self.assertTrue(sampler.running)
+            os.kill(os.getpid(), signal.SIGUSR2)
+            sampler.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+from __future__ import absolute_import
+import threading
+import unittest
+
+from pypelined.utilities.ringbuffer import RingBuffer
+
+
+class TestRingBuffer(unittest.TestCase):
+    def test_fifo(self):
+        buffer = RingBuffer(capacity=4)
+        self.assertEqual(buffer.put_many(range(3)), 3)
+        self.assertEqual([buffer.get() for _ in range(3)], [0, 1, 2])
+        self.assertRaises(IndexError, buffer.get, timeout=0)
+
+    def test_drop_newest(self):
+        buffer = RingBuffer(capacity=2, overflow='drop-newest')
+        self.assertEqual(buffer.put_many(range(4)), 2)
+        self.assertEqual(buffer.drops, 2)
+        self.assertEqual(buffer.get_many(4), [0, 1])
+
+    def test_drop_oldest(self):
+        buffer = RingBuffer(capacity=2, overflow='drop-oldest')
+        self.assertEqual(buffer.put_many(range(4)), 4)
+        self.assertEqual(buffer.drops, 2)
+        self.assertEqual(buffer.get_many(4), [2, 3])
+
+    def test_block_timeout(self):
+        buffer = RingBuffer(capacity=2, overflow='block')
+        self.assertEqual(buffer.put_many(range(4), timeout=0.01), 2)
+        self.assertEqual(buffer.drops, 2)
+
+    def test_block_batch_exceeding_capacity(self):
+        buffer = RingBuffer(capacity=4, overflow='block')
+        received = []
+
+        def consume():
+            while len(received) < 64:
+                try:
+                    received.append(buffer.get(timeout=5))
+                except IndexError:
+                    break
+        consumer = threading.Thread(target=consume)
+        consumer.daemon = True
+        consumer.start()
+        self.assertEqual(buffer.put_many(range(64), timeout=5), 64)
+        consumer.join(5)
+        self.assertFalse(consumer.is_alive())
+        self.assertEqual(received, list(range(64)))
+        self.assertEqual(buffer.drops, 0)
+        self.assertLessEqual(buffer.high_water, 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,233 @@
+from __future__ import absolute_import
+import errno
+import os
+import shutil
+import socket
+import tempfile
+import time
+import unittest
+try:
+    from unittest import mock
+except ImportError:  # python2
+    import mock
+
+from pypelined.provider.socket import Socket, UDPDatagrams
+from pypelined.consumer.socket import UDPSocket, _pack_datagrams
+from pypelined.utilities import mmsg
+
+
+class FailingReceiver(mmsg.DatagramReceiver):
+    """Receiver raising ``errors`` before receiving datagrams"""
+    errors = []
+
+    def receive(self):
+        if self.errors:
+            raise self.errors.pop(0)
+        return super(FailingReceiver, self).receive()
+
+
+class TestSocket(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'test.sock')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def send(self, data):
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        client.connect(self.path)
+        client.sendall(data)
+        client.close()
+
+    def test_frames(self):
+        with Socket(self.path) as source:
+            self.send(b'first\nsecond\nlast')
+            self.assertEqual([source.chainlet_send() for _ in range(3)], ['first', 'second', 'last'])
+
+    def test_poll(self):
+        with Socket(self.path, encoding=None) as source:
+            self.assertIsNotNone(source.fileno())
+            self.assertIsNone(source.delay)
+            self.assertEqual(source.poll(0), [])
+            self.send(b'first\nsecond\n')
+            frames = source.poll(1)
+            while len(frames) < 2:
+                frames += source.poll(1)
+            self.assertEqual(frames, [b'first', b'second'])
+
+    def poll(self, source, count):
+        frames, deadline = [], time.time() + 2
+        while len(frames) < count and time.time() < deadline:
+            frames += source.poll(0.1)
+        return frames
+
+    def test_tcp_clients(self):
+        with Socket(('127.0.0.1', 0)) as source:
+            address = source._listeners[0].getsockname()
+            first, second = socket.create_connection(address), socket.create_connection(address)
+            first.sendall(b'first ')
+            second.sendall(b'second\n')
+            self.assertEqual(self.poll(source, 1), ['second'])
+            first.sendall(b'client\nlast')
+            first.close()
+            second.close()
+            self.assertEqual(self.poll(source, 2), ['first client', 'last'])
+            self.assertEqual(source.poll(0.1), [])
+            self.assertEqual(source._connections, 0)
+
+    def test_max_frame(self):
+        with Socket(self.path, max_frame=8) as source:
+            with self.assertLogs('pypelined.provider.socket', 'WARNING'):
+                self.send(b'toolong' * 4)
+                self.assertEqual(source.poll(0.5), [])
+            self.send(b'short\n')
+            self.assertEqual(self.poll(source, 1), ['short'])
+
+    def test_max_connections(self):
+        with Socket(self.path, max_connections=1) as source:
+            first = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            first.connect(self.path)
+            self.assertEqual(source.poll(0.1), [])
+            with self.assertLogs('pypelined.provider.socket', 'WARNING'):
+                self.send(b'rejected\n')
+                self.assertEqual(source.poll(0.2), [])
+            first.sendall(b'accepted\n')
+            first.close()
+            self.assertEqual(self.poll(source, 1), ['accepted'])
+
+    def test_close(self):
+        source = Socket(self.path)
+        source.open()
+        self.assertTrue(os.path.exists(self.path))
+        source.close()
+        self.assertFalse(os.path.exists(self.path))
+
+
+class TestUDPDatagrams(unittest.TestCase):
+    def send(self, source, *datagrams):
+        client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        for datagram in datagrams:
+            client.sendto(datagram, source._socket.getsockname())
+        client.close()
+
+    def test_background(self):
+        with UDPDatagrams(('127.0.0.1', 0)) as source:
+            self.assertIsNone(source.fileno())
+            self.send(source, b'first', b'second')
+            self.assertEqual([source.chainlet_send() for _ in range(2)], ['first', 'second'])
+
+    def test_undecodable(self):
+        with UDPDatagrams(('127.0.0.1', 0)) as source:
+            self.send(source, b'\xff\xfe', b'valid')
+            self.assertEqual([source.chainlet_send() for _ in range(2)], [u'\ufffd\ufffd', 'valid'])
+
+    def test_receive_error(self):
+        FailingReceiver.errors = [OSError(errno.ECONNREFUSED, 'Connection refused')]
+        with mock.patch.object(mmsg, 'DatagramReceiver', FailingReceiver):
+            with UDPDatagrams(('127.0.0.1', 0)) as source:
+                with self.assertLogs('pypelined.provider.socket', 'WARNING'):
+                    self.send(source, b'first')
+                    self.assertEqual(source.chainlet_send(), 'first')
+                self.assertTrue(source._thread.is_alive())
+
+    def test_receiver_stopped(self):
+        FailingReceiver.errors = [ValueError('unexpected')]
+        with mock.patch.object(mmsg, 'DatagramReceiver', FailingReceiver):
+            with UDPDatagrams(('127.0.0.1', 0)) as source:
+                with self.assertLogs('pypelined.provider.socket', 'ERROR'):
+                    self.send(source, b'first')
+                    self.assertRaises(RuntimeError, source.chainlet_send)
+
+    def test_poll(self):
+        source = UDPDatagrams(('127.0.0.1', 0), encoding=None)
+        source.open(background=False)
+        try:
+            self.assertIsNotNone(source.fileno())
+            self.assertEqual(source.poll(0), [])
+            self.send(source, b'first', b'second')
+            deadline, datagrams = time.time() + 1, []
+            while len(datagrams) < 2 and time.time() < deadline:
+                datagrams += source.poll(0.1)
+            self.assertEqual(datagrams, [b'first', b'second'])
+            self.assertEqual(source.received, 2)
+        finally:
+            source.close()
+
+
+class TestUDPSocket(unittest.TestCase):
+    def setUp(self):
+        self.receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.receiver.bind(('127.0.0.1', 0))
+        self.receiver.settimeout(5)
+
+    def tearDown(self):
+        self.receiver.close()
+
+    def consumer(self, **kwargs):
+        return UDPSocket('127.0.0.1', self.receiver.getsockname()[1], **kwargs)
+
+    def receive(self, count):
+        return [self.receiver.recv(65535) for _ in range(count)]
+
+    def assertNothingReceived(self):
+        self.receiver.settimeout(0.1)
+        self.assertRaises(socket.timeout, self.receiver.recv, 65535)
+        self.receiver.settimeout(5)
+
+    def test_unbatched(self):
+        consumer = self.consumer()
+        self.assertEqual(consumer.send('first'), 'first')
+        self.assertEqual(consumer.send(['second', 'third']), ['second', 'third'])
+        self.assertEqual(self.receive(3), [b'first', b'second', b'third'])
+        self.assertIsNone(consumer.statistics)
+
+    def test_batch_size(self):
+        consumer = self.consumer(batch_size=2, max_delay=60)
+        consumer.send('first')
+        self.assertNothingReceived()
+        consumer.send('second')
+        self.assertEqual(self.receive(2), [b'first', b'second'])
+        consumer.send('last')
+        consumer.close()
+        self.assertEqual(self.receive(1), [b'last'])
+        self.assertEqual((consumer.statistics.batches, consumer.statistics.items), (2, 3))
+
+    def test_max_delay(self):
+        consumer = self.consumer(batch_size=64, max_delay=0.05)
+        consumer.send(['first', 'second'])
+        self.assertEqual(self.receive(2), [b'first', b'second'])
+        consumer.close()
+
+    def test_mtu(self):
+        consumer = self.consumer(batch_size=4, mtu=6, max_delay=60)
+        for value in ('a\n', 'bb\n', 'ccc\n', 'dddd\n'):
+            consumer.send(value)
+        consumer.close()
+        self.assertEqual(self.receive(3), [b'a\nbb\n', b'ccc\n', b'dddd\n'])
+        self.assertEqual(consumer.statistics.batches, 1)
+
+
+class TestPackDatagrams(unittest.TestCase):
+    def test_pack(self):
+        self.assertEqual(_pack_datagrams([b'ab', b'cd', b'e'], 4), [b'abcd', b'e'])
+        self.assertEqual(_pack_datagrams([b'a', b'toolong', b'b', b'c'], 4), [b'a', b'toolong', b'bc'])
+        self.assertEqual(_pack_datagrams([], 4), [])
+
+
+@unittest.skipUnless(mmsg.HAS_SENDMMSG, 'requires sendmmsg')
+class TestSendmmsg(unittest.TestCase):
+    def test_sendmmsg(self):
+        receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.addCleanup(receiver.close)
+        self.addCleanup(sender.close)
+        receiver.bind(('127.0.0.1', 0))
+        receiver.settimeout(5)
+        datagrams = [b'datagram %d' % index for index in range(16)]
+        self.assertEqual(mmsg.sendmmsg(sender, datagrams, mmsg.sockaddr(socket.AF_INET, receiver.getsockname())), 1)
+        self.assertEqual([receiver.recv(64) for _ in datagrams], datagrams)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,159 @@
+from __future__ import absolute_import
+import atexit
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from pypelined.provider.stream import readlines, tail_path, TailGlob
+from pypelined.utilities import inotify, checkpoint
+
+
+class TestReadlines(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'test.log')
+        self.store = checkpoint.CheckpointStore(os.path.join(self.directory, 'checkpoint'), every=1)
+
+    def tearDown(self):
+        if hasattr(atexit, 'unregister'):
+            # the store is persisted at exit, after its directory is gone
+            atexit.unregister(self.store.save)
+        shutil.rmtree(self.directory)
+
+    def read(self, checkpoint=None):
+        with open(self.path) as log_file:
+            return list(readlines(log_file, checkpoint=checkpoint))
+
+    def test_crlf(self):
+        with open(self.path, 'wb') as log_file:
+            log_file.write(b'first\r\nsecond\r\n\r\nlast\n')
+        self.assertEqual(self.read(), ['first', 'second', '', 'last'])
+        self.assertEqual(self.read(self.store), ['first', 'second', '', 'last'])
+
+    def test_resume(self):
+        with open(self.path, 'wb') as log_file:
+            log_file.write(b'first\r\nsecond\n')
+        self.assertEqual(self.read(self.store), ['first', 'second'])
+        with open(self.path, 'ab') as log_file:
+            log_file.write(b'third\r\n')
+        self.assertEqual(self.read(self.store), ['third'])
+
+
+class TestTailPath(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'test.log')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, data):
+        with open(self.path, 'ab') as log_file:
+            log_file.write(data)
+
+    def read(self, count, **kwargs):
+        lines = tail_path(self.path, follow=False, **kwargs)
+        try:
+            return [next(lines) for _ in range(count)]
+        finally:
+            lines.close()
+
+    def test_lines_longer_than_block(self):
+        self.write(b'a' * 100 + b'\nb\n' + b'c' * 40 + b'\n')
+        self.assertEqual(self.read(3, block_size=16), ['a' * 100, 'b', 'c' * 40])
+
+    def test_crlf(self):
+        self.write(b'first\r\nsecond\r\n\r\nlast\n')
+        self.assertEqual(self.read(4, block_size=4), ['first', 'second', '', 'last'])
+
+    def test_crlf_binary(self):
+        self.write(b'first\r\nsecond\n')
+        self.assertEqual(self.read(2, mode='rb'), [b'first\r', b'second'])
+
+    def test_poll(self):
+        self.write(b'first\nsecond\n')
+        lines = tail_path(self.path)
+        try:
+            self.assertEqual(lines.poll(0), ['first', 'second'])
+            self.assertEqual(lines.poll(0), [])
+            self.write(b'third\n')
+            self.assertEqual(lines.poll(1), ['third'])
+            os.rename(self.path, self.path + '.1')
+            self.write(b'new\n')
+            self.assertEqual(lines.poll(1), ['new'])
+        finally:
+            lines.close()
+
+    @unittest.skipUnless(inotify.HAS_INOTIFY, 'requires inotify')
+    def test_copytruncate(self):
+        self.write(b'a' * 100 + b'\n')
+        lines = tail_path(self.path, use_inotify=True)
+        try:
+            self.assertEqual(lines.poll(0), ['a' * 100])
+            # a busy writer keeps modifying the file after it has been truncated
+            with open(self.path, 'r+b') as log_file:
+                log_file.truncate(0)
+            self.write(b'new\n')
+            self.assertEqual(lines.poll(0), ['new'])
+        finally:
+            lines.close()
+
+
+class TestTailGlob(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, data):
+        with open(os.path.join(self.directory, name), 'ab') as log_file:
+            log_file.write(data)
+
+    def poll(self, source, count):
+        lines, deadline = [], time.time() + 2
+        while len(lines) < count and time.time() < deadline:
+            lines += source.poll(0.1)
+        return sorted((os.path.basename(path), line) for path, line in lines)
+
+    def test_poll(self):
+        self.write('a.log', b'a1\n')
+        self.write('b.log', b'b1\n')
+        self.write('c.txt', b'c1\n')
+        with TailGlob(os.path.join(self.directory, '*.log')) as source:
+            self.assertEqual(self.poll(source, 2), [('a.log', 'a1'), ('b.log', 'b1')])
+            self.assertEqual(source.poll(0), [])
+            self.write('b.log', b'b2\n')
+            self.write('d.log', b'd1\n')
+            self.assertEqual(self.poll(source, 2), [('b.log', 'b2'), ('d.log', 'd1')])
+
+    @unittest.skipUnless(inotify.HAS_INOTIFY and hasattr(os, 'fsencode'), 'requires inotify and python3')
+    def test_undecodable_name(self):
+        with TailGlob(os.path.join(self.directory, '*.log'), use_inotify=True) as source:
+            self.assertEqual(source.poll(0), [])
+            with open(os.path.join(os.fsencode(self.directory), b'bad\xff.log'), 'wb') as log_file:
+                log_file.write(b'line\n')
+            self.assertEqual(self.poll(source, 1), [(os.fsdecode(b'bad\xff.log'), 'line')])
+
+    def test_matches(self):
+        source = TailGlob(os.path.join(self.directory, '*.log'), os.path.join(self.directory, '*', 'xrootd.log'))
+        self.assertTrue(source._matches(os.path.join(self.directory, 'a.log')))
+        self.assertTrue(source._matches(os.path.join(self.directory, 'a', 'xrootd.log')))
+        self.assertFalse(source._matches(os.path.join(self.directory, 'a', 'b.log')))
+        self.assertFalse(source._matches(os.path.join(self.directory, 'a', 'b', 'xrootd.log')))
+
+    def test_queue_once(self):
+        self.write('a.log', b'a1\n')
+        with TailGlob(os.path.join(self.directory, '*.log'), use_inotify=False) as source:
+            source._queue(*source._tails)
+            self.assertEqual(len(source._ready), 1)
+            self.assertEqual(self.poll(source, 1), [('a.log', 'a1')])
+            source._queue(*source._tails)
+            source._queue(*source._tails)
+            self.assertEqual(len(source._ready), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+from __future__ import absolute_import
+import socket
+import unittest
+
+from pypelined.consumer.telegraf import LineEncoder, telegraf
+from pypelined.utilities.chains import close_links
+
+
+class TestLineEncoder(unittest.TestCase):
+    def test_fields(self):
+        encoder = LineEncoder('measurement', static_tags={'site': 'a b'}, dynamic_tags=('host',))
+        self.assertEqual(
+            encoder.encode({'host': 'xrd01', 'num': 3}, timestamp=1),
+            'measurement,host=xrd01,site=a\\ b num=3i 1000000000\n'
+        )
+        self.assertEqual(
+            [encoder.encode({'value': value}) for value in (0.5, True, 'v4')],
+            ['measurement,site=a\\ b value=0.5\n', 'measurement,site=a\\ b value=true\n',
+             'measurement,site=a\\ b value="v4"\n'],
+        )
+
+    def test_equal_tag_values(self):
+        encoder = LineEncoder('measurement', dynamic_tags=('tag',))
+        lines = [encoder.encode({'tag': value, 'field': 1}) for value in (1, True, 1.0, '1', 1)]
+        self.assertEqual([line.split(' ')[0] for line in lines], [
+            'measurement,tag=1', 'measurement,tag=True', 'measurement,tag=1.0', 'measurement,tag=1',
+            'measurement,tag=1',
+        ])
+
+
+class TestTelegraf(unittest.TestCase):
+    def test_packing(self):
+        receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.addCleanup(receiver.close)
+        receiver.bind(('127.0.0.1', 0))
+        receiver.settimeout(5)
+        chain = telegraf(receiver.getsockname(), 'measurement', mtu=128, max_delay=60)
+        for value in range(5):
+            chain.send({'value': value})
+        close_links(chain)
+        datagrams = [receiver.recv(65535) for _ in range(2)]
+        self.assertTrue(all(len(datagram) <= 128 for datagram in datagrams))
+        lines = b''.join(datagrams).decode().splitlines()
+        self.assertEqual([line.split(' ')[1] for line in lines], ['value=%di' % value for value in range(5)])
+
+
+if __name__ == '__main__':
+    unittest.main()
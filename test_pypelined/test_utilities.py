@@ -0,0 +1,34 @@
+from __future__ import absolute_import
+import math
+import unittest
+
+from pypelined.utilities import safe_eval, decode_scalar
+
+LITERALS = (
+    '0', '1', '-1', '+1', '1234567890123456789012345', '007', '00', '-007', '0x10', '0o17', '0b11',
+    '1_000', '1__0', '1.5', '-1.5', '.5', '5.', '1e5', '1E-5', '007.5', '1e', '1j', '-inf', 'inf', 'nan',
+    'NaN', 'infinity', '1.2.3', '1 ', ' 1', '...', 'True', 'False', 'None', 'True ', 'True#x', 'Truest',
+    '"quoted"', "'quoted'", '"esc\\"aped"', '"a\\nb"', '"a\nb"', '""', '"', 'b"bytes"', 'u"text"',
+    '[1, 2]', '(1,)', '{"a": 1}', '{1', '\\\n1', 'plain', '/data/xrd01', 'v4.6.1', 'xrd01.example.org:1094',
+    'ALICE::TEST::SE', 'anon', '',
+)
+
+
+class TestDecodeScalar(unittest.TestCase):
+    def assertSameValue(self, literal, value, expected):
+        if isinstance(expected, float) and math.isnan(expected):
+            self.assertTrue(math.isnan(value), literal)
+        else:
+            self.assertEqual((type(value), value), (type(expected), expected), literal)
+
+    def test_safe_eval_equivalence(self):
+        for literal in LITERALS:
+            self.assertSameValue(literal, decode_scalar(literal), safe_eval(literal))
+
+    def test_special_numbers(self):
+        self.assertEqual(decode_scalar('0x10'), 16)
+        self.assertEqual(decode_scalar('-inf'), '-inf')
+
+
+if __name__ == '__main__':
+    unittest.main()
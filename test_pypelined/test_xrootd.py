@@ -0,0 +1,29 @@
+from __future__ import absolute_import
+import unittest
+
+from pypelined.provider.xrootd import XRootDReports, parse_summary
+
+SUMMARY = (
+    b'<statistics tod="1500000000" ver="v4.6.1" pgm="xrootd">'
+    b'<stats id="info"><host>xrd01.example.org</host></stats>'
+    b'<stats id="oss"><paths>1<stats id="0"><lp>"/data"</lp><free>1.5</free></stats></paths></stats>'
+    b'</statistics>\0'
+)
+
+
+class TestParse(unittest.TestCase):
+    def test_summary(self):
+        self.assertEqual(parse_summary(SUMMARY), {
+            'tod': 1500000000, 'ver': 'v4.6.1', 'pgm': 'xrootd', 'info.host': 'xrd01.example.org',
+            'oss.paths': 1, 'oss.paths.0.lp': '/data', 'oss.paths.0.free': 1.5,
+        })
+
+    def test_cgi(self):
+        reports = XRootDReports(9931)
+        self.assertEqual(reports._parse_cgi('load=0.5&pgm=xrootd\n'), {'load': 0.5, 'pgm': 'xrootd'})
+        # the type of a value does not depend on previous reports
+        self.assertEqual(type(reports._parse_cgi('load=1\n')['load']), int)
+
+
+if __name__ == '__main__':
+    unittest.main()